@@ -6,12 +6,13 @@
 #
 from abc import ABC, abstractmethod
 from importlib import import_module
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
 from os import environ
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from mentor_classifier.mentor import Media
+from mentor_classifier.training_progress import TrainingProgress
 
 
 def mentor_model_path(models_path: str, mentor_id: str, arch: str, p: str = "") -> str:
@@ -29,6 +30,21 @@ class QuestionClassifierTrainingResult:
     model_path: str
 
 
+@dataclass
+class QuestionClassifierFitResult:
+    classifier: Any
+    stats: Any  # ridge_stats.RidgeStatistics of the training rows
+    scores: List[float]
+    accuracy: float
+
+
+@dataclass
+class AnswerCandidate:
+    answer_id: str
+    answer_text: str
+    confidence: float
+
+
 @dataclass
 class QuestionClassiferPredictionResult:
     answer_id: str
@@ -36,25 +52,102 @@ class QuestionClassiferPredictionResult:
     answer_media: List[Media]
     highest_confidence: float
     feedback_id: str
+    candidates: List[AnswerCandidate] = field(default_factory=list)
 
 
 class QuestionClassifierTraining(ABC):
+    """
+    train() runs all the steps for one mentor.
+    The steps are also exposed so that many mentors can be trained together
+    (see bulk_train): embed is called with the texts of many mentors
+    and fit_classifier may run in another process
+    """
+
+    @abstractmethod
+    def train(
+        self, shared_root: str, progress: Optional[TrainingProgress] = None
+    ) -> QuestionClassifierTrainingResult:
+        """
+        progress, if given, records the stages of the training as they run
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def training_rows(self) -> Tuple[List[str], List[str]]:
+        """
+        Returns the text and the label of each training row
+        """
+        raise NotImplementedError()
+
     @abstractmethod
-    def train(self, shared_root: str) -> QuestionClassifierTrainingResult:
+    def feature_model_id(self) -> str:
+        """
+        Identifies the model that embed uses,
+        mentors with the same feature model id can share embeddings
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> Any:
+        raise NotImplementedError()
+
+    @staticmethod
+    @abstractmethod
+    def fit_classifier(
+        feature_model_id: str,
+        texts: List[str],
+        labels: List[str],
+        x: Any,
+        progress: Optional[TrainingProgress] = None,
+    ) -> QuestionClassifierFitResult:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def save(
+        self,
+        fit: QuestionClassifierFitResult,
+        progress: Optional[TrainingProgress] = None,
+    ) -> QuestionClassifierTrainingResult:
         raise NotImplementedError()
 
 
 class QuestionClassifierPrediction(ABC):
     @abstractmethod
     def evaluate(
-        self, question: str, shared_root: str, canned_question_match_disabled=False
+        self,
+        question: str,
+        shared_root: str,
+        canned_question_match_disabled=False,
+        top_k: int = 0,
     ) -> QuestionClassiferPredictionResult:
         raise NotImplementedError()
 
+    @abstractmethod
+    def evaluate_batch(
+        self,
+        questions: List[str],
+        shared_root: str,
+        canned_question_match_disabled=False,
+        top_k: int = 0,
+    ) -> List[QuestionClassiferPredictionResult]:
+        """
+        When top_k > 0, each result also lists the classifier's top_k
+        best scoring answers as candidates, best first
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def get_last_trained_at(self) -> float:
         raise NotImplementedError()
 
+    @abstractmethod
+    def get_resident_size(self) -> int:
+        """
+        Approximate bytes held by this mentor's classifier,
+        excluding models shared between mentors (word2vec, transformers)
+        """
+        raise NotImplementedError()
+
 
 class ArchClassifierFactory(ABC):
     @abstractmethod
@@ -69,6 +162,13 @@ class ArchClassifierFactory(ABC):
     ) -> QuestionClassifierPrediction:
         raise NotImplementedError()
 
+    def preload_training(self, shared_root: str) -> None:
+        """
+        Loads the models shared between mentors' trainings into this process
+        (and so into processes forked from it)
+        """
+        pass
+
 
 _factories_by_arch: Dict[str, ArchClassifierFactory] = {}
 
@@ -103,3 +203,6 @@ class ClassifierFactory:
         return self._find_arch_fac(arch).new_training(
             mentor=mentor, shared_root=shared_root, output_dir=data_path
         )
+
+    def preload_training(self, shared_root: str, arch="") -> None:
+        self._find_arch_fac(arch).preload_training(shared_root)
@@ -6,10 +6,10 @@
 #
 import json
 import os
-import requests
 import csv
 from typing import Dict, List, TypedDict, Tuple
 from io import StringIO
+from mentor_classifier.graphql_client import find_graphql_client
 from mentor_classifier.ner import FollowupQuestion, NamedEntities
 from .types import AnswerInfo
 
@@ -84,6 +84,102 @@ query Mentor($id: ID!) {
 }
 """
 
+# training only needs questions, paraphrases and answer ids (and texts for ARCH_LR)
+GQL_QUERY_MENTOR_TRAINING = """
+query MentorTraining($id: ID!) {
+    mentor(id: $id) {
+        answers {
+            _id
+            status
+            transcript
+            question {
+                _id
+                question
+                type
+                name
+                paraphrases
+            }
+        }
+    }
+}
+"""
+
+# serving needs the canned questions and answers with their media, but no topics
+GQL_QUERY_MENTOR_SERVING = """
+query MentorServing($id: ID!) {
+    mentor(id: $id) {
+        questions {
+            question {
+                _id
+            }
+        }
+        answers {
+            _id
+            status
+            transcript
+            question {
+                _id
+                question
+                type
+                name
+                paraphrases
+            }
+            webMedia {
+                type
+                tag
+                url
+            }
+            mobileMedia{
+                type
+                tag
+                url
+            }
+            vttMedia{
+                type
+                tag
+                url
+            }
+        }
+    }
+}
+"""
+
+# the training data export has topics but no media
+GQL_QUERY_MENTOR_TRAINING_DATA = """
+query MentorTrainingData($id: ID!) {
+    mentor(id: $id) {
+        questions {
+            question {
+                _id
+            }
+            topics {
+                name
+            }
+        }
+        answers {
+            _id
+            transcript
+            question {
+                _id
+                question
+                paraphrases
+            }
+        }
+    }
+}
+"""
+
+MENTOR_DATA_ALL = "all"
+MENTOR_DATA_TRAINING = "training"
+MENTOR_DATA_SERVING = "serving"
+MENTOR_DATA_TRAINING_DATA = "training_data"
+GQL_QUERIES_MENTOR = {
+    MENTOR_DATA_ALL: GQL_QUERY_MENTOR,
+    MENTOR_DATA_TRAINING: GQL_QUERY_MENTOR_TRAINING,
+    MENTOR_DATA_SERVING: GQL_QUERY_MENTOR_SERVING,
+    MENTOR_DATA_TRAINING_DATA: GQL_QUERY_MENTOR_TRAINING_DATA,
+}
+
 GQL_UPDATE_MENTOR_TRAINING = """
 mutation UpdateMentorTraining($id: ID!) {
     updateMentorTraining(id: $id) {
@@ -126,13 +222,13 @@ query Mentor{
 def __auth_gql(
     query: GQLQueryBody, cookies: Dict[str, str] = {}, headers: Dict[str, str] = {}
 ) -> dict:
-    res = requests.post(GRAPHQL_ENDPOINT, json=query, cookies=cookies, headers=headers)
-    res.raise_for_status()
-    return res.json()
+    return find_graphql_client(GRAPHQL_ENDPOINT).post(
+        query, cookies=cookies, headers=headers
+    )
 
 
-def query_mentor(mentor: str) -> GQLQueryBody:
-    return {"query": GQL_QUERY_MENTOR, "variables": {"id": mentor}}
+def query_mentor(mentor: str, purpose: str = MENTOR_DATA_ALL) -> GQLQueryBody:
+    return {"query": GQL_QUERIES_MENTOR[purpose], "variables": {"id": mentor}}
 
 
 def query_mentor_answers_and_name() -> GQLQueryBody:
@@ -150,29 +246,60 @@ def mutation_update_training(mentor: str) -> GQLQueryBody:
     return {"query": GQL_UPDATE_MENTOR_TRAINING, "variables": {"id": mentor}}
 
 
+def user_question_input(
+    mentor: str,
+    question: str,
+    answer_id: str,
+    answer_type: str,
+    confidence: float,
+    id: str = "",
+) -> dict:
+    user_question = {
+        "mentor": mentor,
+        "question": question,
+        "classifierAnswer": answer_id,
+        "classifierAnswerType": answer_type,
+        "confidence": float(confidence),
+    }
+    if id:
+        user_question["_id"] = id
+    return user_question
+
+
 def mutation_create_user_question(
     mentor: str, question: str, answer_id: str, answer_type: str, confidence: float
 ) -> GQLQueryBody:
     return {
         "query": GQL_CREATE_USER_QUESTION,
         "variables": {
-            "userQuestion": {
-                "mentor": mentor,
-                "question": question,
-                "classifierAnswer": answer_id,
-                "classifierAnswerType": answer_type,
-                "confidence": float(confidence),
-            }
+            "userQuestion": user_question_input(
+                mentor, question, answer_id, answer_type, confidence
+            )
         },
     }
 
 
+def mutation_create_user_questions(user_questions: List[dict]) -> GQLQueryBody:
+    # one request for many user questions, each aliased as q0, q1, ...
+    params = ", ".join(
+        f"$q{i}: UserQuestionCreateInput!" for i in range(len(user_questions))
+    )
+    mutations = "\n".join(
+        f"    q{i}: userQuestionCreate(userQuestion: $q{i}) {{ _id }}"
+        for i in range(len(user_questions))
+    )
+    return {
+        "query": f"mutation UserQuestionCreateBatch({params}) {{\n{mutations}\n}}",
+        "variables": {f"q{i}": q for i, q in enumerate(user_questions)},
+    }
+
+
 def fetch_training_data(mentor: str) -> str:
-    data = fetch_mentor_data(mentor)
+    data = fetch_mentor_data(mentor, MENTOR_DATA_TRAINING_DATA)
     import logging
 
     logging.info("fetched mentor data")
-    logging.info(data)
+    logging.debug(data)
     data_dict = {}
     data_list = []
     for answer in data.get("answers", []):
@@ -224,21 +351,17 @@ def get_media_list_from_answer_gql(answer):
 
 
 def convert_mentor_gql_data(mentor_gql):
-    mentor_gql_answers = mentor_gql["answers"]
-    mentor_answers = list(
-        map(
-            lambda answer_gql: {
-                **answer_gql,
-                "media": get_media_list_from_answer_gql(answer_gql),
-            },
-            mentor_gql_answers,
-        )
-    )
-    return {**mentor_gql, "answers": mentor_answers}
+    # in place: the parsed response is not used for anything else
+    for answer_gql in mentor_gql.get("answers", []):
+        answer_gql["media"] = get_media_list_from_answer_gql(answer_gql)
+    return mentor_gql
 
 
-def fetch_mentor_data(mentor: str) -> dict:
-    tdjson = __auth_gql(query_mentor(mentor))
+def fetch_mentor_data(mentor: str, purpose: str = MENTOR_DATA_ALL) -> dict:
+    """
+    Fetches only the fields needed for purpose, one of the MENTOR_DATA_* constants
+    """
+    tdjson = __auth_gql(query_mentor(mentor, purpose))
     if "errors" in tdjson:
         raise Exception(json.dumps(tdjson.get("errors")))
     data = tdjson["data"]["mentor"]
@@ -320,3 +443,33 @@ def create_user_question(
         return tdjson["data"]["userQuestionCreate"]["_id"]
     except KeyError:
         return "error"
+
+
+def _is_duplicate_key_error(message: str) -> bool:
+    return "E11000" in message or "duplicate key" in message.lower()
+
+
+def create_user_questions(user_questions: List[dict]) -> List[str]:
+    """
+    Returns an error message for each user question that was not created,
+    "" for those that were (or already existed, since their _id is preassigned
+    an earlier attempt may have created them).
+    Raises when the request as a whole fails.
+    """
+    tdjson = __auth_gql(mutation_create_user_questions(user_questions))
+    errors_by_alias: Dict[str, str] = {}
+    for error in tdjson.get("errors") or []:
+        path = error.get("path") or []
+        if not path:
+            raise Exception(json.dumps(tdjson.get("errors")))
+        errors_by_alias[str(path[0])] = str(error.get("message") or "error")
+    data = tdjson.get("data") or {}
+    results = []
+    for i in range(len(user_questions)):
+        error = errors_by_alias.get(f"q{i}", "")
+        if error and _is_duplicate_key_error(error):
+            error = ""
+        elif not error and not (data.get(f"q{i}") or {}).get("_id"):
+            error = "no _id returned"
+        results.append(error)
+    return results
@@ -11,8 +11,10 @@ from mentor_classifier import (
     QuestionClassifierTraining,
     QuestionClassifierPrediction,
 )
+from mentor_classifier.spacy_preprocessor import SpacyPreprocessor
 from .predict import LRQuestionClassifierPrediction
 from .train import LRQuestionClassifierTraining
+from .word2vec import find_or_load_word2vec, word2vec_file
 
 
 class LRClassifierFactory(ArchClassifierFactory):
@@ -30,5 +32,9 @@ class LRClassifierFactory(ArchClassifierFactory):
             mentor=mentor, shared_root=shared_root, data_path=data_path
         )
 
+    def preload_training(self, shared_root: str) -> None:
+        find_or_load_word2vec(word2vec_file(shared_root))
+        SpacyPreprocessor(shared_root)
+
 
 register_classifier_factory(ARCH_LR, LRClassifierFactory())
@@ -5,81 +5,153 @@
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
 import logging
-import joblib
 import os
 import random
-from typing import Tuple
+from typing import List, Optional, Tuple
 
-from mentor_classifier.api import (
-    create_user_question,
-    get_off_topic_threshold,
-)
+import numpy as np
+
+from mentor_classifier.api import get_off_topic_threshold
+from mentor_classifier.feature_cache import find_or_create_query_feature_cache
+from mentor_classifier.feedback import log_user_question
 from mentor_classifier import (
+    AnswerCandidate,
     QuestionClassifierPrediction,
     QuestionClassiferPredictionResult,
     mentor_model_path,
     ARCH_LR,
 )
-from mentor_classifier.mentor import Mentor
-from mentor_classifier.utils import file_last_updated_at, sanitize_string
+from mentor_classifier.mentor import Mentor, find_mentor
+from mentor_classifier.model_artifact import load_model, model_file
+from mentor_classifier.scoring import LinearScorer
+from mentor_classifier.utils import deep_sizeof, file_last_updated_at, sanitize_string
 from mentor_classifier.spacy_preprocessor import SpacyPreprocessor
-from .word2vec import W2V
+from .word2vec import W2V, word2vec_file
 
 AnswerIdTextAndMedia = Tuple[str, str, list]
+AnswerIdTextMediaAndConfidence = Tuple[str, str, list, float]
 
 
 class LRQuestionClassifierPrediction(QuestionClassifierPrediction):
     def __init__(self, mentor, shared_root, data_path):
         if isinstance(mentor, str):
             logging.info("loading mentor id {}...".format(mentor))
-            mentor = Mentor(mentor)
+            mentor = find_mentor(mentor, mentor_model_path(data_path, mentor, ARCH_LR))
         assert isinstance(
             mentor, Mentor
         ), "invalid type for mentor (expected mentor.Mentor or string id for a mentor, encountered {}".format(
             type(mentor)
         )
         self.mentor = mentor
-        self.model_file = mentor_model_path(data_path, mentor.id, ARCH_LR, "model.pkl")
-        self.w2v_model = W2V(os.path.join(shared_root, "word2vec.bin"))
+        self.model_path = mentor_model_path(data_path, mentor.id, ARCH_LR)
+        self.model_file = model_file(self.model_path)
+        self.w2v_model = W2V(word2vec_file(shared_root))
+        self.preprocessor = SpacyPreprocessor(shared_root, lemmas_only=True)
+        # query features depend only on the shared spacy and word2vec models
+        self.feature_model_id = (
+            f"{ARCH_LR}:{os.path.abspath(self.w2v_model.get_w2v_file_path())}"
+        )
         self.model = self.__load_model()
+        self.scorer = LinearScorer(self.model)
 
     def evaluate(
         self,
         question: str,
         shared_root: str,
         canned_question_match_disabled=False,
+        top_k: int = 0,
     ) -> QuestionClassiferPredictionResult:
-        if not canned_question_match_disabled:
-            sanitized_question = sanitize_string(question)
-            if sanitized_question in self.mentor.questions_by_text:
-                q = self.mentor.questions_by_text[sanitized_question]
-                answer_id = q["answer_id"]
-                answer = q["answer"]
-                answer_media = q["media"]
-                feedback_id = create_user_question(
-                    self.mentor.id,
-                    question,
-                    answer_id,
-                    "PARAPHRASE"
-                    if sanitized_question != sanitize_string(q["question_text"])
-                    else "EXACT",
-                    1.0,
+        return self.evaluate_batch(
+            [question],
+            shared_root,
+            canned_question_match_disabled=canned_question_match_disabled,
+            top_k=top_k,
+        )[0]
+
+    def evaluate_batch(
+        self,
+        questions: List[str],
+        shared_root: str,
+        canned_question_match_disabled=False,
+        top_k: int = 0,
+    ) -> List[QuestionClassiferPredictionResult]:
+        results: List[Optional[QuestionClassiferPredictionResult]] = [
+            None
+            if canned_question_match_disabled
+            else self.__find_canned(question, top_k)
+            for question in questions
+        ]
+        unmatched = [i for i, result in enumerate(results) if result is None]
+        if unmatched:
+            w2v_vectors = np.array(
+                find_or_create_query_feature_cache().get_many(
+                    self.feature_model_id,
+                    [questions[i] for i in unmatched],
+                    self.__get_w2v_vectors,
                 )
-                return QuestionClassiferPredictionResult(
-                    answer_id, answer, answer_media, 1.0, feedback_id
+            )
+            predictions = self.__get_predictions(w2v_vectors, top_k)
+            off_topic_threshold = get_off_topic_threshold()
+            for i, candidates in zip(unmatched, predictions):
+                results[i] = self.__to_classifier_result(
+                    questions[i], candidates, off_topic_threshold, top_k
                 )
+        return [result for result in results if result is not None]
+
+    def __get_w2v_vectors(self, questions: List[str]) -> List[np.ndarray]:
+        return list(
+            self.w2v_model.w2v_for_questions(
+                self.preprocessor.transform_batch(questions)
+            )
+        )
+
+    def get_last_trained_at(self) -> float:
+        return file_last_updated_at(self.model_file)
+
+    def get_resident_size(self) -> int:
+        return deep_sizeof(self.model, self.scorer, self.mentor)
 
-        preprocessor = SpacyPreprocessor(shared_root)
-        processed_question = preprocessor.transform(question)
-        w2v_vector, lstm_vector = self.w2v_model.w2v_for_question(processed_question)
-        off_topic_threshold = get_off_topic_threshold()
-        (
+    def __load_model(self):
+        logging.info("loading model from path {}...".format(self.model_file))
+        return load_model(self.model_path)
+
+    def __find_canned(
+        self, question: str, top_k: int
+    ) -> Optional[QuestionClassiferPredictionResult]:
+        sanitized_question = sanitize_string(question)
+        if sanitized_question not in self.mentor.questions_by_text:
+            return None
+        q = self.mentor.questions_by_text[sanitized_question]
+        answer_id = q["answer_id"]
+        answer = q["answer"]
+        answer_media = q["media"]
+        feedback_id = log_user_question(
+            self.mentor.id,
+            question,
             answer_id,
-            answer_text,
+            "PARAPHRASE"
+            if sanitized_question != sanitize_string(q["question_text"])
+            else "EXACT",
+            1.0,
+        )
+        return QuestionClassiferPredictionResult(
+            answer_id,
+            answer,
             answer_media,
-            highest_confidence,
-        ) = self.__get_prediction(w2v_vector)
-        feedback_id = create_user_question(
+            1.0,
+            feedback_id,
+            [AnswerCandidate(answer_id, answer, 1.0)] if top_k > 0 else [],
+        )
+
+    def __to_classifier_result(
+        self,
+        question: str,
+        candidates: List[AnswerIdTextMediaAndConfidence],
+        off_topic_threshold: float,
+        top_k: int,
+    ) -> QuestionClassiferPredictionResult:
+        answer_id, answer_text, answer_media, highest_confidence = candidates[0]
+        feedback_id = log_user_question(
             self.mentor.id,
             question,
             answer_id,
@@ -89,32 +161,35 @@ class LRQuestionClassifierPrediction(QuestionClassifierPrediction):
         if highest_confidence < off_topic_threshold:
             answer_id, answer_text, answer_media = self.__get_offtopic()
         return QuestionClassiferPredictionResult(
-            answer_id, answer_text, answer_media, highest_confidence, feedback_id
+            answer_id,
+            answer_text,
+            answer_media,
+            highest_confidence,
+            feedback_id,
+            [AnswerCandidate(c[0], c[1], c[3]) for c in candidates]
+            if top_k > 0
+            else [],
         )
 
-    def get_last_trained_at(self) -> float:
-        return file_last_updated_at(self.model_file)
+    def __get_predictions(
+        self, w2v_vectors, top_k: int
+    ) -> List[List[AnswerIdTextMediaAndConfidence]]:
+        best, best_scores = self.scorer.top_k(w2v_vectors, top_k)
+        return [
+            [
+                self.__get_answer(str(self.scorer.classes[i]), float(confidence))
+                for i, confidence in zip(row, row_scores)
+            ]
+            for row, row_scores in zip(best, best_scores)
+        ]
 
-    def __load_model(self):
-        logging.info("loading model from path {}...".format(self.model_file))
-        return joblib.load(self.model_file)
-
-    def __get_prediction(self, w2v_vector):
-        if not self.model:
-            self.model = joblib.load(self.model_file)
-        test_vector = w2v_vector.reshape(1, -1)
-        prediction = self.model.predict(test_vector)
-        decision = self.model.decision_function(test_vector)
-        confidence_scores = (
-            sorted(decision[0]) if decision.ndim >= 2 else sorted(decision)
-        )
-        highest_confidence = confidence_scores[-1]
-        if not (prediction and prediction[0]):
+    def __get_answer(
+        self, answer_text: str, highest_confidence: float
+    ) -> AnswerIdTextMediaAndConfidence:
+        if not answer_text:
             raise Exception(
-                f"Prediction should be a list with at least one element (answer text) but found {prediction}"
+                f"Prediction should be a list with at least one element (answer text) but found {answer_text}"
             )
-        answer_text = prediction[0]
-
         answer_key = sanitize_string(answer_text)
         answer_id = (
             self.mentor.questions_by_answer[answer_key].get("answer_id", "")
@@ -4,40 +4,70 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
-import joblib
 import logging
 import os
+from typing import List, Optional, Tuple
 
 
 import numpy as np
-from sklearn import metrics
 from sklearn.linear_model import RidgeClassifier
-from sklearn.model_selection import cross_val_score, cross_val_predict
 
 from mentor_classifier import (
+    QuestionClassifierFitResult,
     QuestionClassifierTraining,
     QuestionClassifierTrainingResult,
     mentor_model_path,
     ARCH_LR,
 )
 from mentor_classifier.api import update_training
-from mentor_classifier.mentor import Mentor
+from mentor_classifier.cross_validation import (
+    cross_validate,
+    cross_validation_folds,
+    cross_validation_jobs,
+)
+from mentor_classifier.embedding_store import (
+    embed_with_store,
+    model_files_fingerprint,
+)
+from mentor_classifier.mentor import (
+    MENTOR_SNAPSHOT_FILE,
+    Mentor,
+    training_mentor_data,
+)
+from mentor_classifier.model_artifact import save_model
+from mentor_classifier.model_watcher import notify_model_updated
+from mentor_classifier.ridge_stats import (
+    RidgeStatistics,
+    ridge_stats_path,
+    train_ridge_incremental,
+    use_incremental_training,
+)
 from mentor_classifier.spacy_preprocessor import SpacyPreprocessor
-from .word2vec import W2V
+from mentor_classifier.training_progress import (
+    STAGE_CROSS_VALIDATION,
+    STAGE_FIT,
+    STAGE_SAVE,
+    TrainingProgress,
+    embed_with_progress,
+    training_stage,
+)
+from .word2vec import W2V, word2vec_file, word2vec_native_path
 
 
 class LRQuestionClassifierTraining(QuestionClassifierTraining):
     def __init__(self, mentor, shared_root: str = "shared", output_dir: str = "out"):
         if isinstance(mentor, str):
             print("loading mentor id {}...".format(mentor))
-            mentor = Mentor(mentor)
+            mentor = Mentor(mentor, purpose=training_mentor_data())
         assert isinstance(
             mentor, Mentor
         ), "invalid type for mentor (expected mentor.Mentor or string id for a mentor, encountered {}".format(
             type(mentor)
         )
         self.mentor = mentor
-        self.w2v = W2V(os.path.join(shared_root, "word2vec.bin"))
+        self.shared_root = shared_root
+        self.w2v = W2V(word2vec_file(shared_root))
+        self.output_dir = output_dir
         self.model_path = mentor_model_path(output_dir, mentor.id, ARCH_LR)
 
     """
@@ -47,104 +77,126 @@ class LRQuestionClassifierTraining(QuestionClassifierTraining):
         accuracy: (float) accuracy score for training data
     """
 
-    def train(self, shared_root) -> QuestionClassifierTrainingResult:
-        if not os.path.exists(self.model_path):
-            os.makedirs(self.model_path)
-        training_data, num_rows_having_paraphrases = self.__load_training_data(
-            shared_root
+    def train(
+        self, shared_root, progress: Optional[TrainingProgress] = None
+    ) -> QuestionClassifierTrainingResult:
+        texts, labels = self.training_rows()
+        if use_incremental_training():
+            incremental = train_ridge_incremental(
+                ridge_stats_path(self.model_path),
+                self.feature_model_id(),
+                texts,
+                labels,
+                lambda changed: embed_with_progress(self.embed, changed, progress),
+            )
+            if incremental is not None:
+                # incremental updates skip cross validation
+                classifier, stats = incremental
+                return self.save(
+                    QuestionClassifierFitResult(classifier, stats, [], -1), progress
+                )
+        x = embed_with_progress(self.embed, texts, progress)
+        return self.save(
+            self.fit_classifier(self.feature_model_id(), texts, labels, x, progress),
+            progress,
+        )
+
+    def training_rows(self) -> Tuple[List[str], List[str]]:
+        # instance=<question, topic, answer_id, answer_text>
+        training_data = self.__load_training_data()
+        return (
+            [instance[0] for instance in training_data],
+            [instance[3] for instance in training_data],
         )
-        train_vectors = self.__load_training_vectors(training_data)
-        train_vectors = self.__load_topic_vectors(train_vectors)
-        (
-            x_train,
-            y_train,
-        ) = self.__load_xy_vectors(train_vectors)
-        (scores, accuracy, self.logistic_model) = self.__train_lr(
-            x_train,
-            y_train,
-            num_rows_having_paraphrases,
+
+    def feature_model_id(self) -> str:
+        w2v_file = self.w2v.get_w2v_file_path()
+        fingerprint = model_files_fingerprint(w2v_file, word2vec_native_path(w2v_file))
+        return f"{ARCH_LR}:{os.path.basename(w2v_file)}:{fingerprint}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        # get w2v vectors for all the questions
+        preprocessor = SpacyPreprocessor(self.shared_root)
+        return embed_with_store(
+            self.feature_model_id(),
+            texts,
+            lambda missing: self.w2v.w2v_for_questions(
+                preprocessor.transform_batch(missing)
+            ),
+        )
+
+    @staticmethod
+    def fit_classifier(
+        feature_model_id: str,
+        texts: List[str],
+        labels: List[str],
+        x,
+        progress: Optional[TrainingProgress] = None,
+    ) -> QuestionClassifierFitResult:
+        x_train = np.asarray(x, dtype=np.float32)
+        with training_stage(progress, STAGE_FIT):
+            logistic_model = RidgeClassifier(alpha=1.0)
+            logistic_model.fit(x_train, labels)
+            stats = RidgeStatistics.from_training_data(
+                feature_model_id, texts, labels, x_train
+            )
+        if len(set(labels)) == len(labels):
+            logging.warning(
+                "Classifier data had no questions with paraphrases. This makes cross validation checks fail, so they will be skipped"
+            )
+            return QuestionClassifierFitResult(logistic_model, stats, [], -1)
+        folds = cross_validation_folds()
+        with training_stage(
+            progress, STAGE_CROSS_VALIDATION, folds if isinstance(folds, int) else 0
+        ):
+            cv = cross_validate(
+                logistic_model,
+                x_train,
+                labels,
+                folds,
+                n_jobs=cross_validation_jobs(folds),
+                on_fold=progress.advance if progress else None,
+            )
+        return QuestionClassifierFitResult(
+            logistic_model, stats, cv.scores, cv.accuracy
         )
+
+    def save(
+        self,
+        fit: QuestionClassifierFitResult,
+        progress: Optional[TrainingProgress] = None,
+    ) -> QuestionClassifierTrainingResult:
         update_training(self.mentor.id)
-        os.makedirs(self.model_path, exist_ok=True)
-        joblib.dump(self.logistic_model, os.path.join(self.model_path, "model.pkl"))
-        with open(os.path.join(self.model_path, "w2v.txt"), "w") as f:
-            f.write(self.w2v.get_w2v_file_path())
-        return QuestionClassifierTrainingResult(scores, accuracy, self.model_path)
+        with training_stage(progress, STAGE_SAVE):
+            os.makedirs(self.model_path, exist_ok=True)
+            fit.stats.save(ridge_stats_path(self.model_path))
+            if self.mentor.has_serving_data():
+                self.mentor.save_snapshot(
+                    os.path.join(self.model_path, MENTOR_SNAPSHOT_FILE)
+                )
+            with open(os.path.join(self.model_path, "w2v.txt"), "w") as f:
+                f.write(self.w2v.get_w2v_file_path())
+            # last, everything else must be in place when watchers see the model
+            save_model(self.model_path, fit.classifier)
+        notify_model_updated(self.output_dir, self.mentor.id)
+        return QuestionClassifierTrainingResult(
+            fit.scores, fit.accuracy, self.model_path
+        )
 
-    def __load_training_data(self, shared_root):
-        preprocessor = SpacyPreprocessor(shared_root)
+    def __load_training_data(self):
         train_data = []
-        num_rows_having_paraphrases = 0
         for key in self.mentor.questions_by_id:
             question = self.mentor.questions_by_id[key]
             topics = question["topics"]
             current_question = question["question_text"]
-            num_rows_having_paraphrases += len(question["paraphrases"])
             answer = question["answer"]
             answer_id = key
             # add question to dataset
-            processed_question = preprocessor.transform(current_question)
-            # tokenize the question
-            train_data.append(
-                [current_question, processed_question, topics, answer_id, answer]
-            )
+            train_data.append([current_question, topics, answer_id, answer])
             # look for paraphrases and add them to dataset
             for paraphrase in question["paraphrases"]:
-                processed_paraphrase = preprocessor.transform(paraphrase)
-                train_data.append(
-                    [paraphrase, processed_paraphrase, topics, answer_id, answer]
-                )
-        return train_data, num_rows_having_paraphrases
-
-    def __load_training_vectors(self, train_data):
-        train_vectors = []
-        # for each data point, get w2v vector for the question and store in train_vectors.
-        # instance=<question, processed_question, topic, answer_id, answer_text>
-        for instance in train_data:
-            w2v_vector, lstm_vector = self.w2v.w2v_for_question(instance[1])
-            train_vectors.append(
-                [instance[0], w2v_vector.tolist(), instance[2], instance[4]]
-            )
-        return train_vectors
-
-    def __load_topic_vectors(self, train_vectors):
-        # Generate the sparse topic train_vectors
-        for i in range(len(train_vectors)):
-            # vector=train_vectors[i][1]
-            current_topics = train_vectors[i][2]
-            topic_vector = [0] * len(self.mentor.topics)
-            for j in range(len(self.mentor.topics)):
-                if self.mentor.topics[j] in current_topics:
-                    topic_vector[j] = 1
-            train_vectors[i][2] = topic_vector
-
-        return train_vectors
-
-    def __load_xy_vectors(self, train_data):
-        x_train = []
-        y_train = []
-        x_train = [train_data[i][1] for i in range(len(train_data))]
-        y_train = [train_data[i][3] for i in range(len(train_data))]
-        x_train = np.asarray(x_train)
-        return x_train, y_train
-
-    def __train_lr(
-        self,
-        x_train,
-        y_train,
-        num_rows_having_paraphrases,
-    ):
-        logistic_model = RidgeClassifier(alpha=1.0)
-        logistic_model.fit(x_train, y_train)
-        if num_rows_having_paraphrases < 1:
-            logging.warning(
-                "Classifier data had no questions with paraphrases. This makes cross validation checks fail, so they will be skipped"
-            )
-            return [], -1, logistic_model
-        scores = cross_val_score(logistic_model, x_train, y_train, cv=2)
-        predicted = cross_val_predict(logistic_model, x_train, y_train, cv=2)
-        accuracy = metrics.accuracy_score(y_train, predicted)
-        return scores, accuracy, logistic_model
+                train_data.append([paraphrase, topics, answer_id, answer])
+        return train_data
 
 
 def train(
@@ -153,7 +205,7 @@ def train(
     output_dir: str = "out",
     save_model: bool = True,
 ):
-    m = Mentor(mentor)
+    m = Mentor(mentor, purpose=training_mentor_data())
     classifier = LRQuestionClassifierTraining(m, shared_root, output_dir)
     result = classifier.train(shared_root)
     return result
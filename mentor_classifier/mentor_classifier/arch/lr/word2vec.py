@@ -4,12 +4,15 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
+import json
+import logging
+import os
 import numpy as np
 
 from gensim.models import KeyedVectors
 from gensim.models.keyedvectors import Word2VecKeyedVectors
-from os import path
-from typing import Dict
+from os import environ, path
+from typing import Dict, List, Optional
 
 WORD2VEC_MODELS: Dict[str, Word2VecKeyedVectors] = {}
 
@@ -22,27 +25,103 @@ class W2V(object):
     def get_w2v_file_path(self):
         return self.__w2v_file_path
 
-    def w2v_for_question(self, question):
-        current_vector = np.zeros(300, dtype="float32")
-        lstm_vector = []
-        for word in question:
-            try:
-                word_vector = self.__w2v_model[word]
-            except BaseException:
-                word_vector = np.zeros(300, dtype="float32")
-            lstm_vector.append(word_vector)
-            current_vector += word_vector
-        return current_vector, lstm_vector
+    def w2v_for_question(self, question: List[str]) -> np.ndarray:
+        return self.w2v_for_questions([question])[0]
+
+    def w2v_for_questions(self, questions: List[List[str]]) -> np.ndarray:
+        """
+        Returns a (len(questions), vector_size) float32 matrix
+        where each row is the sum of the vectors of a question's known words
+        """
+        key_to_index = self.__w2v_model.key_to_index
+        vectors = self.__w2v_model.vectors
+        result = np.zeros((len(questions), vectors.shape[1]), dtype=np.float32)
+        rows: List[int] = []
+        offsets: List[int] = []
+        indexes: List[int] = []
+        for i, question in enumerate(questions):
+            known = [key_to_index[word] for word in question if word in key_to_index]
+            if known:
+                rows.append(i)
+                offsets.append(len(indexes))
+                indexes.extend(known)
+        if indexes:
+            result[rows] = np.add.reduceat(
+                vectors[indexes], offsets, axis=0, dtype=np.float32
+            )
+        return result
+
+
+def word2vec_file(shared_root: str) -> str:
+    """
+    Set WORD2VEC_FILE to use a pruned word2vec file (see word2vec_prune)
+    """
+    return path.join(shared_root, environ.get("WORD2VEC_FILE") or "word2vec.bin")
+
+
+def word2vec_native_path(file_path: str) -> str:
+    return path.splitext(file_path)[0] + ".kv"
+
+
+def word2vec_source_path(native_path: str) -> str:
+    # the size and mtime of the file a native copy was converted from
+    return f"{native_path}.source.json"
+
+
+def _file_signature(file_path: str) -> dict:
+    st = os.stat(file_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _converted_from(native_path: str) -> Optional[dict]:
+    try:
+        with open(word2vec_source_path(native_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_native_word2vec_current(file_path: str) -> bool:
+    """
+    Whether there is a native copy of file_path converted from its current version
+    """
+    native_path = word2vec_native_path(file_path)
+    if not path.isfile(native_path):
+        return False
+    if not path.isfile(file_path):
+        # e.g. only the native copy is deployed
+        return True
+    return _converted_from(native_path) == _file_signature(file_path)
 
 
 def find_or_load_word2vec(file_path: str) -> Word2VecKeyedVectors:
     abs_path = path.abspath(file_path)
     if abs_path not in WORD2VEC_MODELS:
-        WORD2VEC_MODELS[abs_path] = KeyedVectors.load_word2vec_format(
-            abs_path, binary=True
-        )
+        WORD2VEC_MODELS[abs_path] = load_word2vec_model(abs_path)
     return WORD2VEC_MODELS[abs_path]
 
 
-def load_word2vec_model(path: str) -> Word2VecKeyedVectors:
-    return KeyedVectors.load_word2vec_format(path, binary=True)
+def load_word2vec_model(file_path: str) -> Word2VecKeyedVectors:
+    """
+    Loads the native (gensim) copy of a word2vec.bin file if it has been converted,
+    memory-mapped read only so that all processes on a host share one copy of the vectors.
+    A native copy converted from a different version of the file is not used.
+    """
+    native_path = word2vec_native_path(file_path)
+    if is_native_word2vec_current(file_path):
+        return KeyedVectors.load(native_path, mmap="r")
+    if path.isfile(native_path):
+        logging.warning(
+            f"{native_path} was not converted from the current {file_path}, ignoring it"
+        )
+    return KeyedVectors.load_word2vec_format(file_path, binary=True)
+
+
+def convert_word2vec_to_native(file_path: str) -> str:
+    native_path = word2vec_native_path(file_path)
+    w2v = KeyedVectors.load_word2vec_format(file_path, binary=True)
+    # vectors must be saved as a separate .npy file to be memory-mapped
+    w2v.save(native_path, separately=["vectors"])
+    with open(word2vec_source_path(native_path), "w") as f:
+        json.dump(_file_signature(file_path), f)
+    return native_path
@@ -0,0 +1,121 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+"""
+Builds a reduced word2vec.bin that keeps only the words LR models can use:
+the lemmas of all mentors' questions and paraphrases (plus any extra texts, e.g. user queries)
+and the top_n most frequent words as a fallback for words not seen in training.
+
+usage: python -m mentor_classifier.arch.lr.word2vec_prune --shared shared/installed --models models
+(writes shared/installed/word2vec_pruned.bin, use it by setting WORD2VEC_FILE=word2vec_pruned.bin)
+"""
+import argparse
+import logging
+import os
+import shutil
+from typing import BinaryIO, Iterable, Iterator, List, Set, Tuple
+
+from mentor_classifier.api import MENTOR_DATA_TRAINING
+from mentor_classifier.mentor import Mentor
+from mentor_classifier.spacy_preprocessor import SpacyPreprocessor
+
+READ_SIZE = 1024 * 1024
+
+
+def mentor_vocabulary(
+    mentor_ids: Iterable[str], shared_root: str, texts: Iterable[str] = ()
+) -> Set[str]:
+    preprocessor = SpacyPreprocessor(shared_root, lemmas_only=True)
+    all_texts = list(texts)
+    for mentor_id in mentor_ids:
+        mentor = Mentor(mentor_id, purpose=MENTOR_DATA_TRAINING)
+        for question in mentor.questions_by_id.values():
+            all_texts.append(question["question_text"])
+            all_texts.extend(question["paraphrases"])
+    vocab: Set[str] = set()
+    for tokens in preprocessor.transform_batch(all_texts):
+        vocab.update(tokens)
+    return vocab
+
+
+def _read_entries(f: BinaryIO, vector_bytes: int) -> Iterator[Tuple[bytes, bytes]]:
+    buf = b""
+    pos = 0
+    while True:
+        space = buf.find(b" ", pos)
+        if space < 0 or len(buf) - space - 1 < vector_bytes:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                if buf[pos:].strip():
+                    raise ValueError("word2vec file is truncated")
+                return
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        start = space + 1
+        end = start + vector_bytes
+        yield buf[pos:space].lstrip(b"\n"), buf[start:end]
+        pos = end
+
+
+def prune_word2vec(
+    src_path: str, dst_path: str, vocab: Set[str], top_n: int = 50000
+) -> int:
+    """
+    Streams the word2vec binary file at src_path and writes the entries
+    that are either in vocab or among the first top_n (the most frequent) to dst_path.
+    Returns the number of words written.
+    """
+    body_path = f"{dst_path}.body"
+    n_words = 0
+    with open(src_path, "rb") as src, open(body_path, "wb") as body:
+        header = src.readline().split()
+        vector_size = int(header[1])
+        for i, (word, vector) in enumerate(_read_entries(src, vector_size * 4)):
+            if i < top_n or word.decode("utf-8", errors="ignore") in vocab:
+                body.write(word + b" " + vector + b"\n")
+                n_words += 1
+    with open(dst_path, "wb") as dst, open(body_path, "rb") as body:
+        dst.write(f"{n_words} {vector_size}\n".encode("utf-8"))
+        shutil.copyfileobj(body, dst)
+    os.remove(body_path)
+    return n_words
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="build a pruned word2vec file")
+    parser.add_argument("--shared", default="shared/installed")
+    parser.add_argument(
+        "--models", default="", help="train vocab for every mentor with models here"
+    )
+    parser.add_argument("--mentor", action="append", default=[])
+    parser.add_argument(
+        "--texts", action="append", default=[], help="file with one question per line"
+    )
+    parser.add_argument("--top-n", type=int, default=50000)
+    parser.add_argument("--output", default="word2vec_pruned.bin")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    mentor_ids = list(args.mentor)
+    if args.models:
+        mentor_ids.extend(
+            m
+            for m in sorted(os.listdir(args.models))
+            if os.path.isdir(os.path.join(args.models, m))
+        )
+    texts: List[str] = []
+    for texts_file in args.texts:
+        with open(texts_file) as f:
+            texts.extend(line.strip() for line in f if line.strip())
+    vocab = mentor_vocabulary(mentor_ids, args.shared, texts)
+    logging.info(f"{len(vocab)} words used by {len(mentor_ids)} mentors")
+    n_words = prune_word2vec(
+        os.path.join(args.shared, "word2vec.bin"),
+        os.path.join(args.shared, args.output),
+        vocab,
+        args.top_n,
+    )
+    logging.info(f"wrote {n_words} words to {args.output}")
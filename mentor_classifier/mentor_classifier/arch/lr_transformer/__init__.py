@@ -32,5 +32,11 @@ class TransformerClassifierFactory(ArchClassifierFactory):
             mentor=mentor, shared_root=shared_root, data_path=data_path
         )
 
+    def preload_training(self, shared_root: str) -> None:
+        # get_model_id also loads the encoder the embeddings use
+        TransformersQuestionClassifierTraining.load_transformer(
+            shared_root
+        ).get_model_id()
+
 
 register_classifier_factory(ARCH_LR_TRANSFORMER, TransformerClassifierFactory())
@@ -0,0 +1,124 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import logging
+import os
+import queue
+import threading
+import time
+from os import environ
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+class _EncodeRequest:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.embeddings: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+
+
+class EmbeddingScheduler:
+    """
+    Collects concurrent encode requests for up to max_wait seconds
+    (or until max_batch_size texts are waiting), encodes them in one batch
+    and hands each caller back its own rows
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+    ):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pid = os.getpid()
+        self._queue: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, texts: List[str]) -> np.ndarray:
+        self.__ensure_started()
+        request = _EncodeRequest(texts)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        assert request.embeddings is not None
+        return request.embeddings
+
+    def __ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.__run, name="embedding-scheduler", daemon=True
+                )
+                self._thread.start()
+
+    def __run(self) -> None:
+        while True:
+            batch = self.__next_batch()
+            try:
+                embeddings = self.encode([t for r in batch for t in r.texts])
+                offset = 0
+                for r in batch:
+                    r.embeddings = embeddings[offset:][: len(r.texts)]
+                    offset += len(r.texts)
+            except BaseException as err:
+                logging.exception("failed to encode batch")
+                for r in batch:
+                    r.error = err
+            for r in batch:
+                r.done.set()
+
+    def __next_batch(self) -> List[_EncodeRequest]:
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                r = self._queue.get(timeout=timeout) if timeout > 0 else None
+            except queue.Empty:
+                r = None
+            if r is None:
+                # take whatever else is already waiting, without waiting any longer
+                try:
+                    r = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            batch.append(r)
+            size += len(r.texts)
+        return batch
+
+
+def _max_wait_ms() -> float:
+    return float(environ.get("EMBEDDING_BATCH_MAX_WAIT_MS") or "0")
+
+
+def use_embedding_scheduler() -> bool:
+    """
+    Off unless EMBEDDING_BATCH_MAX_WAIT_MS is set:
+    a lone request waits out the whole window,
+    so batching only pays off under concurrent traffic
+    """
+    return _max_wait_ms() > 0
+
+
+def new_embedding_scheduler(
+    encode: Callable[[List[str]], np.ndarray]
+) -> EmbeddingScheduler:
+    return EmbeddingScheduler(
+        encode,
+        max_batch_size=int(environ.get("EMBEDDING_BATCH_MAX_SIZE") or "32"),
+        max_wait=_max_wait_ms() / 1000,
+    )
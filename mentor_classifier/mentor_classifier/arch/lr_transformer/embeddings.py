@@ -4,23 +4,91 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
-from mentor_classifier.sentence_transformer import find_or_load_sentence_transformer
+from mentor_classifier.embedding_store import model_files_fingerprint
+from mentor_classifier.sentence_transformer import (
+    MODEL_NAME,
+    TORCHSCRIPT_DIR,
+    TorchScriptSentenceEncoder,
+    find_or_load_sentence_encoder,
+    find_or_load_sentence_transformer,
+)
 from sentence_transformers import SentenceTransformer
 import joblib
+import os
 import sys
 from os import path
-from typing import List, Union
+from threading import Lock
+from typing import List, Optional, Union
+
+from .embedding_scheduler import (
+    EmbeddingScheduler,
+    new_embedding_scheduler,
+    use_embedding_scheduler,
+)
+
+_scheduler_lock = Lock()
 
 
 class TransformerEmbeddings:
     def __init__(self, shared_root: str):
+        self.transformer_path = path.join(shared_root, "sentence-transformer")
         self.transformer: SentenceTransformer = find_or_load_sentence_transformer(
-            path.join(shared_root, "sentence-transformer")
+            self.transformer_path
         )
 
+    def __getstate__(self):
+        # the scheduler (thread, queue) is per process and never pickled
+        state = self.__dict__.copy()
+        state.pop("_scheduler", None)
+        return state
+
     def get_embeddings(self, data: Union[str, List[str]]):
-        embeddings = self.transformer.encode(data, show_progress_bar=True)
-        return embeddings
+        texts = [data] if isinstance(data, str) else list(data)
+        scheduler = self.__find_scheduler()
+        if scheduler is None or len(texts) >= scheduler.max_batch_size:
+            embeddings = self.__find_encoder().encode(texts, show_progress_bar=True)
+        else:
+            # small requests (e.g. a user question) are batched with concurrent ones
+            embeddings = scheduler.submit(texts)
+        return embeddings[0] if isinstance(data, str) else embeddings
+
+    def get_model_id(self) -> str:
+        """
+        Identifies the model (and backend) that produces the embeddings,
+        including a fingerprint of its files so the id changes when they do
+        """
+        if isinstance(self.__find_encoder(), TorchScriptSentenceEncoder):
+            backend, model_dir = "torchscript-int8", TORCHSCRIPT_DIR
+        else:
+            # the quantized artifact is derived from these weights, so is not included
+            backend, model_dir = "torch", MODEL_NAME
+        transformer_path = getattr(self, "transformer_path", "")
+        if not transformer_path:
+            return f"{MODEL_NAME}:{backend}"
+        fingerprint = model_files_fingerprint(path.join(transformer_path, model_dir))
+        return f"{MODEL_NAME}:{backend}:{fingerprint}"
+
+    def __encode_batch(self, texts: List[str]):
+        return self.__find_encoder().encode(texts, show_progress_bar=False)
+
+    def __find_encoder(self):
+        # instances pickled before transformer_path existed always use torch
+        transformer_path = getattr(self, "transformer_path", "")
+        if not transformer_path:
+            return self.transformer
+        return find_or_load_sentence_encoder(transformer_path)
+
+    def __find_scheduler(self) -> Optional[EmbeddingScheduler]:
+        if not use_embedding_scheduler():
+            return None
+        scheduler: Optional[EmbeddingScheduler] = getattr(self, "_scheduler", None)
+        if scheduler is None or scheduler.pid != os.getpid():
+            with _scheduler_lock:
+                scheduler = getattr(self, "_scheduler", None)
+                if scheduler is None or scheduler.pid != os.getpid():
+                    scheduler = new_embedding_scheduler(self.__encode_batch)
+                    self._scheduler = scheduler
+        return scheduler
 
 
 if __name__ == "__main__":
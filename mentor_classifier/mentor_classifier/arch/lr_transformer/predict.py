@@ -8,17 +8,23 @@ import logging
 import os
 import random
 import joblib
+import numpy as np
 from mentor_classifier import (
+    AnswerCandidate,
     QuestionClassifierPrediction,
     QuestionClassiferPredictionResult,
     mentor_model_path,
     ARCH_LR_TRANSFORMER,
     Media,
 )
-from mentor_classifier.api import create_user_question, OFF_TOPIC_THRESHOLD_DEFAULT
-from mentor_classifier.mentor import Mentor
-from mentor_classifier.utils import file_last_updated_at, sanitize_string
-from typing import Union, Tuple, List
+from mentor_classifier.api import OFF_TOPIC_THRESHOLD_DEFAULT
+from mentor_classifier.feature_cache import find_or_create_query_feature_cache
+from mentor_classifier.feedback import log_user_question
+from mentor_classifier.mentor import Mentor, find_mentor
+from mentor_classifier.model_artifact import load_model, model_file
+from mentor_classifier.scoring import LinearScorer
+from mentor_classifier.utils import deep_sizeof, file_last_updated_at, sanitize_string
+from typing import Union, Tuple, List, Optional
 from ...log import logger
 from .embeddings import TransformerEmbeddings
 
@@ -27,21 +33,24 @@ AnswerIdTextAndMedia = Tuple[str, str, list]
 
 class TransformersQuestionClassifierPrediction(QuestionClassifierPrediction):
     transformer: TransformerEmbeddings  # shared between mentors
+    feature_model_id: str
 
     def __init__(self, mentor: Union[str, Mentor], shared_root: str, data_path: str):
         if isinstance(mentor, str):
             logging.info("loading mentor id {}...".format(mentor))
-            mentor = Mentor(mentor)
+            mentor = find_mentor(
+                mentor, mentor_model_path(data_path, mentor, ARCH_LR_TRANSFORMER)
+            )
         assert isinstance(
             mentor, Mentor
         ), "invalid type for mentor (expected mentor.Mentor or string id for a mentor, encountered {}".format(
             type(mentor)
         )
         self.mentor = mentor
-        self.model_file = mentor_model_path(
-            data_path, mentor.id, ARCH_LR_TRANSFORMER, "model.pkl"
-        )
+        self.model_path = mentor_model_path(data_path, mentor.id, ARCH_LR_TRANSFORMER)
+        self.model_file = model_file(self.model_path)
         self.model = self.__load_model()
+        self.scorer = LinearScorer(self.model)
         self.transformer = self.__load_transformer(shared_root)
 
     def __load_transformer(self, shared_root):
@@ -52,39 +61,109 @@ class TransformersQuestionClassifierPrediction(QuestionClassifierPrediction):
             # class variable, load just once
             logger.info(f"loading transformers from {shared_root}")
             transformer = joblib.load(os.path.join(shared_root, "transformer.pkl"))
+            # the path the pickle was generated with may not exist here
+            transformer.transformer_path = os.path.join(
+                shared_root, "sentence-transformer"
+            )
             setattr(
                 TransformersQuestionClassifierPrediction, "transformer", transformer
             )
+            setattr(
+                TransformersQuestionClassifierPrediction,
+                "feature_model_id",
+                f"{ARCH_LR_TRANSFORMER}:{os.path.abspath(shared_root)}",
+            )
         return TransformersQuestionClassifierPrediction.transformer
 
     def evaluate(
-        self, question: str, shared_root, canned_question_match_disabled: bool = False
+        self,
+        question: str,
+        shared_root,
+        canned_question_match_disabled: bool = False,
+        top_k: int = 0,
     ) -> QuestionClassiferPredictionResult:
+        return self.evaluate_batch(
+            [question],
+            shared_root,
+            canned_question_match_disabled=canned_question_match_disabled,
+            top_k=top_k,
+        )[0]
 
-        sanitized_question = sanitize_string(question)
-        if not canned_question_match_disabled:
-            if sanitized_question in self.mentor.questions_by_text:
-                q = self.mentor.questions_by_text[sanitized_question]
-                answer_id = q["answer_id"]
-                answer = q["answer"]
-                answer_media = q["media"]
-                feedback_id = create_user_question(
-                    self.mentor.id,
-                    question,
-                    answer_id,
-                    "PARAPHRASE"
-                    if sanitized_question != sanitize_string(q["question_text"])
-                    else "EXACT",
-                    1.0,
+    def evaluate_batch(
+        self,
+        questions: List[str],
+        shared_root,
+        canned_question_match_disabled: bool = False,
+        top_k: int = 0,
+    ) -> List[QuestionClassiferPredictionResult]:
+        results: List[Optional[QuestionClassiferPredictionResult]] = [
+            None
+            if canned_question_match_disabled
+            else self.__find_canned(question, top_k)
+            for question in questions
+        ]
+        unmatched = [i for i, result in enumerate(results) if result is None]
+        if unmatched:
+            embedded_questions = np.array(
+                find_or_create_query_feature_cache().get_many(
+                    TransformersQuestionClassifierPrediction.feature_model_id,
+                    [questions[i] for i in unmatched],
+                    self.transformer.get_embeddings,
                 )
-                return QuestionClassiferPredictionResult(
-                    answer_id, answer, answer_media, 1.0, feedback_id
+            )
+            predictions = self.__get_predictions(embedded_questions, top_k)
+            for i, candidates in zip(unmatched, predictions):
+                results[i] = self.__to_classifier_result(
+                    questions[i], candidates, top_k
                 )
-        embedded_question = self.transformer.get_embeddings(question)
-        answer_id, answer, answer_media, highest_confidence = self.__get_prediction(
-            embedded_question
+        return [result for result in results if result is not None]
+
+    def get_last_trained_at(self) -> float:
+        return file_last_updated_at(self.model_file)
+
+    def get_resident_size(self) -> int:
+        return deep_sizeof(self.model, self.scorer, self.mentor)
+
+    def __load_model(self):
+        logging.info("loading model from path {}...".format(self.model_file))
+        return load_model(self.model_path)
+
+    def __find_canned(
+        self, question: str, top_k: int
+    ) -> Optional[QuestionClassiferPredictionResult]:
+        sanitized_question = sanitize_string(question)
+        if sanitized_question not in self.mentor.questions_by_text:
+            return None
+        q = self.mentor.questions_by_text[sanitized_question]
+        answer_id = q["answer_id"]
+        answer = q["answer"]
+        answer_media = q["media"]
+        feedback_id = log_user_question(
+            self.mentor.id,
+            question,
+            answer_id,
+            "PARAPHRASE"
+            if sanitized_question != sanitize_string(q["question_text"])
+            else "EXACT",
+            1.0,
+        )
+        return QuestionClassiferPredictionResult(
+            answer_id,
+            answer,
+            answer_media,
+            1.0,
+            feedback_id,
+            [AnswerCandidate(answer_id, answer, 1.0)] if top_k > 0 else [],
         )
-        feedback_id = create_user_question(
+
+    def __to_classifier_result(
+        self,
+        question: str,
+        candidates: List[Tuple[str, str, List[Media], float]],
+        top_k: int,
+    ) -> QuestionClassiferPredictionResult:
+        answer_id, answer, answer_media, highest_confidence = candidates[0]
+        feedback_id = log_user_question(
             self.mentor.id,
             question,
             answer_id,
@@ -96,30 +175,39 @@ class TransformersQuestionClassifierPrediction(QuestionClassifierPrediction):
         if highest_confidence < OFF_TOPIC_THRESHOLD_DEFAULT:
             answer_id, answer, answer_media = self.__get_offtopic()
         return QuestionClassiferPredictionResult(
-            answer_id, answer, answer_media, highest_confidence, feedback_id
+            answer_id,
+            answer,
+            answer_media,
+            highest_confidence,
+            feedback_id,
+            [AnswerCandidate(c[0], c[1], c[3]) for c in candidates]
+            if top_k > 0
+            else [],
         )
 
-    def get_last_trained_at(self) -> float:
-        return file_last_updated_at(self.model_file)
-
-    def __load_model(self):
-        logging.info("loading model from path {}...".format(self.model_file))
-        return joblib.load(self.model_file)
+    def __get_predictions(
+        self, embedded_questions, top_k: int
+    ) -> List[List[Tuple[str, str, List[Media], float]]]:
+        best, best_scores = self.scorer.top_k(embedded_questions, top_k)
+        return [
+            [
+                self.__get_answer(str(self.scorer.classes[i]), float(confidence))
+                for i, confidence in zip(row, row_scores)
+            ]
+            for row, row_scores in zip(best, best_scores)
+        ]
 
-    def __get_prediction(
-        self, embedded_question
+    def __get_answer(
+        self, answer_id: str, highest_confidence: float
     ) -> Tuple[str, str, List[Media], float]:
-        prediction = self.model.predict([embedded_question])
-        decision = self.model.decision_function([embedded_question])
-        highest_confidence = max(decision[0])
-        answer_text = self.mentor.answer_id_by_answer[prediction[0]]
+        answer_text = self.mentor.answer_id_by_answer[answer_id]
         answer_key = sanitize_string(answer_text)
         answer_media = (
             self.mentor.questions_by_answer[answer_key].get("media", [])
             if answer_key in self.mentor.questions_by_answer
             else []
         )
-        return prediction[0], answer_text, answer_media, float(highest_confidence)
+        return answer_id, answer_text, answer_media, highest_confidence
 
     def __get_offtopic(self) -> AnswerIdTextAndMedia:
         try:
@@ -11,20 +11,47 @@ import numpy as np
 from sklearn.linear_model import LogisticRegression
 from sklearn.linear_model import RidgeClassifier
 from sklearn.metrics import accuracy_score
-from sklearn.model_selection import cross_val_score
 
 from mentor_classifier import (
+    QuestionClassifierFitResult,
     QuestionClassifierTraining,
     QuestionClassifierTrainingResult,
     mentor_model_path,
     ARCH_LR_TRANSFORMER,
 )
-from mentor_classifier.mentor import Mentor
+from mentor_classifier.cross_validation import (
+    LEAVE_ONE_OUT,
+    cross_validate,
+    cross_validation_folds,
+    cross_validation_jobs,
+)
+from mentor_classifier.embedding_store import embed_with_store
+from mentor_classifier.mentor import (
+    MENTOR_SNAPSHOT_FILE,
+    Mentor,
+    training_mentor_data,
+)
+from mentor_classifier.model_artifact import save_model
+from mentor_classifier.model_watcher import notify_model_updated
+from mentor_classifier.training_progress import (
+    STAGE_CROSS_VALIDATION,
+    STAGE_FIT,
+    STAGE_SAVE,
+    TrainingProgress,
+    embed_with_progress,
+    training_stage,
+)
+from mentor_classifier.ridge_stats import (
+    RidgeStatistics,
+    ridge_stats_path,
+    train_ridge_incremental,
+    use_incremental_training,
+)
 from .embeddings import TransformerEmbeddings
 from ...api import update_training
 from ...log import logger
 from ...utils import sanitize_string
-from typing import Union, Tuple, List
+from typing import Optional, Union, Tuple, List
 
 
 class TransformersQuestionClassifierTraining(QuestionClassifierTraining):
@@ -38,44 +65,58 @@ class TransformersQuestionClassifierTraining(QuestionClassifierTraining):
     ):
         if isinstance(mentor, str):
             logger.info("loading mentor id {}...".format(mentor))
-            mentor = Mentor(mentor)
+            mentor = Mentor(mentor, purpose=training_mentor_data())
         assert isinstance(
             mentor, Mentor
         ), "invalid type for mentor (expected mentor.Mentor or string id for a mentor, encountered {}".format(
             type(mentor)
         )
         self.mentor = mentor
+        self.output_dir = output_dir
         self.model_path = mentor_model_path(output_dir, mentor.id, ARCH_LR_TRANSFORMER)
-        self.transformer = self.__load_transformer(shared_root)
+        self.transformer = self.load_transformer(shared_root)
 
-    def __load_transformer(self, shared_root):
+    @staticmethod
+    def load_transformer(shared_root: str) -> TransformerEmbeddings:
         if getattr(TransformersQuestionClassifierTraining, "transformer", None) is None:
             # class variable, load just once
             transformer_pkl = os.path.join(shared_root, "transformer.pkl")
             logger.info(f"loading transformers from {transformer_pkl}")
             transformer = joblib.load(transformer_pkl)
+            # the path the pickle was generated with may not exist here
+            transformer.transformer_path = os.path.join(
+                shared_root, "sentence-transformer"
+            )
             setattr(TransformersQuestionClassifierTraining, "transformer", transformer)
         return TransformersQuestionClassifierTraining.transformer
 
-    def train(self, shared_root) -> QuestionClassifierTrainingResult:
-        x_train, y_train = self.__load_training_data()
-        x_train, y_train = self.__load_transformer_embeddings(x_train, y_train)
-        classifier = self.train_ridge_classifier(x_train, y_train)
-        training_accuracy = self.calculate_accuracy(
-            classifier.predict(x_train), y_train
-        )
-        scores = cross_val_score(classifier, x_train, y_train, cv=2)
-        # cv_accuracy = self.calculate_accuracy(
-        #     cross_val_predict(self.classifier, x_train, y_train, cv=2), y_train
-        # )
-        update_training(self.mentor.id)
-        os.makedirs(self.model_path, exist_ok=True)
-        joblib.dump(classifier, os.path.join(self.model_path, "model.pkl"))
-        return QuestionClassifierTrainingResult(
-            scores, training_accuracy, self.model_path
+    def train(
+        self, shared_root, progress: Optional[TrainingProgress] = None
+    ) -> QuestionClassifierTrainingResult:
+        questions, answer_ids = self.training_rows()
+        if use_incremental_training():
+            incremental = train_ridge_incremental(
+                ridge_stats_path(self.model_path),
+                self.feature_model_id(),
+                questions,
+                answer_ids,
+                lambda changed: embed_with_progress(self.embed, changed, progress),
+            )
+            if incremental is not None:
+                # incremental updates skip cross validation
+                classifier, stats = incremental
+                return self.save(
+                    QuestionClassifierFitResult(classifier, stats, [], -1), progress
+                )
+        x = embed_with_progress(self.embed, questions, progress)
+        return self.save(
+            self.fit_classifier(
+                self.feature_model_id(), questions, answer_ids, x, progress
+            ),
+            progress,
         )
 
-    def __load_training_data(self) -> Tuple[List[str], List[str]]:
+    def training_rows(self) -> Tuple[List[str], List[str]]:
         x_train = []
         y_train = []
         for key in self.mentor.questions_by_id:
@@ -91,10 +132,66 @@ class TransformersQuestionClassifierTraining(QuestionClassifierTraining):
                 y_train.append(answer_id)
         return x_train, y_train
 
-    def __load_transformer_embeddings(
-        self, x_train: List[str], y_train: List[str]
-    ) -> np.array:
-        return np.array(self.transformer.get_embeddings(x_train)), np.array(y_train)
+    def feature_model_id(self) -> str:
+        return self.transformer.get_model_id()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return embed_with_store(
+            self.feature_model_id(), texts, self.transformer.get_embeddings
+        )
+
+    @staticmethod
+    def fit_classifier(
+        feature_model_id: str,
+        texts: List[str],
+        labels: List[str],
+        x,
+        progress: Optional[TrainingProgress] = None,
+    ) -> QuestionClassifierFitResult:
+        y_train = np.array(labels)
+        with training_stage(progress, STAGE_FIT):
+            classifier = RidgeClassifier(alpha=1.0)
+            classifier.fit(x, y_train)
+            stats = RidgeStatistics.from_training_data(
+                feature_model_id, texts, labels, x
+            )
+        folds = cross_validation_folds()
+        if len(set(labels)) == len(labels):
+            # no answer has two questions to split into folds, but LOO needs none
+            folds = LEAVE_ONE_OUT
+        with training_stage(
+            progress, STAGE_CROSS_VALIDATION, folds if isinstance(folds, int) else 0
+        ):
+            cv = cross_validate(
+                classifier,
+                x,
+                y_train,
+                folds,
+                n_jobs=cross_validation_jobs(folds),
+                on_fold=progress.advance if progress else None,
+            )
+        # the out-of-fold accuracy, with no extra predict over the training data
+        return QuestionClassifierFitResult(classifier, stats, cv.scores, cv.accuracy)
+
+    def save(
+        self,
+        fit: QuestionClassifierFitResult,
+        progress: Optional[TrainingProgress] = None,
+    ) -> QuestionClassifierTrainingResult:
+        update_training(self.mentor.id)
+        with training_stage(progress, STAGE_SAVE):
+            os.makedirs(self.model_path, exist_ok=True)
+            fit.stats.save(ridge_stats_path(self.model_path))
+            if self.mentor.has_serving_data():
+                self.mentor.save_snapshot(
+                    os.path.join(self.model_path, MENTOR_SNAPSHOT_FILE)
+                )
+            # last, everything else must be in place when watchers see the model
+            save_model(self.model_path, fit.classifier)
+        notify_model_updated(self.output_dir, self.mentor.id)
+        return QuestionClassifierTrainingResult(
+            fit.scores, fit.accuracy, self.model_path
+        )
 
     def train_ridge_classifier(
         self, x_train: List[str], y_train: List[str], alpha: float = 1.0
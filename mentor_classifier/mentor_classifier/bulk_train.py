@@ -0,0 +1,268 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+"""
+Retrains the classifiers of many mentors together, e.g. after upgrading
+the word2vec or sentence-transformer assets:
+mentor data is fetched concurrently, the texts of all mentors are embedded
+in large deduplicated batches with the shared models loaded once,
+and the per-mentor classifiers are fit across a process pool.
+
+usage: python -m mentor_classifier.bulk_train --shared shared/installed --output models --mentor all
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from os import environ
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from mentor_classifier import (
+    ARCH_DEFAULT,
+    ClassifierFactory,
+    QuestionClassifierFitResult,
+    QuestionClassifierTraining,
+    mentor_model_path,
+)
+from mentor_classifier.mentor import Mentor, training_mentor_data
+
+ALL_MENTORS = "all"
+
+
+@dataclass
+class MentorTrainingReport:
+    mentor: str
+    fetch_seconds: float = 0.0
+    fit_seconds: float = 0.0
+    accuracy: float = -1
+    error: str = ""
+
+
+OnProgress = Callable[[MentorTrainingReport, int, int], None]
+
+
+def trained_mentor_ids(output_dir: str, arch: str) -> List[str]:
+    """
+    Returns the ids of the mentors that have a model for arch in output_dir
+    """
+    if not os.path.isdir(output_dir):
+        return []
+    return [
+        m
+        for m in sorted(os.listdir(output_dir))
+        if os.path.isdir(mentor_model_path(output_dir, m, arch))
+    ]
+
+
+def resolve_mentor_ids(mentors: List[str], output_dir: str, arch: str) -> List[str]:
+    if ALL_MENTORS in mentors:
+        return trained_mentor_ids(output_dir, arch)
+    return list(dict.fromkeys(mentors))
+
+
+def _fetch_mentor(mentor_id: str) -> Tuple[Optional[Mentor], float, str]:
+    start = time.perf_counter()
+    try:
+        mentor = Mentor(mentor_id, purpose=training_mentor_data())
+        return mentor, time.perf_counter() - start, ""
+    except Exception as err:
+        logging.exception(err)
+        return None, time.perf_counter() - start, str(err)
+
+
+def _fit(
+    fit_classifier, feature_model_id: str, texts: List[str], labels: List[str], x
+) -> Tuple[QuestionClassifierFitResult, float]:
+    start = time.perf_counter()
+    fit = fit_classifier(feature_model_id, texts, labels, x)
+    return fit, time.perf_counter() - start
+
+
+def _limit_cross_validation_jobs(jobs: int) -> None:
+    # fit processes share the cpus, so each cross-validates with its share of them
+    environ["CROSS_VALIDATION_JOBS"] = str(jobs)
+
+
+def _embed_pooled(
+    trainings: List[QuestionClassifierTraining],
+    rows: Dict[str, Tuple[List[str], List[str]]],
+    batch_size: int,
+) -> Dict[str, np.ndarray]:
+    """
+    Embeds the deduplicated texts of all the given trainings (which share
+    a feature model) in batches of batch_size and returns each mentor's x
+    """
+    texts = list(
+        dict.fromkeys(t for training in trainings for t in rows[training.mentor.id][0])
+    )
+    start = time.perf_counter()
+    batches = []
+    for i in range(0, len(texts), batch_size):
+        end = i + batch_size
+        batches.append(np.asarray(trainings[0].embed(texts[i:end])))
+    vectors = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+    logging.info(
+        f"embedded {len(texts)} unique texts for {len(trainings)} mentors"
+        f" in {time.perf_counter() - start:.1f}s"
+    )
+    row_by_text = {t: i for i, t in enumerate(texts)}
+    return {
+        training.mentor.id: vectors[
+            [row_by_text[t] for t in rows[training.mentor.id][0]]
+        ]
+        for training in trainings
+    }
+
+
+def bulk_train(
+    mentors: List[str],
+    shared_root: str = "shared",
+    output_dir: str = "out",
+    arch: str = "",
+    fetch_workers: int = 8,
+    fit_processes: int = 0,
+    batch_size: int = 512,
+    on_progress: Optional[OnProgress] = None,
+) -> List[MentorTrainingReport]:
+    """
+    Retrains the classifier of every mentor in mentors (or of every mentor
+    with a model in output_dir if mentors contains 'all')
+    and returns a report per mentor. A mentor that fails does not stop the others.
+
+    Classifiers are fit in fit_processes processes (default: one per cpu),
+    each cross-validating in its share of the cpus,
+    or in this process if fit_processes is 1 or this is a daemon process
+    (e.g. a celery prefork worker) that cannot have children.
+    on_progress is called with each mentor's report as it completes
+    and the number of mentors done and total.
+    """
+    arch = arch or environ.get("CLASSIFIER_ARCH") or ARCH_DEFAULT
+    mentor_ids = resolve_mentor_ids(mentors, output_dir, arch)
+    reports = {m: MentorTrainingReport(m) for m in mentor_ids}
+    done = 0
+
+    def complete(report: MentorTrainingReport):
+        nonlocal done
+        done += 1
+        if report.error:
+            logging.error(f"[{done}/{len(mentor_ids)}] {report.mentor}: {report.error}")
+        else:
+            logging.info(
+                f"[{done}/{len(mentor_ids)}] {report.mentor}: "
+                f"accuracy {report.accuracy:.3f}, fetch {report.fetch_seconds:.1f}s,"
+                f" fit {report.fit_seconds:.1f}s"
+            )
+        if on_progress:
+            on_progress(report, done, len(mentor_ids))
+
+    with ThreadPoolExecutor(max_workers=max(1, fetch_workers)) as pool:
+        fetched = list(pool.map(_fetch_mentor, mentor_ids))
+    trainings: List[QuestionClassifierTraining] = []
+    rows: Dict[str, Tuple[List[str], List[str]]] = {}
+    for mentor_id, (mentor, fetch_seconds, error) in zip(mentor_ids, fetched):
+        report = reports[mentor_id]
+        report.fetch_seconds = fetch_seconds
+        try:
+            if mentor is None:
+                raise Exception(error)
+            # shared models are loaded by the first training, so create them in turn
+            training = ClassifierFactory().new_training(
+                mentor, shared_root, output_dir, arch
+            )
+            rows[mentor_id] = training.training_rows()
+            trainings.append(training)
+        except Exception as err:
+            report.error = report.error or str(err)
+            complete(report)
+    trainings_by_model: Dict[str, List[QuestionClassifierTraining]] = {}
+    for training in trainings:
+        trainings_by_model.setdefault(training.feature_model_id(), []).append(training)
+    x_by_mentor: Dict[str, np.ndarray] = {}
+    for group in trainings_by_model.values():
+        try:
+            x_by_mentor.update(_embed_pooled(group, rows, batch_size))
+        except Exception as err:
+            logging.exception(err)
+            for training in group:
+                report = reports[training.mentor.id]
+                report.error = str(err)
+                complete(report)
+    trainings = [t for t in trainings if t.mentor.id in x_by_mentor]
+    cpus = os.cpu_count() or 1
+    fit_processes = fit_processes or cpus
+    in_process = fit_processes <= 1 or multiprocessing.current_process().daemon
+    executor = (
+        ThreadPoolExecutor(max_workers=1)
+        if in_process
+        else ProcessPoolExecutor(
+            max_workers=fit_processes,
+            initializer=_limit_cross_validation_jobs,
+            initargs=(max(1, cpus // fit_processes),),
+        )
+    )
+    with executor:
+        futures: List[Tuple[QuestionClassifierTraining, Future]] = [
+            (
+                training,
+                executor.submit(
+                    _fit,
+                    type(training).fit_classifier,
+                    training.feature_model_id(),
+                    *rows[training.mentor.id],
+                    x_by_mentor[training.mentor.id],
+                ),
+            )
+            for training in trainings
+        ]
+        for training, future in futures:
+            report = reports[training.mentor.id]
+            try:
+                fit, report.fit_seconds = future.result()
+                report.accuracy = float(training.save(fit).accuracy)
+            except Exception as err:
+                logging.exception(err)
+                report.error = str(err)
+            complete(report)
+    return [reports[m] for m in mentor_ids]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="retrain many mentors' classifiers")
+    parser.add_argument("--shared", default="shared/installed")
+    parser.add_argument("--output", default="models")
+    parser.add_argument("--arch", default="")
+    parser.add_argument(
+        "--mentor",
+        action="append",
+        default=[],
+        help=f"mentor id, or '{ALL_MENTORS}' for every mentor with models in --output",
+    )
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--fit-processes", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=512)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    results = bulk_train(
+        args.mentor,
+        shared_root=args.shared,
+        output_dir=args.output,
+        arch=args.arch,
+        fetch_workers=args.fetch_workers,
+        fit_processes=args.fit_processes,
+        batch_size=args.batch_size,
+    )
+    failed = [r.mentor for r in results if r.error]
+    logging.info(
+        f"retrained {len(results) - len(failed)} of {len(results)} mentors"
+        f" in {time.perf_counter() - start:.1f}s"
+        + (f", failed: {', '.join(failed)}" if failed else "")
+    )
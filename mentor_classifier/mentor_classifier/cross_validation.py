@@ -0,0 +1,134 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+from dataclasses import dataclass
+from os import environ
+from typing import Callable, Optional, Union
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.linear_model import RidgeClassifier
+from sklearn.model_selection import LeaveOneOut, check_cv
+
+LEAVE_ONE_OUT = "loo"
+
+
+def cross_validation_folds() -> Union[int, str]:
+    """
+    The number of folds from CROSS_VALIDATION_FOLDS (default 2),
+    or LEAVE_ONE_OUT if it is set to 'loo'
+    """
+    folds = (environ.get("CROSS_VALIDATION_FOLDS") or "2").strip().lower()
+    return LEAVE_ONE_OUT if folds == LEAVE_ONE_OUT else int(folds)
+
+
+def cross_validation_jobs(folds: Union[int, str]) -> int:
+    """
+    The number of folds fit in parallel from CROSS_VALIDATION_JOBS,
+    by default one per fold up to the number of cpus (all cpus for LEAVE_ONE_OUT)
+    """
+    jobs = (environ.get("CROSS_VALIDATION_JOBS") or "").strip()
+    if jobs:
+        return int(jobs)
+    if not isinstance(folds, int):
+        return -1
+    return max(1, min(folds, os.cpu_count() or 1))
+
+
+@dataclass
+class CrossValidationResult:
+    scores: np.ndarray  # accuracy of each fold
+    predictions: np.ndarray  # out-of-fold prediction for each row
+    accuracy: float  # accuracy of the out-of-fold predictions
+
+
+def cross_validate(
+    classifier,
+    x,
+    y,
+    cv: Union[int, str] = 2,
+    n_jobs: Optional[int] = None,
+    on_fold: Optional[Callable[[], None]] = None,
+) -> CrossValidationResult:
+    """
+    Fits a clone of classifier once per fold
+    (folds in n_jobs parallel threads, see cross_validation_jobs)
+    and derives the per-fold scores, out-of-fold predictions and accuracy
+    from those fits, using the same folds as
+    sklearn's cross_val_score and cross_val_predict.
+
+    With cv=LEAVE_ONE_OUT, a RidgeClassifier is evaluated in closed form
+    from its hat matrix instead of fitting once per row.
+    on_fold is called as each fold is done.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if n_jobs is None:
+        n_jobs = cross_validation_jobs(cv)
+    if cv == LEAVE_ONE_OUT:
+        if isinstance(classifier, RidgeClassifier) and classifier.fit_intercept:
+            predictions = ridge_leave_one_out_predictions(x, y, classifier.alpha)
+            return _result(predictions == y, predictions, y)
+        cv = LeaveOneOut()
+    folds = list(check_cv(cv, y, classifier=True).split(x, y))
+    fold_predictions = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_fit_and_predict)(classifier, x, y, train, test, on_fold)
+        for train, test in folds
+    )
+    predictions = np.empty(len(y), dtype=y.dtype)
+    scores = []
+    for (_, test), fold_prediction in zip(folds, fold_predictions):
+        predictions[test] = fold_prediction
+        scores.append(np.mean(fold_prediction == y[test]))
+    return _result(np.array(scores), predictions, y)
+
+
+def _fit_and_predict(classifier, x, y, train, test, on_fold=None) -> np.ndarray:
+    predictions = clone(classifier).fit(x[train], y[train]).predict(x[test])
+    if on_fold:
+        on_fold()
+    return predictions
+
+
+def _result(scores, predictions, y) -> CrossValidationResult:
+    return CrossValidationResult(
+        np.asarray(scores, dtype=np.float64),
+        predictions,
+        float(np.mean(predictions == y)),
+    )
+
+
+def ridge_leave_one_out_predictions(x, y, alpha: float = 1.0) -> np.ndarray:
+    """
+    Exact leave-one-out predictions of RidgeClassifier(alpha) with fit_intercept.
+    For a ridge fit with hat matrix H, the decision value for row i
+    of the model fit without row i is (ŷᵢ - Hᵢᵢ yᵢ) / (1 - Hᵢᵢ),
+    so one O(n d² + d³) solve replaces n fits.
+    (Unlike a refit, a class whose only row is left out keeps its column,
+    scoring -1 everywhere.)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    classes, y_index = np.unique(y, return_inverse=True)
+    n = x.shape[0]
+    # sklearn's -1/+1 label coding, a single column scoring classes[1] if binary
+    targets = -np.ones((n, len(classes)), dtype=np.float64)
+    targets[np.arange(n), y_index] = 1
+    if len(classes) == 2:
+        targets = targets[:, 1:]
+    x_centered = x - x.mean(axis=0)
+    y_mean = targets.mean(axis=0)
+    gram = x_centered.T @ x_centered
+    gram[np.diag_indices_from(gram)] += alpha
+    # the intercept is unpenalized, so H = 11ᵀ/n + Xc (XcᵀXc + αI)⁻¹ Xcᵀ
+    projected = np.linalg.solve(gram, x_centered.T).T
+    hat_diag = 1 / n + np.einsum("ij,ij->i", projected, x_centered)
+    fitted = y_mean + x_centered @ (projected.T @ (targets - y_mean))
+    decision = (fitted - hat_diag[:, None] * targets) / (1 - hat_diag[:, None])
+    if len(classes) == 2:
+        return classes[(decision[:, 0] > 0).astype(int)]
+    return classes[decision.argmax(axis=1)]
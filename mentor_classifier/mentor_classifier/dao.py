@@ -4,37 +4,140 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
+from collections import OrderedDict
 from os import environ
+from threading import Event, Lock
+from typing import Dict, Optional, Tuple
+import logging
 
-import pylru
 from mentor_classifier import (
     ClassifierFactory,
     QuestionClassifierPrediction,
     ARCH_DEFAULT,
 )
+from mentor_classifier.model_watcher import find_or_create_model_watcher
+
+CacheKey = Tuple[str, str]
 
 
 class Entry:
-    def __init__(self, classifier: QuestionClassifierPrediction):
+    def __init__(
+        self, classifier: QuestionClassifierPrediction, generation: int, size: int
+    ):
         self.classifier = classifier
-        self.last_trained_at = self.classifier.get_last_trained_at()
+        self.generation = generation
+        self.size = size
+
+
+class PendingLoad:
+    """
+    A classifier load in progress that concurrent requests for the same key wait on
+    """
+
+    def __init__(self):
+        self.done = Event()
+        self.classifier: Optional[QuestionClassifierPrediction] = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> QuestionClassifierPrediction:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        assert self.classifier is not None
+        return self.classifier
+
+
+class ClassifierCache:
+    """
+    LRU cache of classifiers bounded by both entry count and total resident bytes.
+    The most recently added entry is always kept, even if it alone exceeds max_bytes.
+    """
+
+    def __init__(self, max_size: int, max_bytes: int):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries: "OrderedDict[CacheKey, Entry]" = OrderedDict()
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, key: CacheKey) -> Entry:
+        e = self.entries[key]
+        self.entries.move_to_end(key)
+        return e
+
+    def __setitem__(self, key: CacheKey, e: Entry) -> None:
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key).size
+        self.entries[key] = e
+        self.total_bytes += e.size
+        while len(self.entries) > 1 and (
+            len(self.entries) > self.max_size
+            or (self.max_bytes > 0 and self.total_bytes > self.max_bytes)
+        ):
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+            logging.info(
+                f"evicted classifier {evicted_key} ({evicted.size} bytes) from cache"
+            )
 
 
 class Dao:
     def __init__(self, shared_root: str, data_root: str):
         self.shared_root = shared_root
         self.data_root = data_root
-        self.cache = pylru.lrucache(int(environ.get("CACHE_MAX_SIZE", "100")))
+        self.cache = ClassifierCache(
+            int(environ.get("CACHE_MAX_SIZE") or "100"),
+            int(environ.get("CACHE_MAX_BYTES") or str(2 * 1024 ** 3)),
+        )
+        self.model_watcher = find_or_create_model_watcher(data_root)
+        self.lock = Lock()
+        self.pending: Dict[Tuple[str, str, int], PendingLoad] = {}
 
     def find_classifier(
-        self, mentor_id: str, arch: str = ARCH_DEFAULT
+        self, mentor_id: str, arch: str = ""
     ) -> QuestionClassifierPrediction:
-        if mentor_id in self.cache:
-            e = self.cache[mentor_id]
-            if e and e.last_trained_at >= e.classifier.get_last_trained_at():
-                return e.classifier
-        c = ClassifierFactory().new_prediction(
-            mentor=mentor_id, shared_root=self.shared_root, data_path=self.data_root
-        )
-        self.cache[mentor_id] = Entry(c)
-        return c
+        arch = arch or environ.get("CLASSIFIER_ARCH") or ARCH_DEFAULT
+        key = (mentor_id, arch)
+        # read the generation before loading so a retrain
+        # that lands mid-load is picked up by the next call
+        generation = self.model_watcher.generation(mentor_id)
+        with self.lock:
+            if key in self.cache:
+                e = self.cache[key]
+                if e and e.generation == generation:
+                    return e.classifier
+            # only one request loads a given model version,
+            # everyone else asking for it meanwhile waits on that load
+            pending_key = (mentor_id, arch, generation)
+            pending = self.pending.get(pending_key)
+            is_loader = pending is None
+            if pending is None:
+                pending = self.pending[pending_key] = PendingLoad()
+        if not is_loader:
+            return pending.wait()
+        try:
+            c = ClassifierFactory().new_prediction(
+                mentor=mentor_id,
+                shared_root=self.shared_root,
+                data_path=self.data_root,
+                arch=arch,
+            )
+            size = c.get_resident_size()
+            with self.lock:
+                cached = self.cache[key] if key in self.cache else None
+                if cached is None or cached.generation <= generation:
+                    self.cache[key] = Entry(c, generation, size)
+            pending.classifier = c
+            return c
+        except BaseException as err:
+            pending.error = err
+            raise
+        finally:
+            with self.lock:
+                del self.pending[pending_key]
+            pending.done.set()
@@ -0,0 +1,203 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+from os import environ
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ComputeEmbeddings = Callable[[List[str]], np.ndarray]
+
+
+class EmbeddingStore:
+    """
+    Persistent, content-addressed store of the embeddings of texts for one embedding model.
+    Vectors are appended to a memory-mapped matrix (vectors.bin)
+    and an append-only index (index.txt) maps the hash of each text to its row.
+    Safe to share between threads and processes (appends hold an exclusive file lock).
+    """
+
+    def __init__(self, root: str, model_id: str, dtype: str = "float32"):
+        self.model_id = model_id
+        self.path = os.path.join(
+            root, hashlib.sha1(model_id.encode("utf-8")).hexdigest()[:16]
+        )
+        self.dtype = np.dtype(dtype)
+        self.dim = 0
+        self.rows: Dict[str, int] = {}
+        self.index_offset = 0
+        self.vectors: Optional[np.memmap] = None
+        self.lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self.__read_meta()
+
+    def get_many(self, texts: List[str], compute: ComputeEmbeddings) -> np.ndarray:
+        """
+        Returns a (len(texts), dim) float32 matrix of embeddings,
+        calling compute only for the (deduplicated) texts not yet in the store
+        """
+        with self.lock:
+            self.__read_index()
+            missing = list(
+                dict.fromkeys(t for t in texts if self.__key(t) not in self.rows)
+            )
+            if missing:
+                logging.info(
+                    f"embedding {len(missing)} of {len(texts)} texts not in store"
+                )
+                self.__append(missing, np.asarray(compute(missing)))
+            if not texts:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            rows = [self.rows[self.__key(t)] for t in texts]
+            return np.asarray(self.__find_vectors()[rows], dtype=np.float32)
+
+    def __key(self, text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def __file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def __read_meta(self) -> None:
+        if not os.path.isfile(self.__file("meta.json")):
+            return
+        with open(self.__file("meta.json")) as f:
+            meta = json.load(f)
+        if np.dtype(meta["dtype"]) != self.dtype:
+            raise ValueError(
+                f"embedding store {self.path} has dtype {meta['dtype']}, not {self.dtype}"
+            )
+        self.dim = int(meta["dim"])
+
+    def __write_meta(self, dim: int) -> None:
+        tmp = self.__file(f"meta.json.{os.getpid()}")
+        with open(tmp, "w") as f:
+            json.dump(
+                {"model_id": self.model_id, "dim": dim, "dtype": self.dtype.name}, f
+            )
+        os.replace(tmp, self.__file("meta.json"))
+        self.dim = dim
+
+    def __read_index(self) -> None:
+        if not os.path.isfile(self.__file("index.txt")):
+            return
+        with open(self.__file("index.txt"), "rb") as f:
+            f.seek(self.index_offset)
+            data = f.read()
+        # an incomplete last line is still being written, read it next time
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].decode("utf-8", errors="replace").splitlines():
+            parts = line.split(" ")
+            if len(parts) != 2 or not parts[1].isdigit():
+                logging.warning(f"skipping malformed line in {self.path}/index.txt")
+                continue
+            self.rows[parts[0]] = int(parts[1])
+        self.index_offset += complete
+
+    def __append(self, texts: List[str], embeddings: np.ndarray) -> None:
+        with open(self.__file("lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # another process may have added some of these meanwhile
+                self.__read_meta()
+                self.__read_index()
+                if not self.dim:
+                    self.__write_meta(embeddings.shape[1])
+                new: List[Tuple[str, np.ndarray]] = [
+                    (self.__key(t), e)
+                    for t, e in zip(texts, embeddings)
+                    if self.__key(t) not in self.rows
+                ]
+                if not new:
+                    return
+                row_bytes = self.dim * self.dtype.itemsize
+                with open(self.__file("vectors.bin"), "ab") as f:
+                    # drop any partial row left by a writer that died mid-append
+                    first_row = f.tell() // row_bytes
+                    f.truncate(first_row * row_bytes)
+                    f.write(np.asarray([e for _, e in new], dtype=self.dtype).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                # rows are indexed only after their vectors are on disk
+                with open(self.__file("index.txt"), "a") as f:
+                    # drop any partial line left by a writer that died mid-append
+                    f.truncate(self.index_offset)
+                    f.write(
+                        "".join(
+                            f"{key} {first_row + i}\n" for i, (key, _) in enumerate(new)
+                        )
+                    )
+                self.__read_index()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __find_vectors(self) -> np.memmap:
+        n_rows = max(self.rows.values()) + 1
+        if self.vectors is None or self.vectors.shape[0] < n_rows:
+            size = os.path.getsize(self.__file("vectors.bin"))
+            self.vectors = np.memmap(
+                self.__file("vectors.bin"),
+                dtype=self.dtype,
+                mode="r",
+                shape=(size // (self.dim * self.dtype.itemsize), self.dim),
+            )
+        return self.vectors
+
+
+def model_files_fingerprint(*file_paths: str) -> str:
+    """
+    A hash of the size and mtime of every file at file_paths (directories recursively),
+    for model ids that change whenever the files of the model do
+    """
+    h = hashlib.sha1()
+    for file_path in file_paths:
+        files: List[str] = []
+        if os.path.isdir(file_path):
+            for root, _, names in os.walk(file_path):
+                files.extend(os.path.join(root, name) for name in names)
+        elif os.path.isfile(file_path):
+            files.append(file_path)
+        for file in sorted(files):
+            # names relative to file_path, so hosts with other mount points agree
+            name = os.path.relpath(file, file_path) if file != file_path else ""
+            st = os.stat(file)
+            h.update(f"{name} {st.st_size} {st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+_embedding_stores: Dict[Tuple[str, str], EmbeddingStore] = {}
+_embedding_stores_lock = threading.Lock()
+
+
+def find_or_create_embedding_store(model_id: str) -> Optional[EmbeddingStore]:
+    """
+    Returns the store for model_id under EMBEDDING_STORE_PATH,
+    or None if EMBEDDING_STORE_PATH is not set
+    """
+    root = environ.get("EMBEDDING_STORE_PATH") or ""
+    if not root:
+        return None
+    key = (os.path.abspath(root), model_id)
+    with _embedding_stores_lock:
+        if key not in _embedding_stores:
+            _embedding_stores[key] = EmbeddingStore(
+                root, model_id, environ.get("EMBEDDING_STORE_DTYPE") or "float32"
+            )
+        return _embedding_stores[key]
+
+
+def embed_with_store(
+    model_id: str, texts: List[str], compute: ComputeEmbeddings
+) -> np.ndarray:
+    store = find_or_create_embedding_store(model_id)
+    if store is None:
+        return np.asarray(compute(texts))
+    return store.get_many(texts, compute)
@@ -0,0 +1,96 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from collections import OrderedDict
+from os import environ
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+FeatureKey = Tuple[str, str]
+
+
+def normalize_query(question: str) -> str:
+    # collapse whitespace only: anything more (case, punctuation)
+    # can change the features spaCy and the transformer produce
+    return " ".join(question.split())
+
+
+class QueryFeatureCache:
+    """
+    Process-wide LRU cache of the mentor-independent features of a question
+    (LR word2vec vectors, lr_transformer sentence embeddings),
+    keyed by (feature model id, normalized question text)
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+        self.features: "OrderedDict[FeatureKey, np.ndarray]" = OrderedDict()
+
+    def get_many(
+        self,
+        model_id: str,
+        questions: List[str],
+        compute: Callable[[List[str]], List[np.ndarray]],
+    ) -> List[np.ndarray]:
+        """
+        Returns features for each question, calling compute once
+        with the (deduplicated) questions that are not cached
+        """
+        texts = [normalize_query(q) for q in questions]
+        found: Dict[str, np.ndarray] = {}
+        with self.lock:
+            for text in texts:
+                key = (model_id, text)
+                if key in self.features:
+                    self.features.move_to_end(key)
+                    found[text] = self.features[key]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        missing = list(dict.fromkeys(t for t in texts if t not in found))
+        if missing:
+            computed = compute(missing)
+            with self.lock:
+                for text, feature in zip(missing, computed):
+                    feature = np.asarray(feature)
+                    feature.setflags(write=False)
+                    found[text] = feature
+                    if self.max_size > 0:
+                        self.features[(model_id, text)] = feature
+                while len(self.features) > self.max_size:
+                    self.features.popitem(last=False)
+        return [found[text] for text in texts]
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "size": len(self.features),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.features.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_query_feature_cache: Optional[QueryFeatureCache] = None
+
+
+def find_or_create_query_feature_cache() -> QueryFeatureCache:
+    global _query_feature_cache
+    if _query_feature_cache is None:
+        _query_feature_cache = QueryFeatureCache(
+            int(environ.get("QUERY_FEATURE_CACHE_SIZE") or "10000")
+        )
+    return _query_feature_cache
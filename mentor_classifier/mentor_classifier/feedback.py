@@ -0,0 +1,266 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import atexit
+import fcntl
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from os import environ
+from typing import Iterator, List, Optional
+
+from bson import ObjectId
+
+from mentor_classifier.api import (
+    create_user_question,
+    create_user_questions,
+    user_question_input,
+)
+from mentor_classifier.utils import props_to_bool
+
+
+def use_async_feedback() -> bool:
+    return props_to_bool("FEEDBACK_ASYNC", environ)
+
+
+@dataclass
+class UserQuestionFeedback:
+    id: str
+    mentor: str
+    question: str
+    answer_id: str
+    answer_type: str
+    confidence: float
+    attempts: int = 0  # times graphql rejected this user question
+
+    def to_input(self) -> dict:
+        return user_question_input(
+            self.mentor,
+            self.question,
+            self.answer_id,
+            self.answer_type,
+            self.confidence,
+            id=self.id,
+        )
+
+
+class FeedbackWriter:
+    """
+    Sends user-question feedback to graphql from a background thread.
+    Ids are assigned up front so callers get one back immediately,
+    feedback is sent in batches (when batch_size is reached or flush_interval expires)
+    and spooled to a local file whenever the queue is full or graphql fails.
+    Only the user questions of a batch that graphql rejected are spooled,
+    and one rejected max_attempts times is moved to a dead letter file
+    (spool_path + ".dead") instead.
+    The spool may be shared by processes, which hold a lock on spool_path + ".lock"
+    while they append to it or take it for replay.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        queue_max_size: int = 10000,
+        spool_path: str = "",
+        max_attempts: int = 5,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path or os.path.join(
+            tempfile.gettempdir(), "mentor_classifier_feedback.jsonl"
+        )
+        self.queue: "queue.Queue[UserQuestionFeedback]" = queue.Queue(
+            maxsize=queue_max_size
+        )
+        self.pid = os.getpid()
+        self._spool_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FeedbackWriter":
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.__run, name="feedback-writer", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def write(
+        self,
+        mentor: str,
+        question: str,
+        answer_id: str,
+        answer_type: str,
+        confidence: float,
+    ) -> str:
+        feedback = UserQuestionFeedback(
+            str(ObjectId()), mentor, question, answer_id, answer_type, confidence
+        )
+        try:
+            self.queue.put_nowait(feedback)
+        except queue.Full:
+            self.__spool([feedback])
+        return feedback.id
+
+    def flush(self) -> None:
+        batch = self.__drain(self.batch_size)
+        while batch:
+            self.__send(batch)
+            batch = self.__drain(self.batch_size)
+
+    def close(self) -> None:
+        # no network on shutdown, anything still queued goes to the spool
+        self.__spool(self.__drain(self.queue.qsize()))
+
+    def __run(self) -> None:
+        while True:
+            batch = self.__next_batch()
+            if batch:
+                self.__send(batch)
+
+    def __next_batch(self) -> List[UserQuestionFeedback]:
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def __drain(self, max_items: int) -> List[UserQuestionFeedback]:
+        batch: List[UserQuestionFeedback] = []
+        while len(batch) < max(1, max_items):
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def __send(self, batch: List[UserQuestionFeedback]) -> None:
+        with self._send_lock:
+            try:
+                errors = create_user_questions([f.to_input() for f in batch])
+            except Exception as err:
+                logging.warning(
+                    f"failed to send {len(batch)} user questions, spooling to {self.spool_path}: {err}"
+                )
+                self.__spool(batch)
+                return
+            # replay before spooling, so what was just rejected is not retried at once
+            self.__replay_spool()
+            self.__spool_rejected(batch, errors)
+
+    def __spool(self, batch: List[UserQuestionFeedback], path: str = "") -> None:
+        if not batch:
+            return
+        with self.__locked_spool():
+            with open(path or self.spool_path, "a") as f:
+                for feedback in batch:
+                    f.write(json.dumps(asdict(feedback)) + "\n")
+
+    @contextmanager
+    def __locked_spool(self) -> Iterator[None]:
+        with self._spool_lock:
+            with open(f"{self.spool_path}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __spool_rejected(
+        self, batch: List[UserQuestionFeedback], errors: List[str]
+    ) -> None:
+        rejected = [f for f, error in zip(batch, errors) if error]
+        if not rejected:
+            return
+        logging.warning(
+            f"graphql rejected {len(rejected)} user questions: {[e for e in errors if e]}"
+        )
+        for feedback in rejected:
+            feedback.attempts += 1
+        self.__spool([f for f in rejected if f.attempts < self.max_attempts])
+        self.__spool(
+            [f for f in rejected if f.attempts >= self.max_attempts],
+            f"{self.spool_path}.dead",
+        )
+
+    def __replay_spool(self) -> None:
+        # only the process that moves the spool aside replays what it had
+        with self.__locked_spool():
+            if not os.path.exists(self.spool_path):
+                return
+            replay_path = f"{self.spool_path}.{os.getpid()}.replay"
+            os.replace(self.spool_path, replay_path)
+        with open(replay_path) as f:
+            spooled = [UserQuestionFeedback(**json.loads(line)) for line in f if line]
+        os.remove(replay_path)
+        logging.info(f"replaying {len(spooled)} spooled user questions")
+        sent = 0
+        for chunk in self.__chunks(spooled):
+            try:
+                errors = create_user_questions([f.to_input() for f in chunk])
+            except Exception as err:
+                logging.warning(f"failed to replay spooled user questions: {err}")
+                self.__spool(spooled[sent:])
+                return
+            self.__spool_rejected(chunk, errors)
+            sent += len(chunk)
+
+    def __chunks(
+        self, batch: List[UserQuestionFeedback]
+    ) -> List[List[UserQuestionFeedback]]:
+        size = self.batch_size
+        return [batch[i:][:size] for i in range(0, len(batch), size)]
+
+
+_feedback_writer: Optional[FeedbackWriter] = None
+_feedback_writer_lock = threading.Lock()
+
+
+def find_or_create_feedback_writer() -> FeedbackWriter:
+    global _feedback_writer
+    # a writer inherited through fork has no thread, so each process gets its own
+    writer = _feedback_writer
+    if writer is not None and writer.pid == os.getpid():
+        return writer
+    with _feedback_writer_lock:
+        if _feedback_writer is None or _feedback_writer.pid != os.getpid():
+            _feedback_writer = FeedbackWriter(
+                batch_size=int(environ.get("FEEDBACK_BATCH_SIZE") or 50),
+                flush_interval=float(environ.get("FEEDBACK_FLUSH_INTERVAL") or 1.0),
+                queue_max_size=int(environ.get("FEEDBACK_QUEUE_MAX_SIZE") or 10000),
+                spool_path=environ.get("FEEDBACK_SPOOL_PATH") or "",
+                max_attempts=int(environ.get("FEEDBACK_MAX_ATTEMPTS") or 5),
+            ).start()
+            atexit.register(_feedback_writer.close)
+        return _feedback_writer
+
+
+def log_user_question(
+    mentor: str,
+    question: str,
+    answer_id: str,
+    answer_type: str,
+    confidence: float,
+) -> str:
+    if use_async_feedback():
+        return find_or_create_feedback_writer().write(
+            mentor, question, answer_id, answer_type, confidence
+        )
+    return create_user_question(mentor, question, answer_id, answer_type, confidence)
@@ -0,0 +1,171 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.cookiejar import DefaultCookiePolicy
+from os import environ
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class _NoSessionCookies(DefaultCookiePolicy):
+    # cookies are per caller (e.g. a user's auth), so never keep them in the session
+    def set_ok(self, cookie, request):
+        return False
+
+
+def _is_mutation(query: dict) -> bool:
+    return str(query.get("query") or "").lstrip().startswith("mutation")
+
+
+class GraphQLClient:
+    """
+    Posts graphql queries over a pool of keep-alive connections.
+    A request that fails to connect is retried up to retries times
+    with exponential backoff, as is a query that gets a 502/503/504.
+    A mutation is retried only on a 503, since a 502 or 504 may come
+    from a proxy after the server ran it, and errors reading a response
+    are never retried.
+    Asks for gzip compressed responses.
+    Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        pool_size: int = 10,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 30.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+    ):
+        self.endpoint = endpoint
+        self.pool_size = pool_size
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.session = self.__new_session(retries, backoff, (502, 503, 504))
+        self.mutation_session = self.__new_session(retries, backoff, (503,))
+
+    def __new_session(
+        self, retries: int, backoff: float, status_forcelist: Tuple[int, ...]
+    ) -> requests.Session:
+        session = requests.Session()
+        session.cookies.set_policy(_NoSessionCookies())
+        session.headers.update({"Accept-Encoding": "gzip"})
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=Retry(
+                total=retries,
+                connect=retries,
+                read=0,
+                other=0,
+                status=retries,
+                status_forcelist=status_forcelist,
+                allowed_methods=frozenset(["POST"]),
+                backoff_factor=backoff,
+                raise_on_status=False,
+            ),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def post(
+        self,
+        query: dict,
+        cookies: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> dict:
+        session = self.mutation_session if _is_mutation(query) else self.session
+        res = session.post(
+            self.endpoint,
+            json=query,
+            cookies=cookies,
+            headers=headers,
+            timeout=self.timeout,
+        )
+        res.raise_for_status()
+        return res.json()
+
+    def close(self) -> None:
+        self.session.close()
+        self.mutation_session.close()
+
+
+class AsyncGraphQLClient:
+    """
+    GraphQLClient for asyncio callers: post is a coroutine that runs
+    the request on a thread pool the size of the connection pool,
+    so up to pool_size queries are in flight at once on keep-alive connections
+    """
+
+    def __init__(self, client: GraphQLClient):
+        self.client = client
+        self.executor = ThreadPoolExecutor(
+            max_workers=client.pool_size, thread_name_prefix="graphql"
+        )
+
+    async def post(
+        self,
+        query: dict,
+        cookies: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> dict:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            partial(self.client.post, query, cookies=cookies, headers=headers),
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+
+_clients: Dict[str, GraphQLClient] = {}
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+
+
+def find_graphql_client(endpoint: str) -> GraphQLClient:
+    """
+    The client for endpoint shared by this process
+    (a forked process gets its own, so no connection is used by two processes).
+    Configured by GRAPHQL_POOL_SIZE, GRAPHQL_CONNECT_TIMEOUT, GRAPHQL_READ_TIMEOUT,
+    GRAPHQL_RETRIES and GRAPHQL_RETRY_BACKOFF
+    """
+    global _clients_pid
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        if endpoint not in _clients:
+            _clients[endpoint] = GraphQLClient(
+                endpoint,
+                pool_size=int(environ.get("GRAPHQL_POOL_SIZE") or "10"),
+                connect_timeout=float(environ.get("GRAPHQL_CONNECT_TIMEOUT") or "3.05"),
+                read_timeout=float(environ.get("GRAPHQL_READ_TIMEOUT") or "30"),
+                retries=int(environ.get("GRAPHQL_RETRIES") or "2"),
+                backoff=float(environ.get("GRAPHQL_RETRY_BACKOFF") or "0.2"),
+            )
+        return _clients[endpoint]
+
+
+_async_clients: Dict[str, AsyncGraphQLClient] = {}
+
+
+def find_async_graphql_client(endpoint: str) -> AsyncGraphQLClient:
+    client = find_graphql_client(endpoint)
+    with _clients_lock:
+        async_client = _async_clients.get(endpoint)
+        if async_client is None or async_client.client is not client:
+            async_client = _async_clients[endpoint] = AsyncGraphQLClient(client)
+        return async_client
@@ -4,10 +4,35 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
+import json
+import logging
+import os
 from dataclasses import dataclass
+from os import environ
+from typing import Optional
 
-from mentor_classifier.api import fetch_mentor_data
-from mentor_classifier.utils import sanitize_string
+from mentor_classifier.api import (
+    MENTOR_DATA_ALL,
+    MENTOR_DATA_SERVING,
+    MENTOR_DATA_TRAINING,
+    fetch_mentor_data,
+)
+from mentor_classifier.utils import props_to_bool, sanitize_string
+
+MENTOR_SNAPSHOT_FILE = "mentor.json"
+MENTOR_SNAPSHOT_VERSION = 1
+
+
+def use_mentor_snapshot() -> bool:
+    return props_to_bool("MENTOR_SNAPSHOT", environ)
+
+
+def training_mentor_data() -> str:
+    """
+    The mentor data to fetch for training: with MENTOR_SNAPSHOT set
+    it includes what prediction needs, for the snapshot saved with the model
+    """
+    return MENTOR_DATA_SERVING if use_mentor_snapshot() else MENTOR_DATA_TRAINING
 
 
 @dataclass
@@ -18,18 +43,31 @@ class Media:
 
 
 class Mentor(object):
-    def __init__(self, id):
+    def __init__(
+        self, id, snapshot: Optional[dict] = None, purpose: str = MENTOR_DATA_ALL
+    ):
+        """
+        purpose (one of the api.MENTOR_DATA_* constants) selects the fields fetched,
+        a mentor loaded from a snapshot has MENTOR_DATA_SERVING
+        """
         self.id = id
+        self.purpose = MENTOR_DATA_SERVING if snapshot is not None else purpose
         self.topics = []
         self.utterances_by_type = {}
         self.questions_by_id = {}
         self.questions_by_text = {}
         self.questions_by_answer = {}
         self.answer_id_by_answer = {}
-        self.load()
+        if snapshot is None:
+            self.load()
+        else:
+            self.load_snapshot(snapshot)
+
+    def has_serving_data(self) -> bool:
+        return self.purpose in (MENTOR_DATA_ALL, MENTOR_DATA_SERVING)
 
     def load(self):
-        data = fetch_mentor_data(self.id)
+        data = fetch_mentor_data(self.id, self.purpose)
         for subject in data.get("subjects", []):
             self.topics.append(subject["name"])
         for topic in data.get("topics", []):
@@ -59,9 +97,84 @@ class Mentor(object):
         for question in data.get("questions", []):
             q = self.questions_by_id.get(question["question"]["_id"], None)
             if q is not None:
-                for topic in question["topics"]:
+                for topic in question.get("topics", []):
                     self.questions_by_id[q["id"]]["topics"].append(topic["name"])
                 self.questions_by_text[sanitize_string(q["question_text"])] = q
                 for paraphrase in q["paraphrases"]:
                     self.questions_by_text[sanitize_string(paraphrase)] = q
                 self.questions_by_answer[sanitize_string(q["answer"])] = q
+
+    def to_snapshot(self) -> dict:
+        """
+        The indexes prediction uses, with each question stored once
+        and referenced by position from the text and answer indexes.
+        (Paraphrases and topics are left out,
+        so a mentor loaded from a snapshot can predict but not train.)
+        """
+        questions = list(self.questions_by_id.values())
+        index = {id(q): i for i, q in enumerate(questions)}
+        answered = {q["answer_id"] for q in questions}
+        return {
+            "version": MENTOR_SNAPSHOT_VERSION,
+            "id": self.id,
+            "questions": [
+                {
+                    k: q[k]
+                    for k in ("id", "question_text", "answer", "answer_id", "media")
+                }
+                for q in questions
+            ],
+            "questions_by_text": {
+                text: index[id(q)] for text, q in self.questions_by_text.items()
+            },
+            "questions_by_answer": {
+                answer: index[id(q)] for answer, q in self.questions_by_answer.items()
+            },
+            # answers whose question was replaced by another answer to it
+            "answers": {
+                answer_id: answer
+                for answer_id, answer in self.answer_id_by_answer.items()
+                if answer_id not in answered
+            },
+            "utterances_by_type": self.utterances_by_type,
+        }
+
+    def load_snapshot(self, snapshot: dict):
+        if snapshot.get("version") != MENTOR_SNAPSHOT_VERSION:
+            raise ValueError(
+                f"unsupported mentor snapshot version {snapshot.get('version')}"
+            )
+        questions = [dict(q, paraphrases=[], topics=[]) for q in snapshot["questions"]]
+        for q in questions:
+            self.questions_by_id[q["id"]] = q
+            self.answer_id_by_answer[q["answer_id"]] = q["answer"]
+        self.answer_id_by_answer.update(snapshot["answers"])
+        self.questions_by_text = {
+            text: questions[i] for text, i in snapshot["questions_by_text"].items()
+        }
+        self.questions_by_answer = {
+            answer: questions[i]
+            for answer, i in snapshot["questions_by_answer"].items()
+        }
+        self.utterances_by_type = snapshot["utterances_by_type"]
+
+    def save_snapshot(self, file_path: str):
+        with open(f"{file_path}.tmp", "w") as f:
+            json.dump(self.to_snapshot(), f, separators=(",", ":"))
+        os.replace(f"{file_path}.tmp", file_path)
+
+
+def find_mentor(mentor_id: str, model_path: str) -> Mentor:
+    """
+    With MENTOR_SNAPSHOT set, loads the mentor from the snapshot
+    saved with its model at model_path, if there is one,
+    instead of fetching it from graphql
+    """
+    snapshot_file = os.path.join(model_path, MENTOR_SNAPSHOT_FILE)
+    if use_mentor_snapshot() and os.path.isfile(snapshot_file):
+        try:
+            with open(snapshot_file) as f:
+                return Mentor(mentor_id, snapshot=json.load(f))
+        except (OSError, ValueError, KeyError) as err:
+            logging.warning(f"failed to load mentor snapshot {snapshot_file}: {err}")
+    return Mentor(mentor_id, purpose=MENTOR_DATA_SERVING)
@@ -0,0 +1,173 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+"""
+A linear classifier saved as plain arrays instead of a pickled sklearn model:
+- model.npy: float32 (dim + 1, n_columns) matrix, coef_ transposed with intercept_ as the last row
+- model.json: manifest with the format version, the classes and the weights file name
+
+The weights are memory-mapped read only, so loading a model does not import sklearn
+and all processes on a host share one copy of its pages.
+
+To convert the model.pkl files of an existing models tree:
+usage: python -m mentor_classifier.model_artifact --models models
+"""
+import argparse
+import json
+import logging
+import os
+from os import path
+from typing import List, Optional
+
+import numpy as np
+
+MODEL_ARTIFACT_VERSION = 1
+MODEL_MANIFEST_FILE = "model.json"
+MODEL_WEIGHTS_FILE = "model.npy"
+MODEL_PICKLE_FILE = "model.pkl"
+
+
+class LinearModelArtifact:
+    """
+    Has the coef_, intercept_ and classes_ of the classifier it was saved from
+    (views of the memory-mapped weights), so it can be scored with scoring.LinearScorer
+    """
+
+    def __init__(self, weights: np.ndarray, classes: List[str]):
+        self.weights = weights
+        self.coef_ = weights[:-1].T
+        self.intercept_ = weights[-1]
+        self.classes_ = np.array(classes)
+
+    @classmethod
+    def load(cls, model_path: str) -> "LinearModelArtifact":
+        with open(path.join(model_path, MODEL_MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MODEL_ARTIFACT_VERSION:
+            raise ValueError(
+                f"unsupported model artifact version {manifest.get('version')}"
+                f" in {model_path}"
+            )
+        weights = np.load(path.join(model_path, manifest["weights"]), mmap_mode="r")
+        return cls(weights, manifest["classes"])
+
+
+def model_manifest_path(model_path: str) -> str:
+    return path.join(model_path, MODEL_MANIFEST_FILE)
+
+
+def has_model_artifact(model_path: str) -> bool:
+    return path.isfile(model_manifest_path(model_path))
+
+
+def save_model_artifact(model_path: str, model) -> None:
+    """
+    Saves the coef_, intercept_ and classes_ of a linear classifier
+    (e.g. sklearn RidgeClassifier). The manifest is written last
+    (and both files atomically), so readers never see a partial model
+    """
+    coef = np.asarray(model.coef_, dtype=np.float32)
+    coef = coef.reshape(-1, coef.shape[-1])
+    intercept = np.asarray(model.intercept_, dtype=np.float32).reshape(1, -1)
+    weights = np.ascontiguousarray(np.vstack([coef.T, intercept]))
+    os.makedirs(model_path, exist_ok=True)
+    weights_path = path.join(model_path, MODEL_WEIGHTS_FILE)
+    with open(f"{weights_path}.tmp", "wb") as f:
+        np.save(f, weights)
+    os.replace(f"{weights_path}.tmp", weights_path)
+    manifest = {
+        "version": MODEL_ARTIFACT_VERSION,
+        "weights": MODEL_WEIGHTS_FILE,
+        "classes": [str(c) for c in model.classes_],
+    }
+    manifest_path = model_manifest_path(model_path)
+    with open(f"{manifest_path}.tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+
+def save_model(model_path: str, model) -> None:
+    """
+    Saves model as model.pkl and as a model artifact, each file atomically.
+    The manifest is written last, since model watchers take it
+    as the mark of a complete model
+    """
+    import joblib
+
+    pkl = path.join(model_path, MODEL_PICKLE_FILE)
+    joblib.dump(model, f"{pkl}.tmp")
+    os.replace(f"{pkl}.tmp", pkl)
+    save_model_artifact(model_path, model)
+
+
+def load_model(model_path: str):
+    """
+    Loads the model artifact if there is one, otherwise the pickled model
+    """
+    if has_model_artifact(model_path):
+        return LinearModelArtifact.load(model_path)
+    import joblib
+
+    return joblib.load(path.join(model_path, MODEL_PICKLE_FILE))
+
+
+def model_file(model_path: str) -> str:
+    """
+    The file whose modification time is when the model at model_path was trained
+    """
+    if has_model_artifact(model_path):
+        return model_manifest_path(model_path)
+    return path.join(model_path, MODEL_PICKLE_FILE)
+
+
+def convert_models(models_root: str, force: bool = False) -> int:
+    """
+    Writes a model artifact for every models_root/<mentor>/<arch>/model.pkl
+    that has none or an older one. Returns the number converted
+    """
+    import joblib
+
+    converted = 0
+    for mentor in sorted(os.listdir(models_root)):
+        mentor_path = path.join(models_root, mentor)
+        if not path.isdir(mentor_path):
+            continue
+        for arch in sorted(os.listdir(mentor_path)):
+            model_path = path.join(mentor_path, arch)
+            pkl = path.join(model_path, MODEL_PICKLE_FILE)
+            if not path.isfile(pkl):
+                continue
+            manifest = model_manifest_path(model_path)
+            if (
+                not force
+                and path.isfile(manifest)
+                and path.getmtime(manifest) >= path.getmtime(pkl)
+            ):
+                continue
+            try:
+                save_model_artifact(model_path, joblib.load(pkl))
+                converted += 1
+            except Exception as err:
+                logging.error(f"failed to convert {pkl}: {err}")
+    return converted
+
+
+def _main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="convert pickled models to model artifacts"
+    )
+    parser.add_argument("--models", default="models")
+    parser.add_argument(
+        "--force", action="store_true", help="also convert models already converted"
+    )
+    parsed = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO)
+    converted = convert_models(parsed.models, parsed.force)
+    logging.info(f"converted {converted} models in {parsed.models}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,231 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from os import environ, path
+from typing import Dict, List, Optional, Tuple
+
+from mentor_classifier.model_artifact import MODEL_MANIFEST_FILE, MODEL_PICKLE_FILE
+
+# the manifest is written last, so once a model dir has one
+# it alone marks a complete model (model.pkl only for older models)
+MODEL_FILES = (MODEL_PICKLE_FILE, MODEL_MANIFEST_FILE)
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+# IN_CREATE is only for new model dirs, a created file is not written yet
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_FILE_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")
+
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def _file_signature(file_path: str) -> FileSignature:
+    try:
+        st = os.stat(file_path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    except FileNotFoundError:
+        return None
+
+
+def _superseded(file_path: str) -> bool:
+    return path.basename(file_path) != MODEL_MANIFEST_FILE and path.isfile(
+        path.join(path.dirname(file_path), MODEL_MANIFEST_FILE)
+    )
+
+
+def _load_libc_inotify():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class ModelVersionWatcher:
+    """
+    Keeps a generation counter per mentor that is bumped whenever
+    one of the mentor's model files changes (any arch).
+    Changes are picked up by inotify where available
+    with a periodic scan as fallback (and for filesystems
+    like nfs where inotify does not see writes from other hosts),
+    so callers only have to compare integers on the request path.
+    """
+
+    def __init__(self, models_root: str, poll_interval: float = 2.0):
+        self.models_root = path.abspath(models_root)
+        self.poll_interval = poll_interval
+        self._generations: Dict[str, int] = {}
+        self._signatures: Dict[str, FileSignature] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def generation(self, mentor_id: str) -> int:
+        return self._generations.get(mentor_id, 0)
+
+    def bump(self, mentor_id: str) -> None:
+        with self._lock:
+            self._generations[mentor_id] = self._generations.get(mentor_id, 0) + 1
+
+    def start(self, mode: str = "auto") -> "ModelVersionWatcher":
+        if self._thread is not None:
+            return self
+        self.scan()
+        libc = _load_libc_inotify() if mode in ("auto", "inotify") else None
+        self._thread = threading.Thread(
+            target=self.__watch_inotify if libc else self.__watch_poll,
+            args=(libc,) if libc else (),
+            name="model-watcher",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def scan(self) -> None:
+        seen = set(self.__model_files())
+        for file_path in seen.union(self._signatures.keys()):
+            self.check(file_path)
+
+    def check(self, file_path: str) -> None:
+        if _superseded(file_path):
+            with self._lock:
+                self._signatures.pop(file_path, None)
+            return
+        signature = _file_signature(file_path)
+        with self._lock:
+            if file_path not in self._signatures and signature is None:
+                return
+            changed = self._signatures.get(file_path) != signature
+            if signature is None:
+                self._signatures.pop(file_path, None)
+            else:
+                self._signatures[file_path] = signature
+        if changed:
+            self.bump(self.__mentor_id(file_path))
+
+    def check_mentor(self, mentor_id: str) -> None:
+        for d in self.__model_dirs(path.join(self.models_root, mentor_id), 1):
+            for f in MODEL_FILES:
+                self.check(path.join(d, f))
+
+    def __mentor_id(self, file_path: str) -> str:
+        return path.relpath(file_path, self.models_root).split(os.sep)[0]
+
+    def __model_dirs(self, root: str, depth: int) -> List[str]:
+        # models_root/<mentor>/<arch>
+        result = [root]
+        if depth < 2:
+            try:
+                for entry in os.scandir(root):
+                    if entry.is_dir():
+                        result.extend(self.__model_dirs(entry.path, depth + 1))
+            except (FileNotFoundError, NotADirectoryError):
+                pass
+        return result
+
+    def __model_files(self) -> List[str]:
+        return [
+            path.join(d, f)
+            for d in self.__model_dirs(self.models_root, 0)
+            for f in MODEL_FILES
+            if path.isfile(path.join(d, f))
+        ]
+
+    def __watch_poll(self) -> None:
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.scan()
+            except Exception as err:
+                logging.warning(f"model watcher scan failed: {err}")
+
+    def __watch_inotify(self, libc) -> None:
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            logging.warning(
+                "inotify unavailable, model watcher falling back to polling"
+            )
+            return self.__watch_poll()
+        watches: Dict[int, Tuple[str, int]] = {}
+
+        def add_watches(root: str, depth: int) -> None:
+            for d in self.__model_dirs(root, depth):
+                wd = libc.inotify_add_watch(fd, os.fsencode(d), INOTIFY_MASK)
+                if wd >= 0:
+                    rel = path.relpath(d, self.models_root)
+                    watches[wd] = (d, 0 if rel == "." else len(rel.split(os.sep)))
+
+        add_watches(self.models_root, 0)
+        while True:
+            try:
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if not ready:
+                    self.scan()
+                    continue
+                buf = os.read(fd, 64 * 1024)
+                offset = 0
+                while offset < len(buf):
+                    wd, mask, _, length = INOTIFY_EVENT.unpack_from(buf, offset)
+                    offset += INOTIFY_EVENT.size
+                    name = os.fsdecode(buf[offset:][:length].rstrip(b"\0"))
+                    offset += length
+                    if mask & IN_Q_OVERFLOW:
+                        add_watches(self.models_root, 0)
+                        self.scan()
+                        continue
+                    if wd not in watches:
+                        continue
+                    parent, depth = watches[wd]
+                    event_path = path.join(parent, name)
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO) and depth < 2:
+                            add_watches(event_path, depth + 1)
+                            self.scan()
+                    elif (
+                        name in MODEL_FILES and depth == 2 and mask & INOTIFY_FILE_MASK
+                    ):
+                        self.check(event_path)
+            except Exception as err:
+                logging.warning(f"model watcher failed to process events: {err}")
+
+
+_watchers: Dict[str, ModelVersionWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def find_or_create_model_watcher(models_root: str) -> ModelVersionWatcher:
+    abs_path = path.abspath(models_root)
+    with _watchers_lock:
+        if abs_path not in _watchers:
+            _watchers[abs_path] = ModelVersionWatcher(
+                abs_path,
+                poll_interval=float(environ.get("MODEL_WATCHER_POLL_INTERVAL") or 2.0),
+            ).start(mode=environ.get("MODEL_WATCHER") or "auto")
+        return _watchers[abs_path]
+
+
+def notify_model_updated(models_root: str, mentor_id: str) -> None:
+    """
+    lets watchers in this process see a model saved by this process
+    without waiting on the filesystem
+    """
+    watcher = _watchers.get(path.abspath(models_root))
+    if watcher is not None:
+        watcher.check_mentor(mentor_id)
@@ -9,7 +9,7 @@ from dataclasses import dataclass
 import logging
 from os import path, environ
 from string import Template
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Union
 from spacy.matcher import PhraseMatcher
 from spacy import Language
 from spacy.tokens.span import Span
@@ -23,7 +23,10 @@ from mentor_classifier.utils import get_shared_root, props_to_bool
 from sentence_transformers import util, SentenceTransformer
 import torch
 from torch import Tensor
-from mentor_classifier.sentence_transformer import find_or_load_sentence_transformer
+from mentor_classifier.sentence_transformer import (
+    TorchScriptSentenceEncoder,
+    find_or_load_sentence_encoder,
+)
 from mentor_classifier.stopwords import STOPWORDS
 import csv
 
@@ -110,7 +113,7 @@ class NamedEntities:
         self.acronyms: Dict[str, EntityObject] = {}
         self.family: Dict[str, EntityObject] = {}
         self.model: Language
-        self.transformer: SentenceTransformer
+        self.transformer: Union[SentenceTransformer, TorchScriptSentenceEncoder]
         self.pop_culture: Set[str] = set()
         self.answers = Tensor
         self.load(answers, mentor_name, shared_root or get_shared_root())
@@ -123,7 +126,7 @@ class NamedEntities:
         test: bool = False,
     ):
         self.model = find_or_load_spacy(path.join(shared_root, "spacy-model"))
-        self.transformer = find_or_load_sentence_transformer(
+        self.transformer = find_or_load_sentence_encoder(
             path.join(shared_root, "sentence-transformer")
         )
         self.load_pop_culture(shared_root, test)
@@ -289,7 +292,9 @@ class NamedEntities:
         followups_text = [followups[followup].question for followup in followups.keys()]
         answered_text = [question.question_text for question in answered]
         questions = answered_text + followups_text
-        paraphrases = util.paraphrase_mining(self.transformer, questions)
+        paraphrases = util.paraphrase_mining_embeddings(
+            self.transformer.encode(questions, convert_to_tensor=True)
+        )
         for paraphrase in paraphrases:
             score, i, j = paraphrase
             if score > similarity_threshold:
@@ -0,0 +1,218 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from collections import Counter
+from os import environ, path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.linear_model import RidgeClassifier
+
+from mentor_classifier.log import logger
+from mentor_classifier.utils import props_to_bool
+
+RIDGE_STATS_FILE = "ridge_stats.npz"
+
+
+def ridge_stats_path(model_path: str) -> str:
+    return path.join(model_path, RIDGE_STATS_FILE)
+
+
+def use_incremental_training() -> bool:
+    return props_to_bool("INCREMENTAL_TRAINING", environ)
+
+
+class RidgeStatistics:
+    """
+    Sufficient statistics for a RidgeClassifier with fit_intercept:
+    the row count, sum of rows, Gram matrix XᵀX and the row count and sum
+    per class (which together give XᵀY for sklearn's -1/+1 label coding).
+    Rows and classes can be added or removed in O(d²) per row
+    and solve() gives the same model RidgeClassifier.fit would.
+
+    Also keeps the (text, label) training rows it was built from,
+    so a later training can work out which rows changed.
+    """
+
+    def __init__(self, feature_model_id: str, dim: int):
+        self.feature_model_id = feature_model_id
+        self.n = 0
+        self.x_sum = np.zeros(dim, dtype=np.float64)
+        self.xtx = np.zeros((dim, dim), dtype=np.float64)
+        self.class_counts: Dict[str, int] = {}
+        self.class_sums: Dict[str, np.ndarray] = {}
+        self.rows: Counter = Counter()
+
+    @property
+    def dim(self) -> int:
+        return self.x_sum.shape[0]
+
+    @property
+    def classes(self) -> List[str]:
+        return sorted(self.class_counts)
+
+    def add(self, texts: Sequence[str], labels: Sequence[str], x) -> None:
+        self.__update(texts, labels, x, 1)
+
+    def remove(self, texts: Sequence[str], labels: Sequence[str], x) -> None:
+        self.__update(texts, labels, x, -1)
+
+    def __update(self, texts: Sequence[str], labels: Sequence[str], x, sign: int):
+        x = np.asarray(x, dtype=np.float64).reshape(-1, self.dim)
+        if not (len(texts) == len(labels) == x.shape[0]):
+            raise ValueError("texts, labels and rows must have the same length")
+        if x.shape[0] == 0:
+            return
+        self.n += sign * x.shape[0]
+        self.x_sum += sign * x.sum(axis=0)
+        self.xtx += sign * (x.T @ x)
+        for text, label, row in zip(texts, labels, x):
+            count = self.class_counts.get(label, 0) + sign
+            if count < 0:
+                raise ValueError(f"no rows to remove for class {label}")
+            if count == 0:
+                # the answer has no rows left, drop its column
+                del self.class_counts[label]
+                del self.class_sums[label]
+                continue
+            self.class_counts[label] = count
+            if label not in self.class_sums:
+                self.class_sums[label] = np.zeros(self.dim, dtype=np.float64)
+            self.class_sums[label] += sign * row
+        if sign > 0:
+            self.rows += Counter(zip(texts, labels))
+        else:
+            self.rows -= Counter(zip(texts, labels))
+
+    def solve(self, alpha: float = 1.0) -> RidgeClassifier:
+        classes = self.classes
+        if len(classes) < 2:
+            raise ValueError(
+                f"needs samples of at least 2 classes, got {len(classes)} class"
+            )
+        x_mean = self.x_sum / self.n
+        gram = self.xtx - self.n * np.outer(x_mean, x_mean)
+        counts = np.array([self.class_counts[c] for c in classes], dtype=np.float64)
+        sums = np.stack([self.class_sums[c] for c in classes])
+        # a binary classifier has a single column scoring classes[1]
+        if len(classes) == 2:
+            counts, sums = counts[1:], sums[1:]
+        # Y is +1 for rows of the class and -1 otherwise
+        y_mean = (2 * counts - self.n) / self.n
+        xty = (2 * sums - self.x_sum).T
+        xty_centered = xty - self.n * np.outer(x_mean, y_mean)
+        gram[np.diag_indices_from(gram)] += alpha
+        coef = np.linalg.solve(gram, xty_centered).T
+        intercept = y_mean - coef @ x_mean
+        # fit on one dummy row per class so that the classifier sets up
+        # its label encoding the same way whichever sklearn version is used
+        model = RidgeClassifier(alpha=alpha)
+        model.fit(np.zeros((len(classes), self.dim)), classes)
+        model.coef_ = coef
+        model.intercept_ = intercept
+        return model
+
+    def diff(
+        self, texts: Sequence[str], labels: Sequence[str]
+    ) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """
+        Returns the (text, label) rows to add and to remove
+        to go from the rows these statistics hold to the given rows
+        """
+        new_rows = Counter(zip(texts, labels))
+        return (
+            list((new_rows - self.rows).elements()),
+            list((self.rows - new_rows).elements()),
+        )
+
+    def save(self, file_path: str) -> None:
+        classes = self.classes
+        rows = list(self.rows.elements())
+        with open(file_path, "wb") as f:
+            np.savez(
+                f,
+                feature_model_id=np.array(self.feature_model_id),
+                n=np.array(self.n),
+                x_sum=self.x_sum,
+                xtx=self.xtx,
+                classes=np.array(classes, dtype=str),
+                class_counts=np.array([self.class_counts[c] for c in classes]),
+                class_sums=np.stack([self.class_sums[c] for c in classes])
+                if classes
+                else np.zeros((0, self.dim)),
+                row_texts=np.array([t for t, _ in rows], dtype=str),
+                row_labels=np.array([lbl for _, lbl in rows], dtype=str),
+            )
+
+    @classmethod
+    def load(cls, file_path: str) -> "RidgeStatistics":
+        with np.load(file_path, allow_pickle=False) as data:
+            stats = cls(str(data["feature_model_id"]), data["x_sum"].shape[0])
+            stats.n = int(data["n"])
+            stats.x_sum = data["x_sum"]
+            stats.xtx = data["xtx"]
+            classes = [str(c) for c in data["classes"]]
+            stats.class_counts = dict(
+                zip(classes, (int(c) for c in data["class_counts"]))
+            )
+            stats.class_sums = dict(zip(classes, data["class_sums"]))
+            stats.rows = Counter(
+                zip(
+                    (str(t) for t in data["row_texts"]),
+                    (str(lbl) for lbl in data["row_labels"]),
+                )
+            )
+        return stats
+
+    @classmethod
+    def from_training_data(
+        cls, feature_model_id: str, texts: Sequence[str], labels: Sequence[str], x
+    ) -> "RidgeStatistics":
+        x = np.asarray(x)
+        stats = cls(feature_model_id, x.shape[1])
+        stats.add(texts, labels, x)
+        return stats
+
+
+def train_ridge_incremental(
+    stats_path: str,
+    feature_model_id: str,
+    texts: Sequence[str],
+    labels: Sequence[str],
+    embed: Callable[[List[str]], np.ndarray],
+    alpha: float = 1.0,
+) -> Optional[Tuple[RidgeClassifier, RidgeStatistics]]:
+    """
+    Updates the statistics saved by a previous training to the given
+    training rows, embedding only the rows that were added or removed,
+    and re-solves the classifier.
+    Returns None when there are no usable statistics
+    and a full training is needed instead
+    """
+    if not path.isfile(stats_path):
+        return None
+    try:
+        stats = RidgeStatistics.load(stats_path)
+    except Exception as x_load:
+        logger.warning(f"failed to load ridge statistics {stats_path}: {x_load}")
+        return None
+    if stats.feature_model_id != feature_model_id:
+        logger.info(
+            f"ridge statistics were computed for {stats.feature_model_id}, "
+            f"retraining from scratch for {feature_model_id}"
+        )
+        return None
+    added, removed = stats.diff(texts, labels)
+    for rows, update in ((removed, stats.remove), (added, stats.add)):
+        if rows:
+            row_texts = [t for t, _ in rows]
+            update(row_texts, [lbl for _, lbl in rows], embed(row_texts))
+    if len(stats.classes) < 2:
+        return None
+    logger.info(
+        f"incremental ridge training: {len(added)} rows added, {len(removed)} removed"
+    )
+    return stats.solve(alpha), stats
@@ -0,0 +1,57 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from typing import Tuple
+
+import numpy as np
+
+
+class LinearScorer:
+    """
+    Scores questions against a trained linear classifier (e.g. sklearn RidgeClassifier)
+    with a single matrix multiply over contiguous float32 copies of its weights.
+
+    The best score is always the score of the predicted class,
+    so for a binary classifier it is |decision_function|.
+    (The lr arch used to report the signed decision value, the score of classes_[1],
+    so confident classes_[0] answers of 2-answer mentors looked off topic.)
+    """
+
+    def __init__(self, model):
+        coef = np.asarray(model.coef_, dtype=np.float32)
+        intercept = np.asarray(model.intercept_, dtype=np.float32)
+        # binary classifiers have a single row of weights scoring classes_[1],
+        # classes_[0] gets the negated score (same as sklearn's decision rule)
+        self.binary = coef.ndim == 1 or coef.shape[0] == 1
+        self.coef = np.ascontiguousarray(coef.reshape(-1, coef.shape[-1]).T)
+        self.intercept = np.ascontiguousarray(intercept.reshape(-1))
+        self.classes = np.asarray(model.classes_)
+
+    def scores(self, x) -> np.ndarray:
+        """
+        Returns an (n_questions, n_classes) matrix of decision scores
+        """
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        s = x @ self.coef
+        s += self.intercept
+        return np.hstack([-s, s]) if self.binary else s
+
+    def top_k(self, x, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the indexes into classes and scores of the k best classes
+        for each question, best first, each as an (n_questions, k) array
+        """
+        s = self.scores(x)
+        k = max(1, min(k, s.shape[1]))
+        if k == 1:
+            best = s.argmax(axis=1).reshape(-1, 1)
+        else:
+            best = np.argpartition(-s, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(s, best, axis=1)
+            best = np.take_along_axis(best, np.argsort(-best_scores, axis=1), axis=1)
+        return best, np.take_along_axis(s, best, axis=1)
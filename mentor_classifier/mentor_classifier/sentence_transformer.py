@@ -4,22 +4,202 @@
 #
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
-from os import path
+from os import environ, makedirs, path
 from sentence_transformers import SentenceTransformer
-from typing import Dict
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple, Type, Union
+import joblib
+import json
+import logging
+import numpy as np
 import torch
 
-SENTENCE_TRANSFORMER_MODELS: Dict[str, SentenceTransformer] = {}
+MODEL_NAME = "distilbert-base-nli-mean-tokens"
+QUANTIZE_MODULES_DEFAULT: Tuple[Type[torch.nn.Module], ...] = (torch.nn.Embedding,)
+QUANTIZE_DTYPE_DEFAULT = torch.qint8
 
+TORCHSCRIPT_DIR = f"{MODEL_NAME}-torchscript-int8"
 
-def find_or_load_sentence_transformer(file_path: str) -> SentenceTransformer:
-    abs_path = path.abspath(file_path)
-    if abs_path not in SENTENCE_TRANSFORMER_MODELS:
-        SENTENCE_TRANSFORMER_MODELS[abs_path] = SentenceTransformer(
-            path.join(file_path, "distilbert-base-nli-mean-tokens"), device="cpu"
-        )
-    model = SENTENCE_TRANSFORMER_MODELS[abs_path]
-    quantized = torch.quantization.quantize_dynamic(
-        model, {torch.nn.Embedding}, dtype=torch.qint8
+SentenceTransformerKey = Tuple[str, Tuple[str, ...], str]
+SENTENCE_TRANSFORMER_MODELS: Dict[SentenceTransformerKey, SentenceTransformer] = {}
+_load_lock = Lock()
+
+
+def _quantization_name(
+    modules: Iterable[Type[torch.nn.Module]], dtype: torch.dtype
+) -> Tuple[Tuple[str, ...], str]:
+    return tuple(sorted(m.__name__ for m in modules)), str(dtype).split(".")[-1]
+
+
+def quantized_sentence_transformer_path(
+    file_path: str,
+    modules: Iterable[Type[torch.nn.Module]] = QUANTIZE_MODULES_DEFAULT,
+    dtype: torch.dtype = QUANTIZE_DTYPE_DEFAULT,
+) -> str:
+    module_names, dtype_name = _quantization_name(modules, dtype)
+    config = "-".join(name.lower() for name in module_names + (dtype_name,))
+    return path.join(file_path, f"{MODEL_NAME}-quantized-{config}.pkl")
+
+
+def quantize_sentence_transformer(
+    file_path: str,
+    modules: Iterable[Type[torch.nn.Module]] = QUANTIZE_MODULES_DEFAULT,
+    dtype: torch.dtype = QUANTIZE_DTYPE_DEFAULT,
+) -> SentenceTransformer:
+    model = SentenceTransformer(path.join(file_path, MODEL_NAME), device="cpu")
+    modules = set(modules)
+    if not modules:
+        return model
+    return torch.quantization.quantize_dynamic(
+        model, modules, dtype=dtype, inplace=True
+    )
+
+
+def save_quantized_sentence_transformer(
+    file_path: str,
+    modules: Iterable[Type[torch.nn.Module]] = QUANTIZE_MODULES_DEFAULT,
+    dtype: torch.dtype = QUANTIZE_DTYPE_DEFAULT,
+) -> str:
+    modules = tuple(modules)
+    artifact_path = quantized_sentence_transformer_path(file_path, modules, dtype)
+    joblib.dump(quantize_sentence_transformer(file_path, modules, dtype), artifact_path)
+    return artifact_path
+
+
+def find_or_load_sentence_transformer(
+    file_path: str,
+    modules: Iterable[Type[torch.nn.Module]] = QUANTIZE_MODULES_DEFAULT,
+    dtype: torch.dtype = QUANTIZE_DTYPE_DEFAULT,
+) -> SentenceTransformer:
+    """
+    Returns the sentence transformer at file_path quantized with (modules, dtype).
+    The quantized model is shared by all callers in the process
+    and is loaded from a pre-quantized artifact when one has been saved
+    """
+    modules = tuple(modules)
+    key = (path.abspath(file_path),) + _quantization_name(modules, dtype)
+    if key in SENTENCE_TRANSFORMER_MODELS:
+        return SENTENCE_TRANSFORMER_MODELS[key]
+    with _load_lock:
+        if key not in SENTENCE_TRANSFORMER_MODELS:
+            artifact_path = quantized_sentence_transformer_path(
+                file_path, modules, dtype
+            )
+            if path.isfile(artifact_path):
+                logging.info(f"loading quantized sentence transformer {artifact_path}")
+                model = joblib.load(artifact_path)
+            else:
+                model = quantize_sentence_transformer(file_path, modules, dtype)
+            SENTENCE_TRANSFORMER_MODELS[key] = model
+    return SENTENCE_TRANSFORMER_MODELS[key]
+
+
+def use_torchscript_backend() -> bool:
+    return (environ.get("EMBEDDING_BACKEND") or "").lower() == "torchscript"
+
+
+class _SentenceEmbeddingModule(torch.nn.Module):
+    def __init__(self, model: SentenceTransformer):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        features = {"input_ids": input_ids, "attention_mask": attention_mask}
+        return self.model(features)["sentence_embedding"]
+
+
+def export_torchscript_sentence_transformer(file_path: str) -> str:
+    """
+    Saves the sentence transformer at file_path as TorchScript
+    with dynamic int8 quantization of all Linear layers (and its tokenizer)
+    """
+    model = SentenceTransformer(path.join(file_path, MODEL_NAME), device="cpu")
+    module = torch.quantization.quantize_dynamic(
+        _SentenceEmbeddingModule(model).eval(), {torch.nn.Linear}, dtype=torch.qint8
     )
-    return quantized
+    example = model.tokenize(["what is your name", "tell me about yourself please"])
+    with torch.no_grad():
+        traced = torch.jit.trace(
+            module,
+            (example["input_ids"], example["attention_mask"]),
+            check_trace=False,
+        )
+    export_path = path.join(file_path, TORCHSCRIPT_DIR)
+    makedirs(export_path, exist_ok=True)
+    torch.jit.save(traced, path.join(export_path, "model.pt"))
+    model.tokenizer.save_pretrained(export_path)
+    with open(path.join(export_path, "encoder_config.json"), "w") as f:
+        json.dump({"max_seq_length": model.max_seq_length}, f)
+    return export_path
+
+
+class TorchScriptSentenceEncoder:
+    """
+    Encodes sentences with an exported TorchScript model,
+    supports the parts of SentenceTransformer.encode we use
+    """
+
+    def __init__(self, export_path: str):
+        from transformers import AutoTokenizer
+
+        self.module = torch.jit.load(path.join(export_path, "model.pt"))
+        self.tokenizer = AutoTokenizer.from_pretrained(export_path)
+        with open(path.join(export_path, "encoder_config.json")) as f:
+            self.max_seq_length = int(json.load(f)["max_seq_length"])
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_tensor: bool = False,
+    ):
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        # sort by length so each batch needs little padding
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        chunks = []
+        with torch.no_grad():
+            for start in range(0, len(texts), batch_size):
+                features = self.tokenizer(
+                    [texts[i] for i in order[start:][:batch_size]],
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_seq_length,
+                    return_tensors="pt",
+                )
+                chunks.append(
+                    self.module(features["input_ids"], features["attention_mask"])
+                )
+        if not chunks:
+            return torch.empty(0) if convert_to_tensor else np.empty(0)
+        embeddings = torch.cat(chunks)[torch.as_tensor(np.argsort(order))]
+        if isinstance(sentences, str):
+            embeddings = embeddings[0]
+        return embeddings if convert_to_tensor else embeddings.numpy()
+
+
+TORCHSCRIPT_ENCODERS: Dict[str, TorchScriptSentenceEncoder] = {}
+
+
+def find_or_load_sentence_encoder(
+    file_path: str,
+) -> Union[SentenceTransformer, TorchScriptSentenceEncoder]:
+    """
+    Returns the exported TorchScript encoder when EMBEDDING_BACKEND=torchscript
+    and it has been exported, otherwise the (quantized) sentence transformer
+    """
+    if not use_torchscript_backend():
+        return find_or_load_sentence_transformer(file_path)
+    export_path = path.abspath(path.join(file_path, TORCHSCRIPT_DIR))
+    if export_path in TORCHSCRIPT_ENCODERS:
+        return TORCHSCRIPT_ENCODERS[export_path]
+    if not path.isfile(path.join(export_path, "model.pt")):
+        logging.warning(
+            f"EMBEDDING_BACKEND=torchscript but {export_path} has not been exported, using torch"
+        )
+        return find_or_load_sentence_transformer(file_path)
+    with _load_lock:
+        if export_path not in TORCHSCRIPT_ENCODERS:
+            logging.info(f"loading torchscript sentence encoder {export_path}")
+            TORCHSCRIPT_ENCODERS[export_path] = TorchScriptSentenceEncoder(export_path)
+    return TORCHSCRIPT_ENCODERS[export_path]
@@ -5,20 +5,27 @@
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
 from os import path
+from typing import Iterable
 from spacy import load, Language
 
 SPACY_MODELS = {}
 
+# components lemmatization does not depend on
+# (the rule lemmatizer needs the tagger and attribute_ruler for POS)
+NOT_NEEDED_FOR_LEMMAS = ("parser", "ner")
 
-def find_or_load_spacy(file_path: str) -> Language:
-    abs_path = path.abspath(file_path)
-    if abs_path not in SPACY_MODELS:
-        SPACY_MODELS[abs_path] = load(
+
+def find_or_load_spacy(file_path: str, exclude: Iterable[str] = ()) -> Language:
+    exclude = tuple(sorted(exclude))
+    key = (path.abspath(file_path), exclude)
+    if key not in SPACY_MODELS:
+        SPACY_MODELS[key] = load(
             path.join(
                 file_path,
                 "en_core_web_sm-3.1.0",
                 "en_core_web_sm",
                 "en_core_web_sm-3.1.0",
-            )
+            ),
+            exclude=exclude,
         )
-    return SPACY_MODELS[abs_path]
+    return SPACY_MODELS[key]
@@ -0,0 +1,183 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import logging
+import threading
+import uuid
+from os import environ
+from typing import Dict, Optional, Tuple
+
+import redis
+
+from mentor_classifier.utils import props_to_bool
+
+# KEYS: pending, running, dirty ARGV: new task id, ttl
+# returns the task id the request gets and 1 if that task must be enqueued now
+_REQUEST = """
+local pending = redis.call("GET", KEYS[1])
+if pending then
+    if redis.call("EXISTS", KEYS[2]) == 0 and redis.call("DEL", KEYS[3]) == 1 then
+        -- the follow-up of a training whose worker died without finishing
+        return {pending, 1}
+    end
+    return {pending, 0}
+end
+redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[2])
+if redis.call("EXISTS", KEYS[2]) == 1 then
+    redis.call("SET", KEYS[3], "1", "EX", ARGV[2])
+    return {ARGV[1], 0}
+end
+return {ARGV[1], 1}
+"""
+
+# KEYS: pending, running ARGV: task id, running ttl
+_START = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("DEL", KEYS[1])
+end
+redis.call("SET", KEYS[2], ARGV[1], "EX", ARGV[2])
+return 1
+"""
+
+# KEYS: running ARGV: task id, running ttl
+_REFRESH = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+# KEYS: pending, running, dirty ARGV: task id
+# returns the id of the follow-up task to enqueue, if any
+_FINISH = """
+if redis.call("GET", KEYS[2]) == ARGV[1] then
+    redis.call("DEL", KEYS[2])
+end
+if redis.call("DEL", KEYS[3]) == 1 then
+    return redis.call("GET", KEYS[1])
+end
+return false
+"""
+
+
+def use_training_job_coalescing() -> bool:
+    return props_to_bool("TRAIN_COALESCE", environ)
+
+
+def _str(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+class TrainingJobCoalescer:
+    """
+    Keeps at most one queued training per mentor, tracked in redis:
+    while a mentor's training is queued, new requests get that task's id;
+    a request that arrives while the mentor is training gets the id of
+    a single follow-up training, which the running task enqueues when it finishes.
+    Queued keys expire after ttl seconds. A running training refreshes its key
+    every running_ttl / 3 seconds, so it never expires mid-run,
+    but a crashed worker blocks a mentor for at most running_ttl:
+    the next request then enqueues the follow-up the crashed worker never did.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        ttl: int = 3600,
+        prefix: str = "classifier:train",
+        running_ttl: int = 60,
+    ):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.running_ttl = max(3, running_ttl)
+        self.prefix = prefix
+        self._request = redis_client.register_script(_REQUEST)
+        self._start = redis_client.register_script(_START)
+        self._refresh = redis_client.register_script(_REFRESH)
+        self._finish = redis_client.register_script(_FINISH)
+        self._heartbeats: Dict[str, threading.Event] = {}
+        self._heartbeats_lock = threading.Lock()
+
+    def request(self, mentor: str) -> Tuple[str, bool]:
+        """
+        Returns the id of the task that will train the mentor
+        and whether the caller must enqueue it (with that task id)
+        """
+        task_id, enqueue = self._request(
+            keys=self.__keys(mentor, "pending", "running", "dirty"),
+            args=[str(uuid.uuid4()), self.ttl],
+        )
+        return _str(task_id), bool(int(enqueue))
+
+    def start(self, mentor: str, task_id: str) -> None:
+        """
+        Marks task_id as training the mentor until finish is called
+        """
+        self._start(
+            keys=self.__keys(mentor, "pending", "running"),
+            args=[task_id, self.running_ttl],
+        )
+        stop = threading.Event()
+        with self._heartbeats_lock:
+            self._heartbeats[task_id] = stop
+        threading.Thread(
+            target=self.__heartbeat,
+            args=(mentor, task_id, stop),
+            name="training-heartbeat",
+            daemon=True,
+        ).start()
+
+    def finish(self, mentor: str, task_id: str) -> Optional[str]:
+        """
+        Returns the id of a follow-up training to enqueue
+        if the mentor was requested to train while task_id was running
+        """
+        with self._heartbeats_lock:
+            stop = self._heartbeats.pop(task_id, None)
+        if stop:
+            stop.set()
+        follow_up = self._finish(
+            keys=self.__keys(mentor, "pending", "running", "dirty"), args=[task_id]
+        )
+        return _str(follow_up) if follow_up else None
+
+    def __heartbeat(self, mentor: str, task_id: str, stop: threading.Event) -> None:
+        while not stop.wait(self.running_ttl / 3):
+            try:
+                self._refresh(
+                    keys=self.__keys(mentor, "running"),
+                    args=[task_id, self.running_ttl],
+                )
+            except Exception as err:
+                logging.warning(f"failed to refresh training of {mentor}: {err}")
+
+    def __keys(self, mentor: str, *names: str):
+        return [f"{self.prefix}:{mentor}:{name}" for name in names]
+
+
+_coalescer: Optional[TrainingJobCoalescer] = None
+
+
+def find_training_job_coalescer() -> Optional[TrainingJobCoalescer]:
+    """
+    Returns None unless TRAIN_COALESCE is set.
+    Uses TRAIN_COALESCE_REDIS_URL, or else the celery broker
+    """
+    global _coalescer
+    if not use_training_job_coalescing():
+        return None
+    if _coalescer is None:
+        _coalescer = TrainingJobCoalescer(
+            redis.Redis.from_url(
+                environ.get("TRAIN_COALESCE_REDIS_URL")
+                or environ.get("CLASSIFIER_CELERY_BROKER_URL")
+                or environ.get("CELERY_BROKER_URL")
+                or "redis://redis:6379/0"
+            ),
+            ttl=int(environ.get("TRAIN_COALESCE_TTL") or "3600"),
+            running_ttl=int(environ.get("TRAIN_COALESCE_RUNNING_TTL") or "60"),
+        )
+    return _coalescer
@@ -0,0 +1,124 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import Callable, ContextManager, Iterator, List, Optional
+
+import numpy as np
+
+STAGE_FETCH = "fetch"
+STAGE_EMBED = "embed"
+STAGE_FIT = "fit"
+STAGE_CROSS_VALIDATION = "cross_validation"
+STAGE_SAVE = "save"
+
+
+@dataclass
+class TrainingStage:
+    name: str
+    seconds: float = 0.0
+    done: int = 0  # e.g. rows embedded or folds fit so far
+    total: int = 0
+
+
+class TrainingProgress:
+    """
+    Records the stages of a training with how long each took
+    and how far the current one is, calling on_update with to_dict()
+    whenever a stage starts or ends and at most every min_interval seconds in between.
+    Safe to advance from multiple threads.
+    """
+
+    def __init__(
+        self,
+        on_update: Optional[Callable[[dict], None]] = None,
+        min_interval: float = 0.5,
+    ):
+        self.on_update = on_update
+        self.min_interval = min_interval
+        self.stages: List[TrainingStage] = []
+        self._started = time.perf_counter()
+        self._stage_started = self._started
+        self._in_stage = False
+        self._last_update = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, total: int = 0) -> Iterator["TrainingProgress"]:
+        with self._lock:
+            self.stages.append(TrainingStage(name, total=total))
+            self._stage_started = time.perf_counter()
+            self._in_stage = True
+        self.__update(force=True)
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self.stages[-1].seconds = time.perf_counter() - self._stage_started
+                self._in_stage = False
+            self.__update(force=True)
+
+    def advance(self, n: int = 1) -> None:
+        with self._lock:
+            if self.stages:
+                self.stages[-1].done += n
+        self.__update()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = [asdict(s) for s in self.stages]
+            if self._in_stage:
+                stages[-1]["seconds"] = time.perf_counter() - self._stage_started
+            return {
+                "stage": stages[-1]["name"] if self._in_stage else "",
+                "elapsed": time.perf_counter() - self._started,
+                "stages": stages,
+            }
+
+    def summary(self) -> str:
+        return ", ".join(f"{s.name} {s.seconds:.2f}s" for s in self.stages)
+
+    def __update(self, force: bool = False):
+        if self.on_update is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_update < self.min_interval:
+            return
+        self._last_update = now
+        self.on_update(self.to_dict())
+
+
+def training_stage(
+    progress: Optional[TrainingProgress], name: str, total: int = 0
+) -> ContextManager:
+    return nullcontext() if progress is None else progress.stage(name, total)
+
+
+def embed_with_progress(
+    embed: Callable[[List[str]], np.ndarray],
+    texts: List[str],
+    progress: Optional[TrainingProgress],
+    batch_size: int = 256,
+) -> np.ndarray:
+    """
+    Embeds texts in batches of batch_size in an embed stage
+    that counts the rows embedded so far
+    """
+    if progress is None:
+        return np.asarray(embed(texts))
+    with progress.stage(STAGE_EMBED, total=len(texts)):
+        if not texts:
+            return np.asarray(embed(texts))
+        batches = []
+        for i in range(0, len(texts), batch_size):
+            end = i + batch_size
+            batch = texts[i:end]
+            batches.append(np.asarray(embed(batch)))
+            progress.advance(len(batch))
+        return np.concatenate(batches)
@@ -5,8 +5,11 @@
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
 from os import _Environ, environ
-from typing import Any, Dict, Union, List
+from typing import Any, Dict, Union, List, Optional, Set
 from pathlib import Path
+import sys
+
+import numpy as np
 
 
 def use_average_embedding() -> bool:
@@ -56,3 +59,38 @@ def props_to_bool(
         return dft
     v = props[name]
     return str(v).lower() in ["1", "t", "true"]
+
+
+def deep_sizeof(*objs: Any, seen: Optional[Set[int]] = None) -> int:
+    """
+    Approximate resident size in bytes of objs and everything they reference.
+    An object reachable from more than one of objs is only counted once.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = list(objs)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        # for arrays that own their data getsizeof includes the buffer,
+        # views are charged to the array they were taken from
+        size += sys.getsizeof(obj)
+        if isinstance(obj, np.ndarray):
+            if obj.base is not None:
+                stack.append(obj.base)
+            continue
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        if hasattr(obj, "__dict__"):
+            stack.append(vars(obj))
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                stack.append(getattr(obj, slot))
+    return size
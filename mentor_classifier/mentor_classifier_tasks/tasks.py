@@ -6,20 +6,57 @@
 #
 import os
 import logging
+from dataclasses import asdict
+from typing import List, Union
 
 from dotenv import load_dotenv
 
 load_dotenv()  # take environment variables from .env.
 from celery import Celery  # NOQA
+from celery.signals import worker_init, worker_process_init  # NOQA
 from kombu import Exchange, Queue  # NOQA
 
 from mentor_classifier import ClassifierFactory  # NOQA
+from mentor_classifier.bulk_train import MentorTrainingReport, bulk_train  # NOQA
+from mentor_classifier.mentor import Mentor, training_mentor_data  # NOQA
+from mentor_classifier.training_jobs import find_training_job_coalescer  # NOQA
+from mentor_classifier.training_progress import STAGE_FETCH, TrainingProgress  # NOQA
 
 
 def get_queue_classifier() -> str:
     return os.environ.get("CLASSIFIER_QUEUE_NAME") or "classifier"
 
 
+def get_available_memory_mb() -> int:
+    """
+    MemAvailable from /proc/meminfo, which unlike free memory
+    counts the page cache the kernel can reclaim, or else total memory
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // 1024 ** 2
+
+
+def get_worker_concurrency() -> int:
+    """
+    CLASSIFIER_WORKER_CONCURRENCY if set, otherwise one worker per cpu,
+    or fewer if CLASSIFIER_WORKER_JOB_MEMORY_MB (the memory one training job needs
+    besides the shared models) is set and that many jobs don't fit in available memory
+    """
+    if os.environ.get("CLASSIFIER_WORKER_CONCURRENCY"):
+        return max(1, int(os.environ["CLASSIFIER_WORKER_CONCURRENCY"]))
+    concurrency = os.cpu_count() or 1
+    job_memory_mb = int(os.environ.get("CLASSIFIER_WORKER_JOB_MEMORY_MB") or "0")
+    if job_memory_mb > 0:
+        concurrency = min(concurrency, get_available_memory_mb() // job_memory_mb)
+    return max(1, concurrency)
+
+
 broker_url = (
     os.environ.get("CLASSIFIER_CELERY_BROKER_URL")
     or os.environ.get("CELERY_BROKER_URL")
@@ -37,7 +74,8 @@ celery.conf.update(
             or os.environ.get("CELERY_RESULT_BACKEND")
             or "redis://redis:6379/0"
         ),
-        # "worker_concurrency": 1,    "worker_prefetch_multiplier": 1,
+        "worker_concurrency": get_worker_concurrency(),
+        # "worker_prefetch_multiplier": 1,
         "result_serializer": os.environ.get("CELERY_RESULT_SERIALIZER", "json"),
         "task_default_queue": get_queue_classifier(),
         "task_default_exchange": get_queue_classifier(),
@@ -58,19 +96,93 @@ celery.conf.update(
 
 OUTPUT_ROOT = os.environ.get("OUTPUT_ROOT") or "models"
 SHARED_ROOT = os.environ.get("SHARED_ROOT") or "shared"
+# process (default): load shared models in each pool process as it starts
+# fork: load them in the worker's main process before it forks its pool processes,
+# so they share the models' memory (copy-on-write). torch's thread pools are not
+# fork safe, so pool processes may hang or run single threaded
+# none: load them in the first task each pool process runs
+PRELOAD_SHARED_MODELS = (os.environ.get("PRELOAD_SHARED_MODELS") or "process").lower()
+
+
+def preload_shared_models():
+    # PRELOAD_ARCHS is a comma separated list, by default just CLASSIFIER_ARCH
+    for arch in (os.environ.get("PRELOAD_ARCHS") or "").split(","):
+        arch = arch.strip()
+        logging.info(f"preloading shared models for {arch or 'default arch'}")
+        ClassifierFactory().preload_training(SHARED_ROOT, arch)
+
+
+@worker_init.connect
+def preload_before_fork(**kwargs):
+    if PRELOAD_SHARED_MODELS == "fork":
+        preload_shared_models()
+
+
+@worker_process_init.connect
+def preload_in_process(**kwargs):
+    if PRELOAD_SHARED_MODELS == "process":
+        preload_shared_models()
 
 
-@celery.task()
-def train_task(mentor: str, arch: str = "") -> float:
+@celery.task(bind=True)
+def train_task(self, mentor: str, arch: str = "") -> float:
+    coalescer = find_training_job_coalescer()
+    if coalescer:
+        coalescer.start(mentor, self.request.id)
+    # stage progress and timing is published as the PROGRESS state's info
+    progress = TrainingProgress(
+        lambda info: self.update_state(state="PROGRESS", meta=info)
+    )
     try:
+        with progress.stage(STAGE_FETCH):
+            mentor_data = Mentor(mentor, purpose=training_mentor_data())
         result = (
             ClassifierFactory()
             .new_training(
-                mentor=mentor, shared_root=SHARED_ROOT, data_path=OUTPUT_ROOT, arch=arch
+                mentor=mentor_data,
+                shared_root=SHARED_ROOT,
+                data_path=OUTPUT_ROOT,
+                arch=arch,
             )
-            .train(SHARED_ROOT)
+            .train(SHARED_ROOT, progress)
         )
+        logging.info(f"trained {mentor}: {progress.summary()}")
         return result.accuracy
     except Exception as err:
         logging.exception(err)
         raise (err)
+    finally:
+        # the mentor was requested to train again while this task was running
+        follow_up = coalescer.finish(mentor, self.request.id) if coalescer else None
+        if follow_up:
+            train_task.apply_async(args=[mentor, arch], task_id=follow_up)
+
+
+@celery.task(bind=True)
+def bulk_train_task(self, mentors: Union[str, List[str]], arch: str = "") -> List[dict]:
+    """
+    Retrains a list of mentors, or all mentors with models in OUTPUT_ROOT
+    if mentors is 'all'. Reports per-mentor progress in the PROGRESS state.
+    """
+    reports: List[dict] = []
+
+    def on_progress(report: MentorTrainingReport, done: int, total: int):
+        reports.append(asdict(report))
+        self.update_state(
+            state="PROGRESS", meta={"done": done, "total": total, "mentors": reports}
+        )
+
+    try:
+        return [
+            asdict(r)
+            for r in bulk_train(
+                mentors if isinstance(mentors, list) else [mentors],
+                shared_root=SHARED_ROOT,
+                output_dir=OUTPUT_ROOT,
+                arch=arch,
+                on_progress=on_progress,
+            )
+        ]
+    except Exception as err:
+        logging.exception(err)
+        raise (err)
@@ -0,0 +1,70 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import json
+from os import makedirs, path
+
+import responses
+
+from mentor_classifier import ARCH_LR, ARCH_LR_TRANSFORMER, mentor_model_path
+from mentor_classifier.bulk_train import bulk_train, trained_mentor_ids
+from .helpers import fixture_path
+
+
+def test_all_mentors_are_the_mentors_with_models_for_the_arch(tmpdir):
+    makedirs(mentor_model_path(tmpdir, "m1", ARCH_LR))
+    makedirs(mentor_model_path(tmpdir, "m2", ARCH_LR_TRANSFORMER))
+    makedirs(mentor_model_path(tmpdir, "m3", ARCH_LR))
+    assert trained_mentor_ids(tmpdir, ARCH_LR) == ["m1", "m3"]
+
+
+@responses.activate
+def test_retrains_all_mentors_and_reports_progress(tmpdir, shared_root: str):
+    with open(fixture_path("graphql/clint.json")) as f:
+        data = json.load(f)
+    responses.add(responses.POST, "http://graphql/graphql", json=data, status=200)
+    makedirs(mentor_model_path(tmpdir, "clint", ARCH_LR))
+    progress = []
+    reports = bulk_train(
+        ["all"],
+        shared_root,
+        tmpdir,
+        ARCH_LR,
+        fit_processes=1,
+        on_progress=lambda report, done, total: progress.append(
+            (report.mentor, done, total)
+        ),
+    )
+    assert [r.mentor for r in reports] == ["clint"]
+    assert reports[0].error == ""
+    assert progress == [("clint", 1, 1)]
+    assert path.exists(mentor_model_path(tmpdir, "clint", ARCH_LR, "model.pkl"))
+
+
+@responses.activate
+def test_reports_mentors_that_failed_to_embed(tmpdir, shared_root: str, monkeypatch):
+    with open(fixture_path("graphql/clint.json")) as f:
+        data = json.load(f)
+    responses.add(responses.POST, "http://graphql/graphql", json=data, status=200)
+
+    def fail_to_embed(trainings, rows, batch_size):
+        raise Exception("embedding failed")
+
+    monkeypatch.setattr("mentor_classifier.bulk_train._embed_pooled", fail_to_embed)
+    progress = []
+    reports = bulk_train(
+        ["clint"],
+        shared_root,
+        tmpdir,
+        ARCH_LR,
+        fit_processes=1,
+        on_progress=lambda report, done, total: progress.append(
+            (report.mentor, done, total)
+        ),
+    )
+    assert reports[0].error == "embedding failed"
+    assert progress == [("clint", 1, 1)]
+    assert not path.exists(mentor_model_path(tmpdir, "clint", ARCH_LR, "model.pkl"))
@@ -0,0 +1,57 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import numpy as np
+import pytest
+from sklearn.linear_model import RidgeClassifier
+from sklearn.model_selection import LeaveOneOut, cross_val_predict, cross_val_score
+
+from mentor_classifier.cross_validation import (
+    LEAVE_ONE_OUT,
+    cross_validate,
+    cross_validation_jobs,
+    ridge_leave_one_out_predictions,
+)
+
+
+def _training_data(n_classes: int):
+    rng = np.random.default_rng(0)
+    y = np.array([f"a{i % n_classes}" for i in range(24)])
+    x = rng.normal(size=(len(y), 5)) + np.array(
+        [[int(label[1:]), 0, 0, 0, 0] for label in y]
+    )
+    return x, y
+
+
+@pytest.mark.parametrize("n_classes", [2, 4])
+def test_matches_cross_val_score_and_cross_val_predict(n_classes: int):
+    x, y = _training_data(n_classes)
+    classifier = RidgeClassifier(alpha=1.0)
+    result = cross_validate(classifier, x, y, cv=2, n_jobs=2)
+    np.testing.assert_allclose(result.scores, cross_val_score(classifier, x, y, cv=2))
+    expected = cross_val_predict(classifier, x, y, cv=2)
+    assert list(result.predictions) == list(expected)
+    assert result.accuracy == pytest.approx(np.mean(expected == y))
+
+
+@pytest.mark.parametrize("n_classes", [2, 4])
+def test_closed_form_leave_one_out_matches_refitting(n_classes: int):
+    x, y = _training_data(n_classes)
+    expected = cross_val_predict(RidgeClassifier(alpha=1.0), x, y, cv=LeaveOneOut())
+    assert list(ridge_leave_one_out_predictions(x, y, 1.0)) == list(expected)
+    result = cross_validate(RidgeClassifier(alpha=1.0), x, y, cv=LEAVE_ONE_OUT)
+    assert len(result.scores) == len(y)
+    assert result.accuracy == pytest.approx(np.mean(expected == y))
+
+
+def test_cross_validation_jobs(monkeypatch):
+    monkeypatch.delenv("CROSS_VALIDATION_JOBS", raising=False)
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    assert cross_validation_jobs(2) == 2
+    assert cross_validation_jobs(10) == 4
+    assert cross_validation_jobs(LEAVE_ONE_OUT) == -1
+    monkeypatch.setenv("CROSS_VALIDATION_JOBS", "1")
+    assert cross_validation_jobs(10) == 1
@@ -5,13 +5,15 @@
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
 import json
+import threading
+import time
 from os import path
 from shutil import copytree
 
 import responses
 import pytest
 
-from mentor_classifier.dao import Dao
+from mentor_classifier.dao import ClassifierCache, Dao, Entry
 from mentor_classifier import ClassifierFactory
 from .helpers import fixture_path
 
@@ -45,3 +47,103 @@ def test_find_classifier_returns_updated_classifier_if_model_has_changed(
     ).train(shared_root)
     c2 = dao.find_classifier(mentor_id)
     assert c1 != c2
+
+
+def _entry(size: int) -> Entry:
+    return Entry(None, 0, size)  # type: ignore
+
+
+def test_classifier_cache_evicts_least_recently_used_to_stay_under_max_bytes():
+    cache = ClassifierCache(max_size=100, max_bytes=100)
+    cache[("m1", "lr")] = _entry(40)
+    cache[("m2", "lr")] = _entry(40)
+    cache[("m1", "lr")]
+    cache[("m3", "lr")] = _entry(40)
+    assert ("m1", "lr") in cache
+    assert ("m2", "lr") not in cache
+    assert ("m3", "lr") in cache
+    assert cache.total_bytes == 80
+
+
+def test_classifier_cache_evicts_to_stay_under_max_size():
+    cache = ClassifierCache(max_size=2, max_bytes=0)
+    for m in ["m1", "m2", "m3"]:
+        cache[(m, "lr")] = _entry(1)
+    assert len(cache) == 2
+    assert ("m1", "lr") not in cache
+
+
+def test_classifier_cache_keeps_newest_entry_even_if_over_budget():
+    cache = ClassifierCache(max_size=100, max_bytes=100)
+    cache[("m1", "lr")] = _entry(40)
+    cache[("m2", "lr")] = _entry(400)
+    assert len(cache) == 1
+    assert ("m2", "lr") in cache
+
+
+def test_classifier_cache_keys_by_arch():
+    cache = ClassifierCache(max_size=100, max_bytes=0)
+    cache[("m1", "lr")] = _entry(10)
+    cache[("m1", "lr_transformer")] = _entry(20)
+    assert len(cache) == 2
+    cache[("m1", "lr")] = _entry(5)
+    assert cache.total_bytes == 25
+
+
+class _SlowClassifier:
+    def get_resident_size(self) -> int:
+        return 1
+
+
+def _find_classifier_concurrently(dao: Dao, n: int) -> list:
+    results: list = [None] * n
+
+    def find(i: int):
+        try:
+            results[i] = dao.find_classifier("clint")
+        except Exception as err:
+            results[i] = err
+
+    threads = [threading.Thread(target=find, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_find_classifier_loads_once_for_concurrent_requests(
+    monkeypatch, tmp_path, shared_root: str
+):
+    loads = []
+
+    def new_prediction(self, **kwargs):
+        loads.append(kwargs["mentor"])
+        time.sleep(0.2)
+        return _SlowClassifier()
+
+    monkeypatch.setattr(ClassifierFactory, "new_prediction", new_prediction)
+    dao = Dao(shared_root=shared_root, data_root=str(tmp_path))
+    results = _find_classifier_concurrently(dao, 8)
+    assert loads == ["clint"]
+    assert all(r is results[0] for r in results)
+    assert not dao.pending
+
+
+def test_find_classifier_shares_load_errors_with_concurrent_requests(
+    monkeypatch, tmp_path, shared_root: str
+):
+    loads = []
+
+    def new_prediction(self, **kwargs):
+        loads.append(kwargs["mentor"])
+        time.sleep(0.2)
+        raise ValueError("no model")
+
+    monkeypatch.setattr(ClassifierFactory, "new_prediction", new_prediction)
+    dao = Dao(shared_root=shared_root, data_root=str(tmp_path))
+    results = _find_classifier_concurrently(dao, 4)
+    assert loads == ["clint"]
+    assert all(isinstance(r, ValueError) for r in results)
+    assert ("clint", "mentor_classifier.arch.lr") not in dao.cache
+    assert not dao.pending
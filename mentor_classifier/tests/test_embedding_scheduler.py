@@ -0,0 +1,87 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import pickle
+import threading
+import time
+from typing import List
+
+import numpy as np
+import pytest
+
+from mentor_classifier.arch.lr_transformer.embedding_scheduler import (
+    EmbeddingScheduler,
+)
+from mentor_classifier.arch.lr_transformer.embeddings import TransformerEmbeddings
+
+
+def _encode_lengths(batches: List[List[str]]):
+    def encode(texts: List[str]) -> np.ndarray:
+        batches.append(texts)
+        time.sleep(0.01)
+        return np.array([[float(len(t))] for t in texts])
+
+    return encode
+
+
+def _submit_concurrently(scheduler: EmbeddingScheduler, requests: List[List[str]]):
+    results: list = [None] * len(requests)
+
+    def submit(i: int):
+        try:
+            results[i] = scheduler.submit(requests[i])
+        except Exception as err:
+            results[i] = err
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(requests))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_batches_concurrent_requests_and_returns_each_its_rows():
+    batches: List[List[str]] = []
+    scheduler = EmbeddingScheduler(
+        _encode_lengths(batches), max_batch_size=64, max_wait=0.05
+    )
+    requests = [["a" * i] for i in range(1, 21)] + [["bb", "ccc"]]
+    results = _submit_concurrently(scheduler, requests)
+    for texts, embeddings in zip(requests, results):
+        assert embeddings.tolist() == [[float(len(t))] for t in texts]
+    assert len(batches) < len(requests)
+    assert sum(len(b) for b in batches) == 22
+
+
+def test_batches_are_limited_to_max_batch_size():
+    batches: List[List[str]] = []
+    scheduler = EmbeddingScheduler(
+        _encode_lengths(batches), max_batch_size=4, max_wait=0.05
+    )
+    _submit_concurrently(scheduler, [["a"]] * 12)
+    assert all(len(b) <= 4 for b in batches)
+
+
+def test_encode_errors_are_raised_to_callers():
+    def encode(texts: List[str]) -> np.ndarray:
+        raise ValueError("encode failed")
+
+    scheduler = EmbeddingScheduler(encode, max_wait=0.01)
+    with pytest.raises(ValueError):
+        scheduler.submit(["a"])
+
+
+def test_transformer_embeddings_pickle_without_scheduler(shared_root: str):
+    transformer = TransformerEmbeddings(shared_root)
+    embedding = transformer.get_embeddings("What is your name?")
+    assert embedding.ndim == 1
+    assert getattr(transformer, "_scheduler", None) is not None
+    unpickled = pickle.loads(pickle.dumps(transformer))
+    assert getattr(unpickled, "_scheduler", None) is None
+    np.testing.assert_allclose(
+        unpickled.get_embeddings(["What is your name?"])[0], embedding, rtol=1e-5
+    )
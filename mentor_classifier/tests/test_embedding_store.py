@@ -0,0 +1,113 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+from typing import List
+
+import numpy as np
+import pytest
+
+from mentor_classifier.embedding_store import (
+    EmbeddingStore,
+    embed_with_store,
+    model_files_fingerprint,
+)
+
+
+class _CountingEmbeddings:
+    def __init__(self):
+        self.computed: List[str] = []
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        self.computed.extend(texts)
+        return _embeddings(texts)
+
+
+def _embeddings(texts: List[str]) -> np.ndarray:
+    return np.array([[len(t), t.count("a"), 0.5] for t in texts], dtype=np.float32)
+
+
+def test_embeds_only_texts_not_already_stored(tmp_path):
+    compute = _CountingEmbeddings()
+    store = EmbeddingStore(str(tmp_path), "model")
+    store.get_many(["what is your name", "where are you from"], compute)
+    texts = ["where are you from", "what is your age", "what is your age"]
+    embeddings = store.get_many(texts, compute)
+    assert compute.computed == [
+        "what is your name",
+        "where are you from",
+        "what is your age",
+    ]
+    assert embeddings.dtype == np.float32
+    np.testing.assert_array_equal(embeddings, _embeddings(texts))
+
+
+def test_store_is_shared_between_instances_of_the_same_model(tmp_path):
+    EmbeddingStore(str(tmp_path), "model").get_many(["a", "b"], _CountingEmbeddings())
+    compute = _CountingEmbeddings()
+    embeddings = EmbeddingStore(str(tmp_path), "model").get_many(["b", "c"], compute)
+    assert compute.computed == ["c"]
+    np.testing.assert_array_equal(embeddings, _embeddings(["b", "c"]))
+    compute = _CountingEmbeddings()
+    EmbeddingStore(str(tmp_path), "other model").get_many(["b"], compute)
+    assert compute.computed == ["b"]
+
+
+def test_float16_store(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "model", dtype="float16")
+    embeddings = store.get_many(["abc", "a"], _CountingEmbeddings())
+    assert embeddings.dtype == np.float32
+    np.testing.assert_allclose(embeddings, _embeddings(["abc", "a"]), rtol=1e-3)
+    with pytest.raises(ValueError):
+        EmbeddingStore(str(tmp_path), "model", dtype="float32")
+
+
+def test_recovers_from_partially_written_rows(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "model")
+    store.get_many(["a"], _CountingEmbeddings())
+    # a writer died after writing half a row and before indexing it
+    with open(f"{store.path}/vectors.bin", "ab") as f:
+        f.write(b"\x00" * 5)
+    store = EmbeddingStore(str(tmp_path), "model")
+    embeddings = store.get_many(["b", "a"], _CountingEmbeddings())
+    np.testing.assert_array_equal(embeddings, _embeddings(["b", "a"]))
+
+
+def test_recovers_from_partially_written_index_lines(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "model")
+    store.get_many(["a"], _CountingEmbeddings())
+    # a writer died partway through an index line
+    with open(f"{store.path}/index.txt", "a") as f:
+        f.write("0123abc 1")
+    store = EmbeddingStore(str(tmp_path), "model")
+    store.get_many(["b"], _CountingEmbeddings())
+    with open(f"{store.path}/index.txt", "a") as f:
+        f.write("garbage\n")
+    compute = _CountingEmbeddings()
+    embeddings = EmbeddingStore(str(tmp_path), "model").get_many(["b", "a"], compute)
+    np.testing.assert_array_equal(embeddings, _embeddings(["b", "a"]))
+    assert compute.computed == []
+
+
+def test_embed_with_store_computes_directly_when_store_not_configured(monkeypatch):
+    monkeypatch.delenv("EMBEDDING_STORE_PATH", raising=False)
+    compute = _CountingEmbeddings()
+    embed_with_store("model", ["a", "a"], compute)
+    assert compute.computed == ["a", "a"]
+
+
+def test_model_files_fingerprint_changes_with_any_model_file(tmp_path):
+    model_dir = tmp_path / "model"
+    (model_dir / "weights").mkdir(parents=True)
+    (model_dir / "config.json").write_text("{}")
+    (model_dir / "weights" / "w.bin").write_bytes(b"1234")
+    fingerprint = model_files_fingerprint(str(model_dir))
+    assert model_files_fingerprint(str(model_dir)) == fingerprint
+    (model_dir / "weights" / "w.bin").write_bytes(b"12345")
+    changed = model_files_fingerprint(str(model_dir))
+    assert changed != fingerprint
+    os.utime(model_dir / "config.json", ns=(0, 0))
+    assert model_files_fingerprint(str(model_dir)) != changed
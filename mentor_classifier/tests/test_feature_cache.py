@@ -0,0 +1,59 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from typing import List
+
+import numpy as np
+
+from mentor_classifier.feature_cache import QueryFeatureCache
+
+
+class _CountingFeatures:
+    def __init__(self):
+        self.computed: List[str] = []
+
+    def __call__(self, questions: List[str]) -> List[np.ndarray]:
+        self.computed.extend(questions)
+        return [np.array([float(len(q))]) for q in questions]
+
+
+def test_computes_features_once_per_model_and_question():
+    cache = QueryFeatureCache(max_size=100)
+    compute = _CountingFeatures()
+    first = cache.get_many("m", ["What is your name?", "who are you"], compute)
+    second = cache.get_many(
+        "m", ["What  is your name? ", "What is your name?"], compute
+    )
+    assert compute.computed == ["What is your name?", "who are you"]
+    assert second[0] is first[0]
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 2}
+    cache.get_many("other_model", ["who are you"], compute)
+    assert compute.computed[-1] == "who are you"
+    assert cache.stats()["misses"] == 3
+
+
+def test_deduplicates_questions_within_a_batch():
+    cache = QueryFeatureCache(max_size=100)
+    compute = _CountingFeatures()
+    features = cache.get_many("m", ["a", "b", "a"], compute)
+    assert compute.computed == ["a", "b"]
+    assert features[0] is features[2]
+
+
+def test_evicts_least_recently_used():
+    cache = QueryFeatureCache(max_size=2)
+    compute = _CountingFeatures()
+    cache.get_many("m", ["a", "b"], compute)
+    cache.get_many("m", ["a"], compute)
+    cache.get_many("m", ["c"], compute)
+    cache.get_many("m", ["a", "b"], compute)
+    assert compute.computed == ["a", "b", "c", "b"]
+
+
+def test_cached_features_are_read_only():
+    cache = QueryFeatureCache(max_size=100)
+    feature = cache.get_many("m", ["a"], _CountingFeatures())[0]
+    assert not feature.flags.writeable
@@ -0,0 +1,127 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import json
+import os
+
+import responses
+
+from mentor_classifier.feedback import FeedbackWriter
+
+
+def _gql_ok(request):
+    variables = json.loads(request.body)["variables"]
+    data = {alias: {"_id": q["_id"]} for alias, q in variables.items()}
+    return (200, {}, json.dumps({"data": data}))
+
+
+def _sent_ids(calls) -> list:
+    return [
+        q["_id"]
+        for call in calls
+        for q in json.loads(call.request.body)["variables"].values()
+    ]
+
+
+def _spooled_ids(spool_path: str) -> list:
+    if not os.path.exists(spool_path):
+        return []
+    with open(spool_path) as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+@responses.activate
+def test_sends_feedback_in_batches_with_preassigned_ids(tmp_path):
+    responses.add_callback(responses.POST, "http://graphql/graphql", callback=_gql_ok)
+    writer = FeedbackWriter(batch_size=2, spool_path=str(tmp_path / "spool.jsonl"))
+    ids = [
+        writer.write("clint", f"question {i}", "A1", "CLASSIFIER", 0.5)
+        for i in range(3)
+    ]
+    assert len(set(ids)) == 3
+    assert len(responses.calls) == 0
+    writer.flush()
+    assert len(responses.calls) == 2
+    assert _sent_ids(responses.calls) == ids
+
+
+@responses.activate
+def test_spools_feedback_when_graphql_fails_and_replays_it_later(tmp_path):
+    spool_path = str(tmp_path / "spool.jsonl")
+    writer = FeedbackWriter(batch_size=10, spool_path=spool_path)
+    responses.add(responses.POST, "http://graphql/graphql", status=503)
+    failed_ids = [
+        writer.write("clint", f"question {i}", "A1", "CLASSIFIER", 0.5)
+        for i in range(2)
+    ]
+    writer.flush()
+    assert _spooled_ids(spool_path) == failed_ids
+    # the graphql client retries a 503, so count the calls the failure took
+    failed_calls = len(responses.calls)
+    responses.remove(responses.POST, "http://graphql/graphql")
+    responses.add_callback(responses.POST, "http://graphql/graphql", callback=_gql_ok)
+    next_id = writer.write("clint", "another question", "A2", "EXACT", 1.0)
+    writer.flush()
+    assert _spooled_ids(spool_path) == []
+    assert _sent_ids(responses.calls[failed_calls:]) == [next_id] + failed_ids
+
+
+def test_spools_feedback_when_queue_is_full(tmp_path):
+    spool_path = str(tmp_path / "spool.jsonl")
+    writer = FeedbackWriter(queue_max_size=1, spool_path=spool_path)
+    writer.write("clint", "question 1", "A1", "CLASSIFIER", 0.5)
+    overflow_id = writer.write("clint", "question 2", "A1", "CLASSIFIER", 0.5)
+    assert _spooled_ids(spool_path) == [overflow_id]
+
+
+def _gql_rejecting(rejected_question: str, message: str):
+    def callback(request):
+        variables = json.loads(request.body)["variables"]
+        data = {}
+        errors = []
+        for alias, q in variables.items():
+            if q["question"] == rejected_question:
+                data[alias] = None
+                errors.append({"message": message, "path": [alias]})
+            else:
+                data[alias] = {"_id": q["_id"]}
+        return (200, {}, json.dumps({"data": data, "errors": errors}))
+
+    return callback
+
+
+@responses.activate
+def test_spools_only_rejected_feedback_until_max_attempts(tmp_path):
+    spool_path = str(tmp_path / "spool.jsonl")
+    writer = FeedbackWriter(batch_size=10, spool_path=spool_path, max_attempts=2)
+    responses.add_callback(
+        responses.POST,
+        "http://graphql/graphql",
+        callback=_gql_rejecting("bad", "invalid input"),
+    )
+    writer.write("clint", "good", "A1", "CLASSIFIER", 0.5)
+    bad_id = writer.write("clint", "bad", "A1", "CLASSIFIER", 0.5)
+    writer.flush()
+    assert _spooled_ids(spool_path) == [bad_id]
+    writer.write("clint", "another good", "A1", "CLASSIFIER", 0.5)
+    writer.flush()
+    assert _spooled_ids(spool_path) == []
+    assert _spooled_ids(f"{spool_path}.dead") == [bad_id]
+
+
+@responses.activate
+def test_treats_duplicate_ids_as_sent(tmp_path):
+    spool_path = str(tmp_path / "spool.jsonl")
+    writer = FeedbackWriter(batch_size=10, spool_path=spool_path)
+    responses.add_callback(
+        responses.POST,
+        "http://graphql/graphql",
+        callback=_gql_rejecting("sent before", "E11000 duplicate key error"),
+    )
+    writer.write("clint", "sent before", "A1", "CLASSIFIER", 0.5)
+    writer.flush()
+    assert _spooled_ids(spool_path) == []
+    assert _spooled_ids(f"{spool_path}.dead") == []
@@ -0,0 +1,127 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from mentor_classifier.graphql_client import AsyncGraphQLClient, GraphQLClient
+
+QUERY = {"query": "query { ping }", "variables": {}}
+MUTATION = {"query": "mutation { ping }", "variables": {}}
+LATENCY = 0.05  # seconds the stub server takes to accept a new connection
+
+
+class StubGraphQLServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubGraphQLHandler)
+        self.connections = 0
+        self.fail_next = 0
+        self.fail_status = 503
+        self.posts = 0
+        self.cookies = []
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/graphql"
+
+
+class StubGraphQLHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        time.sleep(LATENCY)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.posts += 1
+            self.server.cookies.append(self.headers.get("Cookie"))
+            fail = self.server.fail_next > 0
+            self.server.fail_next -= 1 if fail else 0
+        body = json.dumps({"data": {"query": query["query"]}}).encode("utf-8")
+        self.send_response(self.server.fail_status if fail else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "session=server")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StubGraphQLServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_reuses_connections(server):
+    for _ in range(5):
+        requests.post(server.endpoint, json=QUERY).raise_for_status()
+    assert server.connections == 5
+    client = GraphQLClient(server.endpoint)
+    for _ in range(5):
+        assert client.post(QUERY) == {"data": {"query": QUERY["query"]}}
+    assert server.connections == 6
+    client.close()
+
+
+def test_retries_unavailable_server(server):
+    server.fail_next = 2
+    client = GraphQLClient(server.endpoint, retries=2, backoff=0)
+    assert client.post(QUERY) == {"data": {"query": QUERY["query"]}}
+    server.fail_next = 3
+    with pytest.raises(requests.HTTPError):
+        client.post(QUERY)
+
+
+@pytest.mark.parametrize("status,posts", [(502, 1), (504, 1), (503, 3)])
+def test_retries_mutations_only_when_server_unavailable(server, status, posts):
+    server.fail_next = 2
+    server.fail_status = status
+    client = GraphQLClient(server.endpoint, retries=2, backoff=0)
+    if posts == 1:
+        with pytest.raises(requests.HTTPError):
+            client.post(MUTATION)
+    else:
+        assert client.post(MUTATION) == {"data": {"query": MUTATION["query"]}}
+    assert server.posts == posts
+
+
+def test_does_not_keep_cookies_between_callers(server):
+    client = GraphQLClient(server.endpoint)
+    client.post(QUERY, cookies={"user": "a"})
+    client.post(QUERY)
+    assert server.cookies == ["user=a", None]
+
+
+def test_async_client_runs_queries_concurrently(server):
+    client = AsyncGraphQLClient(GraphQLClient(server.endpoint, pool_size=4))
+
+    async def post_all():
+        return await asyncio.gather(*(client.post(QUERY) for _ in range(8)))
+
+    results = asyncio.run(post_all())
+    assert results == [{"data": {"query": QUERY["query"]}}] * 8
+    assert server.connections <= 4
+    client.close()
@@ -8,7 +8,8 @@ import json
 import responses
 import pytest
 
-from mentor_classifier.mentor import Mentor
+from mentor_classifier.api import MENTOR_DATA_SERVING, MENTOR_DATA_TRAINING
+from mentor_classifier.mentor import MENTOR_SNAPSHOT_FILE, Mentor, find_mentor
 from .helpers import fixture_path
 
 
@@ -145,3 +146,55 @@ def test_loads_mentor_from_api(mentor_id, expected_data):
     assert m.questions_by_id == expected_data["questions_by_id"]
     assert m.questions_by_text == expected_data["questions_by_text"]
     assert m.questions_by_answer == expected_data["questions_by_answer"]
+
+
+def _serving_fields(questions: dict) -> dict:
+    return {
+        k: {f: q[f] for f in ("question_text", "answer", "answer_id", "media")}
+        for k, q in questions.items()
+    }
+
+
+@responses.activate
+def test_loads_mentor_from_snapshot_without_api(tmpdir, monkeypatch):
+    with open(fixture_path("graphql/clint.json")) as f:
+        data = json.load(f)
+    responses.add(responses.POST, "http://graphql/graphql", json=data, status=200)
+    m = Mentor("clint")
+    m.save_snapshot(str(tmpdir.join(MENTOR_SNAPSHOT_FILE)))
+    responses.reset()
+    monkeypatch.setenv("MENTOR_SNAPSHOT", "true")
+    loaded = find_mentor("clint", str(tmpdir))
+    assert len(responses.calls) == 0
+    assert loaded.id == "clint"
+    assert loaded.utterances_by_type == m.utterances_by_type
+    assert loaded.answer_id_by_answer == m.answer_id_by_answer
+    assert _serving_fields(loaded.questions_by_text) == _serving_fields(
+        m.questions_by_text
+    )
+    assert _serving_fields(loaded.questions_by_answer) == _serving_fields(
+        m.questions_by_answer
+    )
+
+
+@responses.activate
+@pytest.mark.parametrize(
+    "purpose,fields,excluded_fields",
+    [
+        (MENTOR_DATA_TRAINING, ["paraphrases"], ["webMedia", "topics", "subjects"]),
+        (MENTOR_DATA_SERVING, ["paraphrases", "webMedia"], ["topics", "subjects"]),
+    ],
+)
+def test_fetches_only_the_fields_for_the_purpose(purpose, fields, excluded_fields):
+    with open(fixture_path("graphql/clint.json")) as f:
+        data = json.load(f)
+    responses.add(responses.POST, "http://graphql/graphql", json=data, status=200)
+    m = Mentor("clint", purpose=purpose)
+    query = json.loads(responses.calls[0].request.body)["query"]
+    for field in fields:
+        assert field in query
+    for field in excluded_fields:
+        assert field not in query
+    assert m.purpose == purpose
+    assert m.has_serving_data() == (purpose == MENTOR_DATA_SERVING)
+    assert list(m.questions_by_id) == list(Mentor("clint").questions_by_id)
@@ -0,0 +1,59 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from os import makedirs, path
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import RidgeClassifier
+
+from mentor_classifier import ARCH_LR, mentor_model_path
+from mentor_classifier.model_artifact import (
+    LinearModelArtifact,
+    convert_models,
+    load_model,
+    model_file,
+    save_model_artifact,
+)
+from mentor_classifier.scoring import LinearScorer
+
+
+@pytest.mark.parametrize("n_classes", [2, 5])
+def test_artifact_scores_match_the_saved_classifier(tmpdir, n_classes: int):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(40, 16))
+    y = [f"answer {i % n_classes}" for i in range(len(x))]
+    model = RidgeClassifier().fit(x, y)
+    save_model_artifact(str(tmpdir), model)
+    artifact = load_model(str(tmpdir))
+    assert isinstance(artifact, LinearModelArtifact)
+    assert isinstance(artifact.weights, np.memmap)
+    assert list(artifact.classes_) == list(model.classes_)
+    expected = LinearScorer(model)
+    scorer = LinearScorer(artifact)
+    np.testing.assert_allclose(scorer.scores(x), expected.scores(x), rtol=1e-5)
+    best, _ = scorer.top_k(x, 1)
+    assert list(scorer.classes[best[:, 0]]) == list(model.predict(x))
+
+
+def test_loads_the_pickled_model_when_there_is_no_artifact(tmpdir):
+    model = RidgeClassifier().fit([[0.0], [1.0]], ["a", "b"])
+    joblib.dump(model, path.join(tmpdir, "model.pkl"))
+    assert model_file(str(tmpdir)) == path.join(tmpdir, "model.pkl")
+    assert isinstance(load_model(str(tmpdir)), RidgeClassifier)
+    save_model_artifact(str(tmpdir), model)
+    assert model_file(str(tmpdir)) == path.join(tmpdir, "model.json")
+
+
+def test_converts_pickled_models(tmpdir):
+    model_path = mentor_model_path(tmpdir, "clint", ARCH_LR)
+    makedirs(model_path)
+    model = RidgeClassifier().fit([[0.0], [1.0], [2.0]], ["a", "b", "c"])
+    joblib.dump(model, path.join(model_path, "model.pkl"))
+    assert convert_models(str(tmpdir)) == 1
+    assert convert_models(str(tmpdir)) == 0
+    assert list(load_model(model_path).classes_) == ["a", "b", "c"]
@@ -0,0 +1,82 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import os
+import time
+
+from mentor_classifier.model_watcher import ModelVersionWatcher, notify_model_updated
+
+
+def _write_model(models_root, mentor_id: str, mtime_ns: int = 0) -> str:
+    model_dir = models_root / mentor_id / "mentor_classifier.arch.lr"
+    model_dir.mkdir(parents=True, exist_ok=True)
+    model_file = str(model_dir / "model.pkl")
+    with open(model_file, "w") as f:
+        f.write("model")
+    if mtime_ns:
+        os.utime(model_file, ns=(mtime_ns, mtime_ns))
+    return model_file
+
+
+def test_scan_detects_retrains_within_the_same_second(tmp_path):
+    now_ns = int(time.time()) * 1_000_000_000
+    _write_model(tmp_path, "clint", now_ns)
+    watcher = ModelVersionWatcher(str(tmp_path))
+    watcher.scan()
+    g1 = watcher.generation("clint")
+    _write_model(tmp_path, "clint", now_ns + 1_000)
+    watcher.scan()
+    g2 = watcher.generation("clint")
+    _write_model(tmp_path, "clint", now_ns + 2_000)
+    watcher.scan()
+    assert g1 < g2 < watcher.generation("clint")
+    assert watcher.generation("someone_else") == 0
+
+
+def test_scan_ignores_unchanged_models(tmp_path):
+    _write_model(tmp_path, "clint")
+    watcher = ModelVersionWatcher(str(tmp_path))
+    watcher.scan()
+    g = watcher.generation("clint")
+    watcher.scan()
+    assert watcher.generation("clint") == g
+
+
+def test_background_watcher_detects_new_and_updated_models(tmp_path):
+    watcher = ModelVersionWatcher(str(tmp_path), poll_interval=0.05).start()
+    for _ in range(2):
+        g = watcher.generation("clint")
+        _write_model(tmp_path, "clint")
+        deadline = time.monotonic() + 5
+        while watcher.generation("clint") == g and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert watcher.generation("clint") > g
+
+
+def test_notify_model_updated_is_seen_immediately(tmp_path):
+    from mentor_classifier.model_watcher import find_or_create_model_watcher
+
+    watcher = find_or_create_model_watcher(str(tmp_path))
+    g = watcher.generation("clint")
+    _write_model(tmp_path, "clint")
+    notify_model_updated(str(tmp_path), "clint")
+    assert watcher.generation("clint") > g
+
+
+def test_only_the_manifest_marks_a_retrain_once_a_model_has_one(tmp_path):
+    model_file = _write_model(tmp_path, "clint")
+    manifest = os.path.join(os.path.dirname(model_file), "model.json")
+    with open(manifest, "w") as f:
+        f.write("{}")
+    watcher = ModelVersionWatcher(str(tmp_path))
+    watcher.scan()
+    g = watcher.generation("clint")
+    _write_model(tmp_path, "clint", time.time_ns() + 1_000)
+    watcher.scan()
+    assert watcher.generation("clint") == g
+    os.utime(manifest, ns=(time.time_ns() + 2_000, time.time_ns() + 2_000))
+    watcher.scan()
+    assert watcher.generation("clint") > g
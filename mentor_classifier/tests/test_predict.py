@@ -135,6 +135,65 @@ def test_predicts_answer(
     assert result.feedback_id is not None
 
 
+@responses.activate
+@pytest.mark.parametrize(
+    "mentor_id,questions",
+    [
+        (
+            "clint",
+            ["What is your name?", "What's your name?", "Tell me your name"],
+        ),
+    ],
+)
+def test_evaluate_batch_matches_evaluate(
+    data_root: str,
+    shared_root: str,
+    mentor_id: str,
+    questions: List[str],
+):
+    with open(fixture_path("graphql/{}.json".format(mentor_id))) as f:
+        data = json.load(f)
+    responses.add(responses.POST, "http://graphql/graphql", json=data, status=200)
+    _ensure_trained(mentor_id, shared_root, data_root)
+    classifier = ClassifierFactory().new_prediction(mentor_id, shared_root, data_root)
+    results = classifier.evaluate_batch(questions, shared_root)
+    assert len(results) == len(questions)
+    for question, result in zip(questions, results):
+        expected = classifier.evaluate(question, shared_root)
+        assert result.answer_id == expected.answer_id
+        assert result.answer_text == expected.answer_text
+        assert result.answer_media == expected.answer_media
+        assert result.highest_confidence == pytest.approx(expected.highest_confidence)
+
+
+@responses.activate
+@pytest.mark.parametrize(
+    "mentor_id,question,top_k",
+    [("clint", "Tell me your name", 3), ("clint", "What is your name?", 3)],
+)
+def test_evaluate_returns_top_k_candidates(
+    monkeypatch,
+    data_root: str,
+    shared_root: str,
+    mentor_id: str,
+    question: str,
+    top_k: int,
+):
+    monkeypatch.setenv("OFF_TOPIC_THRESHOLD", "-100")  # nothing is offtopic
+    with open(fixture_path("graphql/{}.json".format(mentor_id))) as f:
+        data = json.load(f)
+    responses.add(responses.POST, "http://graphql/graphql", json=data, status=200)
+    _ensure_trained(mentor_id, shared_root, data_root)
+    classifier = ClassifierFactory().new_prediction(mentor_id, shared_root, data_root)
+    assert classifier.evaluate(question, shared_root).candidates == []
+    result = classifier.evaluate(question, shared_root, top_k=top_k)
+    assert 1 <= len(result.candidates) <= top_k
+    assert result.candidates[0].answer_id == result.answer_id
+    assert result.candidates[0].confidence == pytest.approx(result.highest_confidence)
+    confidences = [c.confidence for c in result.candidates]
+    assert confidences == sorted(confidences, reverse=True)
+
+
 def _test_gets_off_topic(
     monkeypatch,
     data_root: str,
@@ -0,0 +1,83 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from os import path
+from typing import List
+
+import numpy as np
+import pytest
+from sklearn.linear_model import RidgeClassifier
+
+from mentor_classifier.ridge_stats import RidgeStatistics, train_ridge_incremental
+
+
+def _embed(texts: List[str]) -> np.ndarray:
+    return np.array(
+        [[len(t), t.count("a"), t.count("e"), t.count(" ")] for t in texts],
+        dtype=np.float64,
+    )
+
+
+def _assert_same_model(actual: RidgeClassifier, texts: List[str], labels: List[str]):
+    expected = RidgeClassifier(alpha=1.0).fit(_embed(texts), labels)
+    assert list(actual.classes_) == list(expected.classes_)
+    np.testing.assert_allclose(actual.coef_, expected.coef_, rtol=1e-6, atol=1e-8)
+    np.testing.assert_allclose(
+        actual.intercept_, expected.intercept_, rtol=1e-6, atol=1e-8
+    )
+    x = _embed(texts)
+    assert list(actual.predict(x)) == list(expected.predict(x))
+
+
+TEXTS = [
+    "what is your name",
+    "who are you",
+    "where are you from",
+    "where did you grow up",
+    "what do you do",
+    "what is your job",
+]
+LABELS = ["a1", "a1", "a2", "a2", "a3", "a3"]
+
+
+@pytest.mark.parametrize(
+    "texts,labels",
+    [(TEXTS, LABELS), (TEXTS[:4], LABELS[:4])],
+)
+def test_solve_matches_ridge_classifier_fit(texts: List[str], labels: List[str]):
+    stats = RidgeStatistics.from_training_data("m", texts, labels, _embed(texts))
+    _assert_same_model(stats.solve(), texts, labels)
+
+
+def test_incremental_training_embeds_only_changed_rows(tmp_path):
+    stats_path = path.join(tmp_path, "ridge_stats.npz")
+    RidgeStatistics.from_training_data("m", TEXTS, LABELS, _embed(TEXTS)).save(
+        stats_path
+    )
+    embedded: List[str] = []
+
+    def embed(texts: List[str]) -> np.ndarray:
+        embedded.extend(texts)
+        return _embed(texts)
+
+    # one paraphrase added, the a3 answer and its rows removed
+    texts = TEXTS[:4] + ["tell me your name"]
+    labels = LABELS[:4] + ["a1"]
+    result = train_ridge_incremental(stats_path, "m", texts, labels, embed)
+    assert result is not None
+    model, stats = result
+    assert sorted(embedded) == sorted(TEXTS[4:] + ["tell me your name"])
+    assert stats.classes == ["a1", "a2"]
+    _assert_same_model(model, texts, labels)
+
+
+def test_incremental_training_needs_stats_for_the_same_feature_model(tmp_path):
+    stats_path = path.join(tmp_path, "ridge_stats.npz")
+    assert train_ridge_incremental(stats_path, "m", TEXTS, LABELS, _embed) is None
+    RidgeStatistics.from_training_data("m", TEXTS, LABELS, _embed(TEXTS)).save(
+        stats_path
+    )
+    assert train_ridge_incremental(stats_path, "other", TEXTS, LABELS, _embed) is None
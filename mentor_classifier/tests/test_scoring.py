@@ -0,0 +1,45 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import numpy as np
+import pytest
+from sklearn.linear_model import RidgeClassifier
+
+from mentor_classifier.scoring import LinearScorer
+
+
+@pytest.mark.parametrize("n_classes", [2, 5])
+def test_linear_scorer_matches_decision_function(n_classes: int):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(40, 16))
+    y = [f"answer {i % n_classes}" for i in range(len(x))]
+    model = RidgeClassifier().fit(x, y)
+    scorer = LinearScorer(model)
+    decision = model.decision_function(x)
+    if decision.ndim == 1:
+        decision = np.stack([-decision, decision], axis=1)
+    assert scorer.scores(x).dtype == np.float32
+    np.testing.assert_allclose(scorer.scores(x), decision, rtol=1e-4, atol=1e-4)
+    best, best_scores = scorer.top_k(x, 1)
+    assert list(scorer.classes[best[:, 0]]) == list(model.predict(x))
+    k = min(3, n_classes)
+    best, best_scores = scorer.top_k(x, 3)
+    assert best.shape == (len(x), k)
+    assert (np.diff(best_scores, axis=1) <= 0).all()
+    np.testing.assert_allclose(
+        best_scores, -np.sort(-decision, axis=1)[:, :k], rtol=1e-4
+    )
+
+
+def test_binary_confidence_is_the_score_of_the_predicted_class():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(40, 16))
+    y = ["answer 0" if v > 0 else "answer 1" for v in x[:, 0]]
+    model = RidgeClassifier().fit(x, y)
+    best, best_scores = LinearScorer(model).top_k(x, 1)
+    decision = model.decision_function(x)
+    np.testing.assert_allclose(best_scores[:, 0], np.abs(decision), rtol=1e-4)
+    assert (best_scores[decision < 0, 0] > 0).all()
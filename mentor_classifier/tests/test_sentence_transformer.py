@@ -0,0 +1,68 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from os import path, symlink
+
+import numpy as np
+
+from mentor_classifier import sentence_transformer
+from mentor_classifier.sentence_transformer import (
+    MODEL_NAME,
+    TorchScriptSentenceEncoder,
+    export_torchscript_sentence_transformer,
+    find_or_load_sentence_encoder,
+    find_or_load_sentence_transformer,
+    save_quantized_sentence_transformer,
+)
+
+
+def test_quantized_sentence_transformer_is_cached_and_can_be_saved(
+    tmp_path, shared_root: str, monkeypatch
+):
+    monkeypatch.setattr(sentence_transformer, "SENTENCE_TRANSFORMER_MODELS", {})
+    transformer_path = str(tmp_path)
+    symlink(
+        path.join(shared_root, "sentence-transformer", MODEL_NAME),
+        path.join(transformer_path, MODEL_NAME),
+    )
+    model = find_or_load_sentence_transformer(transformer_path)
+    assert find_or_load_sentence_transformer(transformer_path) is model
+    artifact_path = save_quantized_sentence_transformer(transformer_path)
+    assert path.isfile(artifact_path)
+    monkeypatch.setattr(sentence_transformer, "SENTENCE_TRANSFORMER_MODELS", {})
+    loaded = find_or_load_sentence_transformer(transformer_path)
+    assert loaded is not model
+    sentences = ["What is your name?", "Where did you grow up?"]
+    np.testing.assert_allclose(
+        loaded.encode(sentences), model.encode(sentences), rtol=1e-5, atol=1e-6
+    )
+
+
+def test_torchscript_encoder_is_within_cosine_tolerance_of_torch(
+    tmp_path, shared_root: str, monkeypatch
+):
+    transformer_path = str(tmp_path)
+    symlink(
+        path.join(shared_root, "sentence-transformer", MODEL_NAME),
+        path.join(transformer_path, MODEL_NAME),
+    )
+    export_torchscript_sentence_transformer(transformer_path)
+    monkeypatch.setenv("EMBEDDING_BACKEND", "torchscript")
+    encoder = find_or_load_sentence_encoder(transformer_path)
+    assert isinstance(encoder, TorchScriptSentenceEncoder)
+    sentences = [
+        "What is your name?",
+        "Where did you grow up and what was it like living there?",
+        "Tell me about yourself",
+    ]
+    expected = find_or_load_sentence_transformer(transformer_path).encode(sentences)
+    actual = encoder.encode(sentences)
+    assert actual.shape == expected.shape
+    cosine = (actual * expected).sum(axis=1) / (
+        np.linalg.norm(actual, axis=1) * np.linalg.norm(expected, axis=1)
+    )
+    assert cosine.min() > 0.99
+    assert encoder.encode(sentences[0]).shape == expected[0].shape
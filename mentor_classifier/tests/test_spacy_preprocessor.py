@@ -0,0 +1,30 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import pytest
+
+from mentor_classifier.spacy_preprocessor import SpacyPreprocessor
+
+
+@pytest.mark.parametrize(
+    "questions",
+    [
+        [
+            "What is your name?",
+            "Where did you grow up?",
+            "What were the best and worst parts of being in the Navy?",
+            "How many hours do you work each week?",
+        ]
+    ],
+)
+def test_lemmas_only_preprocessing_matches_full_pipeline(shared_root, questions):
+    full = SpacyPreprocessor(shared_root)
+    lemmas_only = SpacyPreprocessor(shared_root, lemmas_only=True)
+    assert "parser" not in lemmas_only.model.pipe_names
+    assert "ner" not in lemmas_only.model.pipe_names
+    assert lemmas_only.transform_batch(questions) == [
+        full.transform(q) for q in questions
+    ]
@@ -10,7 +10,8 @@ import json
 import pytest
 import responses
 
-from mentor_classifier import ClassifierFactory, ARCH_DEFAULT
+from mentor_classifier import ClassifierFactory, ARCH_DEFAULT, ARCH_LR
+from mentor_classifier.arch.lr.word2vec import WORD2VEC_MODELS, word2vec_file
 from .helpers import fixture_path
 
 
@@ -32,4 +33,11 @@ def test_trains_and_outputs_models(data_root: str, shared_root: str, mentor_id:
     )
     assert result.model_path == path.join(data_root, mentor_id, ARCH_DEFAULT)
     assert path.exists(path.join(result.model_path, "model.pkl"))
+    assert path.exists(path.join(result.model_path, "model.json"))
     assert path.exists(path.join(result.model_path, "w2v.txt"))
+
+
+def test_preloads_shared_models_for_training(shared_root: str):
+    WORD2VEC_MODELS.clear()
+    ClassifierFactory().preload_training(shared_root, ARCH_LR)
+    assert path.abspath(word2vec_file(shared_root)) in WORD2VEC_MODELS
@@ -244,7 +244,7 @@ def test_compare_test_accuracy(
             _MentorTrainAndTestConfiguration(
                 mentor_id="clint_long",
                 arch=ARCH_LR_TRANSFORMER,
-                expected_training_accuracy=0.96,
+                expected_training_accuracy=0.28,
             ),
         ),
     ],
@@ -283,3 +283,4 @@ def test_compare_cross_validation(
         .train(shared_root)
     )
     assert hf_train.accuracy >= compare_configuration.expected_training_accuracy
+    assert hf_train.accuracy >= lr_train.accuracy
@@ -0,0 +1,43 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+from typing import List
+
+import numpy as np
+
+from mentor_classifier.training_progress import (
+    STAGE_EMBED,
+    STAGE_FETCH,
+    TrainingProgress,
+    embed_with_progress,
+)
+
+
+def test_reports_each_stage_and_rows_embedded_so_far():
+    updates: List[dict] = []
+    progress = TrainingProgress(updates.append, min_interval=0)
+    with progress.stage(STAGE_FETCH):
+        pass
+    texts = [f"question {i}" for i in range(5)]
+    x = embed_with_progress(
+        lambda batch: np.ones((len(batch), 3)), texts, progress, batch_size=2
+    )
+    assert x.shape == (5, 3)
+    # stage start and end, and one update per batch embedded
+    assert [u["stage"] for u in updates] == [
+        "fetch",
+        "",
+        "embed",
+        "embed",
+        "embed",
+        "embed",
+        "",
+    ]
+    assert [s["done"] for s in updates[-2]["stages"]] == [0, 5]
+    final = progress.to_dict()
+    assert [s["name"] for s in final["stages"]] == [STAGE_FETCH, STAGE_EMBED]
+    assert final["stages"][1]["total"] == 5
+    assert all(s["seconds"] >= 0 for s in final["stages"])
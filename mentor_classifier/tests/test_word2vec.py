@@ -0,0 +1,81 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import numpy as np
+from gensim.models import KeyedVectors
+
+from mentor_classifier.arch.lr import word2vec_prune
+from mentor_classifier.arch.lr.word2vec_prune import prune_word2vec
+from mentor_classifier.arch.lr.word2vec import (
+    W2V,
+    convert_word2vec_to_native,
+    is_native_word2vec_current,
+    load_word2vec_model,
+)
+
+
+def test_loads_converted_word2vec_memory_mapped(tmp_path):
+    w2v = KeyedVectors(vector_size=300)
+    w2v.add_vectors(["name", "age", "navy"], np.random.rand(3, 300).astype(np.float32))
+    w2v_file = str(tmp_path / "word2vec.bin")
+    w2v.save_word2vec_format(w2v_file, binary=True)
+    original = load_word2vec_model(w2v_file)
+    assert not isinstance(original.vectors, np.memmap)
+    assert convert_word2vec_to_native(w2v_file) == str(tmp_path / "word2vec.kv")
+    converted = load_word2vec_model(w2v_file)
+    assert isinstance(converted.vectors, np.memmap)
+    assert not converted.vectors.flags.writeable
+    for word in ["name", "age", "navy"]:
+        np.testing.assert_array_equal(converted[word], original[word])
+
+
+def test_ignores_native_word2vec_converted_from_another_version(tmp_path):
+    w2v = KeyedVectors(vector_size=300)
+    w2v.add_vectors(["name", "age"], np.random.rand(2, 300).astype(np.float32))
+    w2v_file = str(tmp_path / "word2vec.bin")
+    w2v.save_word2vec_format(w2v_file, binary=True)
+    convert_word2vec_to_native(w2v_file)
+    assert is_native_word2vec_current(w2v_file)
+    upgraded = KeyedVectors(vector_size=300)
+    upgraded.add_vectors(["navy"], np.random.rand(1, 300).astype(np.float32))
+    upgraded.save_word2vec_format(w2v_file, binary=True)
+    assert not is_native_word2vec_current(w2v_file)
+    loaded = load_word2vec_model(w2v_file)
+    assert not isinstance(loaded.vectors, np.memmap)
+    assert list(loaded.key_to_index) == ["navy"]
+
+
+def test_w2v_for_questions_sums_known_word_vectors(tmp_path):
+    words = ["name", "age", "navy"]
+    w2v = KeyedVectors(vector_size=300)
+    w2v.add_vectors(words, np.random.rand(3, 300).astype(np.float32))
+    w2v_file = str(tmp_path / "word2vec.bin")
+    w2v.save_word2vec_format(w2v_file, binary=True)
+    questions = [["name", "unknown", "age"], [], ["unknown"], ["navy", "navy"]]
+    vectors = W2V(w2v_file).w2v_for_questions(questions)
+    assert vectors.shape == (4, 300)
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(vectors[0], w2v["name"] + w2v["age"], rtol=1e-6)
+    np.testing.assert_array_equal(vectors[1], np.zeros(300))
+    np.testing.assert_array_equal(vectors[2], np.zeros(300))
+    np.testing.assert_allclose(vectors[3], w2v["navy"] * 2, rtol=1e-6)
+
+
+def test_prune_word2vec_keeps_vocab_and_most_frequent_words(tmp_path, monkeypatch):
+    # make sure entries spanning read boundaries are handled
+    monkeypatch.setattr(word2vec_prune, "READ_SIZE", 7)
+    words = [f"word{i}" for i in range(100)]
+    w2v = KeyedVectors(vector_size=300)
+    w2v.add_vectors(words, np.random.rand(len(words), 300).astype(np.float32))
+    w2v_file = str(tmp_path / "word2vec.bin")
+    w2v.save_word2vec_format(w2v_file, binary=True)
+    pruned_file = str(tmp_path / "word2vec_pruned.bin")
+    vocab = {"word50", "word99", "not_in_word2vec"}
+    assert prune_word2vec(w2v_file, pruned_file, vocab, top_n=10) == 12
+    pruned = load_word2vec_model(pruned_file)
+    assert set(pruned.key_to_index) == set(words[:10]) | {"word50", "word99"}
+    for word in pruned.key_to_index:
+        np.testing.assert_array_equal(pruned[word], w2v[word])
@@ -5,8 +5,10 @@
 # The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
 #
 import os
+from typing import Dict, List, Optional
 from flask import Blueprint, jsonify, request
 
+from mentor_classifier import QuestionClassiferPredictionResult
 from mentor_classifier.dao import Dao
 
 import re
@@ -16,6 +18,12 @@ under_pat = re.compile(r"_([a-z])")
 
 _dao: Dao = None
 
+MAX_TOP_K = 100
+
+
+def get_max_batch_size() -> int:
+    return int(os.environ.get("MAX_QUESTION_BATCH_SIZE") or "100")
+
 
 def _get_dao() -> Dao:
     global _dao
@@ -35,6 +43,9 @@ def answer():
         return (jsonify({"query": ["required field"]}), 400)
     if "mentor" not in request.args:
         return (jsonify({"mentor": ["required field"]}), 400)
+    top_k = _parse_top_k(request.args.get("top_k"))
+    if top_k is None:
+        return (jsonify({"top_k": ["must be a positive integer"]}), 400)
     question = request.args["query"].strip()
     mentor = request.args["mentor"].strip()
     model_root = os.environ.get("MODEL_ROOT") or "models"
@@ -43,7 +54,62 @@ def answer():
     if not os.path.isdir(mentor_models):
         return (jsonify({"message": f"No models found for mentor {mentor}."}), 404)
     classifier = _get_dao().find_classifier(mentor)
-    result = classifier.evaluate(question, shared_root)
+    result = classifier.evaluate(question, shared_root, top_k=top_k)
+    return (jsonify(_to_answer_json(question, result)), 200)
+
+
+@questions_blueprint.route("/batch/", methods=["POST"])
+@questions_blueprint.route("/batch", methods=["POST"])
+def answer_batch():
+    body = request.get_json(silent=True) or {}
+    questions = body.get("questions")
+    if not isinstance(questions, list):
+        return (jsonify({"questions": ["required field"]}), 400)
+    max_batch_size = get_max_batch_size()
+    if len(questions) > max_batch_size:
+        return (
+            jsonify({"questions": [f"at most {max_batch_size} questions per batch"]}),
+            400,
+        )
+    if not all(isinstance(q, dict) and "query" in q for q in questions):
+        return (jsonify({"query": ["required field"]}), 400)
+    if not all("mentor" in q for q in questions):
+        return (jsonify({"mentor": ["required field"]}), 400)
+    top_k = _parse_top_k(body.get("top_k"))
+    if top_k is None:
+        return (jsonify({"top_k": ["must be a positive integer"]}), 400)
+    model_root = os.environ.get("MODEL_ROOT") or "models"
+    shared_root = os.environ.get("SHARED_ROOT") or "shared"
+    indexes_by_mentor: Dict[str, List[int]] = {}
+    for i, q in enumerate(questions):
+        indexes_by_mentor.setdefault(str(q["mentor"]).strip(), []).append(i)
+    for mentor in indexes_by_mentor:
+        if not os.path.isdir(os.path.join(model_root, mentor)):
+            return (jsonify({"message": f"No models found for mentor {mentor}."}), 404)
+    answers: List[dict] = [{} for _ in questions]
+    for mentor, indexes in indexes_by_mentor.items():
+        mentor_questions = [str(questions[i]["query"]).strip() for i in indexes]
+        classifier = _get_dao().find_classifier(mentor)
+        results = classifier.evaluate_batch(mentor_questions, shared_root, top_k=top_k)
+        for i, question, result in zip(indexes, mentor_questions, results):
+            answers[i] = {"mentor": mentor, **_to_answer_json(question, result)}
+    return (jsonify({"results": answers}), 200)
+
+
+def _parse_top_k(top_k) -> Optional[int]:
+    """
+    Returns 0 when top_k is not set (no candidates) and None when it is invalid
+    """
+    if top_k is None or top_k == "":
+        return 0
+    try:
+        top_k = int(top_k)
+    except (TypeError, ValueError):
+        return None
+    return top_k if 0 < top_k <= MAX_TOP_K else None
+
+
+def _to_answer_json(question: str, result: QuestionClassiferPredictionResult) -> dict:
     media = result.answer_media
     web_media = next(
         (m for m in media if m["type"] == "video" and m["tag"] == "web"), None
@@ -54,21 +120,26 @@ def answer():
     vtt_media = next(
         (m for m in media if m["type"] == "subtitles" and m["tag"] == "en"), None
     )
-    return (
-        jsonify(
+    answer = {
+        "query": question,
+        "answer_id": result.answer_id,
+        "answer_text": result.answer_text,
+        "answer_media": {
+            "web_media": web_media,
+            "mobile_media": mobile_media,
+            "vtt_media": vtt_media,
+        },
+        "confidence": result.highest_confidence,
+        "feedback_id": result.feedback_id,
+        "classifier": "",
+    }
+    if result.candidates:
+        answer["candidates"] = [
             {
-                "query": question,
-                "answer_id": result.answer_id,
-                "answer_text": result.answer_text,
-                "answer_media": {
-                    "web_media": web_media,
-                    "mobile_media": mobile_media,
-                    "vtt_media": vtt_media,
-                },
-                "confidence": result.highest_confidence,
-                "feedback_id": result.feedback_id,
-                "classifier": "",
+                "answer_id": c.answer_id,
+                "answer_text": c.answer_text,
+                "confidence": c.confidence,
             }
-        ),
-        200,
-    )
+            for c in result.candidates
+        ]
+    return answer
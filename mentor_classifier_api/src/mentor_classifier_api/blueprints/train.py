@@ -7,6 +7,7 @@
 from os import environ
 from flask import Blueprint, jsonify, request
 
+from mentor_classifier.training_jobs import find_training_job_coalescer
 import mentor_classifier_tasks
 import mentor_classifier_tasks.tasks
 
@@ -21,15 +22,26 @@ def _to_status_url(root: str, id: str) -> str:
 @train_blueprint.route("", methods=["POST"])
 def train():
     mentor: str = request.json.get("mentor")
-    t = mentor_classifier_tasks.tasks.train_task.apply_async(
-        queue=mentor_classifier_tasks.get_queue_classifier(), args=[mentor]
-    )
+    coalescer = find_training_job_coalescer()
+    if coalescer is None:
+        task_id = mentor_classifier_tasks.tasks.train_task.apply_async(
+            queue=mentor_classifier_tasks.get_queue_classifier(), args=[mentor]
+        ).id
+    else:
+        # requests for a mentor that already has a training queued share its task
+        task_id, enqueue = coalescer.request(mentor)
+        if enqueue:
+            mentor_classifier_tasks.tasks.train_task.apply_async(
+                queue=mentor_classifier_tasks.get_queue_classifier(),
+                args=[mentor],
+                task_id=task_id,
+            )
     return jsonify(
         {
             "data": {
-                "id": t.id,
+                "id": task_id,
                 "mentor": mentor,
-                "statusUrl": _to_status_url(request.url_root, t.id),
+                "statusUrl": _to_status_url(request.url_root, task_id),
             }
         }
     )
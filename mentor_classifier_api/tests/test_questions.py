@@ -70,3 +70,92 @@ def test_evaluate_classifies_user_questions(
     assert res.json["answer_media"] == expected_results["answer_media"]
     assert res.json["confidence"] == expected_results["confidence"]
     assert res.json["feedback_id"] is not None
+
+
+@pytest.mark.parametrize("top_k", ["0", "-1", "abc", "1000"])
+def test_returns_400_response_when_top_k_invalid(client, top_k):
+    res = client.get(f"/classifier/questions/?mentor=clint&query=test&top_k={top_k}")
+    assert res.status_code == 400
+    assert res.json == {"top_k": ["must be a positive integer"]}
+
+
+@responses.activate
+def test_evaluate_returns_candidates_when_top_k_set(client):
+    with open(fixture_path("graphql/clint.json")) as f:
+        data = json.load(f)
+    responses.add(responses.POST, "http://graphql/graphql", json=data, status=200)
+    res = client.get("/classifier/questions/?mentor=clint&query=What is your name?")
+    assert "candidates" not in res.json
+    res = client.get(
+        "/classifier/questions/?mentor=clint&query=What is your name?&top_k=3"
+    )
+    assert res.status_code == 200
+    assert res.json["candidates"] == [
+        {"answer_id": "A1", "answer_text": "Clint Anderson", "confidence": 1}
+    ]
+
+
+def test_batch_returns_400_response_when_questions_not_set(client):
+    res = client.post("/classifier/questions/batch", json={})
+    assert res.status_code == 400
+    assert res.json == {"questions": ["required field"]}
+
+
+def test_batch_returns_400_response_when_too_many_questions(client, monkeypatch):
+    monkeypatch.setenv("MAX_QUESTION_BATCH_SIZE", "2")
+    res = client.post(
+        "/classifier/questions/batch",
+        json={"questions": [{"mentor": "clint", "query": "test"}] * 3},
+    )
+    assert res.status_code == 400
+    assert res.json == {"questions": ["at most 2 questions per batch"]}
+
+
+def test_batch_returns_400_response_when_mentor_not_set(client):
+    res = client.post(
+        "/classifier/questions/batch", json={"questions": [{"query": "test"}]}
+    )
+    assert res.status_code == 400
+    assert res.json == {"mentor": ["required field"]}
+
+
+def test_batch_returns_404_response_when_mentor_has_no_models(client):
+    res = client.post(
+        "/classifier/questions/batch",
+        json={"questions": [{"mentor": "not_a_mentor", "query": "test"}]},
+    )
+    assert res.status_code == 404
+
+
+@responses.activate
+@pytest.mark.parametrize(
+    "input_mentor,input_questions,expected_answer_ids",
+    [
+        (
+            "clint",
+            ["What is your name?", "How old are you?", "Who are you?"],
+            ["A1", "A2", "A1"],
+        ),
+    ],
+)
+def test_batch_evaluate_classifies_user_questions_in_order(
+    client, input_mentor, input_questions, expected_answer_ids
+):
+    with open(fixture_path("graphql/{}.json".format(input_mentor))) as f:
+        data = json.load(f)
+    responses.add(responses.POST, "http://graphql/graphql", json=data, status=200)
+    res = client.post(
+        "/classifier/questions/batch",
+        json={
+            "questions": [
+                {"mentor": input_mentor, "query": question}
+                for question in input_questions
+            ]
+        },
+    )
+    assert res.status_code == 200
+    results = res.json["results"]
+    assert [r["query"] for r in results] == input_questions
+    assert [r["mentor"] for r in results] == [input_mentor] * len(input_questions)
+    assert [r["answer_id"] for r in results] == expected_answer_ids
+    assert all(r["feedback_id"] is not None for r in results)
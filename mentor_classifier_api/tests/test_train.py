@@ -38,6 +38,35 @@ def test_train(mock_train_task, classifier_domain, input_mentor, fake_task_id, c
     }
 
 
+@pytest.mark.parametrize(
+    "coalesced_task_id,enqueue",
+    [("queued_task_id", False), ("new_task_id", True)],
+)
+@patch("mentor_classifier_api.blueprints.train.find_training_job_coalescer")
+@patch("mentor_classifier_tasks.tasks.train_task")
+def test_train_requests_share_a_queued_training(
+    mock_train_task, mock_find_coalescer, coalesced_task_id, enqueue, client
+):
+    mock_find_coalescer.return_value.request.return_value = (
+        coalesced_task_id,
+        enqueue,
+    )
+    res = client.post(
+        "/classifier/train/",
+        data=json.dumps({"mentor": "mentor_1"}),
+        content_type="application/json",
+    )
+    assert res.status_code == 200
+    assert res.json["data"]["id"] == coalesced_task_id
+    mock_find_coalescer.return_value.request.assert_called_once_with("mentor_1")
+    if enqueue:
+        mock_train_task.apply_async.assert_called_once_with(
+            queue="classifier", args=["mentor_1"], task_id=coalesced_task_id
+        )
+    else:
+        mock_train_task.apply_async.assert_not_called()
+
+
 # ISSUE: if the classifier api doesn't do end-to-end ssl
 # (e.g. if nginx terminates ssl),
 # then classifier-api doesn't know that its TRUE
@@ -88,6 +117,27 @@ def test_env_fixes_ssl_status_url(
         ("fake-task-id-123", "PENDING", "working", None, None),
         ("fake-task-id-234", "STARTED", "working harder", None, None),
         ("fake-task-id-456", "SUCCESS", "done!", None, None),
+        (
+            "fake-task-id-567",
+            "PROGRESS",
+            "PROGRESS",
+            {
+                "stage": "embed",
+                "elapsed": 2.5,
+                "stages": [
+                    {"name": "fetch", "seconds": 0.5, "done": 0, "total": 0},
+                    {"name": "embed", "seconds": 2.0, "done": 256, "total": 1000},
+                ],
+            },
+            {
+                "stage": "embed",
+                "elapsed": 2.5,
+                "stages": [
+                    {"name": "fetch", "seconds": 0.5, "done": 0, "total": 0},
+                    {"name": "embed", "seconds": 2.0, "done": 256, "total": 1000},
+                ],
+            },
+        ),
         (
             "fake-task-id-678",
             "FAILURE",
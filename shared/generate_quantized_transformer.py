@@ -0,0 +1,24 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import sys
+from os import path
+
+if __name__ == "__main__":
+    transformer_path = f"{sys.argv[-1]}/sentence-transformer"
+    # loading these takes 10+sec so only do it here:
+    from mentor_classifier.sentence_transformer import (
+        quantized_sentence_transformer_path,
+        save_quantized_sentence_transformer,
+    )
+
+    artifact = quantized_sentence_transformer_path(transformer_path)
+    if path.exists(artifact):
+        print(f"{artifact} exists, skipping")
+    else:
+        print(f"generating {artifact}")
+        save_quantized_sentence_transformer(transformer_path)
+        print(f"{artifact} created")
@@ -0,0 +1,22 @@
+#
+# This software is Copyright ©️ 2020 The University of Southern California. All Rights Reserved.
+# Permission to use, copy, modify, and distribute this software and its documentation for educational, research and non-profit purposes, without fee, and without a written agreement is hereby granted, provided that the above copyright notice and subject to the full license file found in the root of this software deliverable. Permission to make commercial use of this software may be obtained by contacting:  USC Stevens Center for Innovation University of Southern California 1150 S. Olive Street, Suite 2300, Los Angeles, CA 90115, USA Email: accounting@stevens.usc.edu
+#
+# The full terms of this copyright and license should always be found in the root directory of this software deliverable as "license.txt" and if these terms are not found with this software, please contact the USC Stevens Center for the full license.
+#
+import sys
+
+if __name__ == "__main__":
+    w2v = f"{sys.argv[-1]}/word2vec.bin"
+    kv = f"{sys.argv[-1]}/word2vec.kv"
+    from mentor_classifier.arch.lr.word2vec import (
+        convert_word2vec_to_native,
+        is_native_word2vec_current,
+    )
+
+    if is_native_word2vec_current(w2v):
+        print(f"{kv} is up to date, skipping")
+    else:
+        print(f"generating {kv}")
+        convert_word2vec_to_native(w2v)
+        print(f"{kv} created")